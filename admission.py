@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Admission control for new connections
+A join storm (a whole class scanning the QR code at once) should queue for a
+moment, not overflow the listen backlog or start a thread per connection
+without limit. The accept loop takes a token per connection from a token
+bucket, leaving connections in the kernel's backlog while it refills, and
+turns them away with one short error frame (with a retry hint) once the
+server is at its connection or pending-join limit. How long connections
+waited to be accepted, and then to join, is kept for metrics.
+"""
+
+import collections
+import threading
+import time
+from network_utils import encode_message
+from pacing import percentile
+
+LISTEN_BACKLOG = 1024  # Kernel accept queue; Linux caps it at net.core.somaxconn
+ACCEPT_RATE = 100.0  # New connections accepted per second, sustained (0 for no limit)...
+ACCEPT_BURST = 250  # ...after a burst of this many, so a class joining at once goes straight in
+MAX_CONNECTIONS = 2000  # Open client connections (a thread each) before new ones are turned away
+MAX_PENDING_JOINS = 250  # Accepted connections yet to join a room
+REJECT_RETRY_AFTER = 2.0  # Seconds a turned-away client is told to wait before reconnecting
+ADMISSION_SAMPLES = 1000  # Queue times kept for percentiles
+
+def rejection_frame(message, retry_after=REJECT_RETRY_AFTER):
+    """A pre-encoded error for connections turned away at accept"""
+    return encode_message({"type": "error", "message": message, "retry_after": retry_after})
+
+def wait_summary(samples):
+    """p50/p99/max of a sample of waits in seconds, as milliseconds"""
+    waits = sorted(samples)
+    if not waits:
+        return {"p50_ms": None, "p99_ms": None, "max_ms": None}
+    return {
+        "p50_ms": round(percentile(waits, 0.5) * 1000, 1),
+        "p99_ms": round(percentile(waits, 0.99) * 1000, 1),
+        "max_ms": round(waits[-1] * 1000, 1)
+    }
+
+
+class TokenBucket:
+    """rate tokens a second, holding up to burst; not thread-safe (the accept loop owns it)"""
+    
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        
+    def wait(self):
+        """Seconds until a token is available; 0 if one is now"""
+        if self.rate <= 0:
+            return 0.0
+        self.refill(time.monotonic())
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        
+    def take(self):
+        """Take a token if one is available"""
+        if self.wait() > 0:
+            return False
+        if self.rate > 0:
+            self.tokens -= 1
+        return True
+
+
+class Admission:
+    """Limits and accept rate for one listener, with queue-time metrics
+    
+    admit() is called by the accept loop; joined() and closed() by the
+    connection's handler thread.
+    """
+    
+    def __init__(self, max_connections=MAX_CONNECTIONS, max_pending=MAX_PENDING_JOINS, rate=ACCEPT_RATE,
+                 burst=ACCEPT_BURST):
+        self.bucket = TokenBucket(rate, burst)
+        self.max_connections = max_connections
+        self.max_pending = max_pending
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.pending = 0
+        self.accepted = 0
+        self.rejected = collections.Counter()  # {reason: connections turned away}
+        self.throttled = 0.0  # Seconds the accept loop waited on the bucket with connections queued
+        self.accept_waits = collections.deque(maxlen=ADMISSION_SAMPLES)  # Backlog wait, at most
+        self.join_waits = collections.deque(maxlen=ADMISSION_SAMPLES)  # Accept to joining a room
+        self.full_frame = rejection_frame("Server is full. Try again later.")
+        self.busy_frame = rejection_frame("Server is busy. Try again in a moment.")
+        
+    def admit(self, queued):
+        """Count in a connection that waited up to queued seconds to be accepted
+        
+        Returns None if it may be served, or the frame to reject it with.
+        """
+        with self.lock:
+            self.accept_waits.append(queued)
+            if self.connections >= self.max_connections:
+                self.rejected["full"] += 1
+                return self.full_frame
+            if self.pending >= self.max_pending:
+                self.rejected["busy"] += 1
+                return self.busy_frame
+            self.connections += 1
+            self.pending += 1
+            self.accepted += 1
+            return None
+            
+    def joined(self, accepted_at):
+        """An admitted connection's first message has been handled (joined, or refused by the room)"""
+        with self.lock:
+            self.pending -= 1
+            self.join_waits.append(time.monotonic() - accepted_at)
+            
+    def closed(self, joined):
+        """An admitted connection's handler has finished"""
+        with self.lock:
+            self.connections -= 1
+            if not joined:
+                self.pending -= 1
+                
+    def stats(self):
+        with self.lock:
+            return {
+                "connections": self.connections,
+                "pending_joins": self.pending,
+                "accepted": self.accepted,
+                "rejected": dict(self.rejected),
+                "throttled_s": round(self.throttled, 2),
+                "accept_queue": wait_summary(self.accept_waits),
+                "join": wait_summary(self.join_waits)
+            }
@@ -9,10 +9,30 @@ from flask import Flask, jsonify, request, render_template
 from flask_cors import CORS
 import random
 import json
+import base64
+import binascii
+import bisect
+import fcntl
+import hashlib
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
 from datetime import datetime
 import os
+import re
+import unicodedata
+from flask import Response, g
 from questions_levels import levels, get_questions_for_level, get_level_info, get_max_level
 
+# Optional: columnar (Arrow/Parquet) exports
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
@@ -21,27 +41,484 @@ API_VERSION = "v1"
 API_BASE_URL = f"/api/{API_VERSION}"
 MAX_QUESTIONS_PER_REQUEST = 1000
 DEFAULT_QUESTIONS_PER_REQUEST = 10
+MAX_GRADE_ITEMS_PER_REQUEST = 10000
+
+# Question bank writes: disabled unless an admin token is configured. With
+# several workers, point QUESTIONS_JOURNAL at a shared file so every worker
+# replays the same append-only change log and agrees on versions and ids.
+ADMIN_TOKEN = os.environ.get('API_ADMIN_TOKEN')
+QUESTIONS_JOURNAL = os.environ.get('QUESTIONS_JOURNAL')
+
+# Warm-up at worker start: /ready stays red until indexes, serialized
+# fragments and common responses are built (disable for quick local runs)
+WARMUP_ON_BOOT = os.environ.get('WARMUP_ON_BOOT', 'true').lower() == 'true'
+
+# Admission control: when recent p95 latency or in-flight requests breach
+# the SLO, random draws are served from pre-built packs and exports are shed
+SLO_P95_MS = float(os.environ.get('SLO_P95_MS', 250))
+MAX_IN_FLIGHT = int(os.environ.get('MAX_IN_FLIGHT', 64))
+LATENCY_WINDOW = 200  # Recent request latencies considered for p95
+ADMISSION_EVAL_INTERVAL = 0.25  # Seconds between mode evaluations
+MIN_MODE_DWELL = 5.0  # Seconds to stay degraded before recovering
+SHED_RETRY_AFTER = 10  # Seconds advertised in Retry-After on shed requests
+DEGRADED_PACKS_PER_KEY = 8
+MAX_PACK_KEYS = 64
+
+# Columnar exports are written this many questions per record batch / row group
+EXPORT_BATCH_SIZE = 10000
+COLUMNAR_MIMETYPES = {
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'parquet': 'application/vnd.apache.parquet'
+}
+
+# Frozen legacy (sequential) id -> content id table, so ids handed out before
+# content addressing keep resolving after questions are inserted or reordered
+ID_MAP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'question_ids.json')
+MAX_SEEN_PLAYERS = 10000  # Server-side seen sets kept (least recently used are evicted)
+SAMPLE_ATTEMPTS_PER_QUESTION = 4  # Rejection-sampling budget before falling back to a single scan
+
+
+def _normalize_text(text):
+    """Normalize text for hashing: unicode form, case and whitespace insensitive"""
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFKC', text)).strip().casefold()
+
+
+def content_id(question):
+    """Derive a stable question id from a hash of its normalized text and options"""
+    parts = [_normalize_text(question['question'])] + [_normalize_text(o) for o in question['options']]
+    return hashlib.sha1('\x1f'.join(parts).encode('utf-8')).hexdigest()[:16]
+
+
+def load_id_map(path=ID_MAP_PATH):
+    """Load the legacy id table as {content_id: legacy_id}"""
+    try:
+        with open(path) as f:
+            return {stable_id: int(legacy_id) for legacy_id, stable_id in json.load(f).items()}
+    except FileNotFoundError:
+        return {}
+
+
+def decode_seen_bitmap(encoded, max_id):
+    """Decode a base64 (URL-safe) zlib-compressed bitmap of seen question ids.
+    
+    Bit ``legacy_id`` (LSB first within each byte) is set when the question
+    was seen.
+    Decompression is capped at the size needed for ``max_id`` so oversized or
+    malicious payloads cannot blow up memory.
+    """
+    padded = encoded + '=' * (-len(encoded) % 4)
+    try:
+        # Strict: the lenient decoder silently drops characters outside the alphabet
+        compressed = base64.b64decode(padded.encode('ascii'), altchars=b'-_', validate=True)
+        return zlib.decompressobj().decompress(compressed, (max_id >> 3) + 1)
+    except (binascii.Error, zlib.error, UnicodeEncodeError):
+        raise ValueError('seen must be a base64-encoded zlib-compressed bitmap')
+
+
+def encode_seen_bitmap(bitmap):
+    """Encode a bitmap as URL-safe base64 of its zlib-compressed bytes"""
+    return base64.urlsafe_b64encode(zlib.compress(bytes(bitmap), 9)).decode('ascii').rstrip('=')
+
+
+def bitmap_has(bitmap, question_id):
+    """Test a single bit without materializing the bitmap as a set"""
+    byte_index = question_id >> 3
+    return byte_index < len(bitmap) and bool(bitmap[byte_index] & (1 << (question_id & 7)))
+
+
+def bitmap_set(bitmap, question_id):
+    """Set a single bit, growing the bytearray if needed"""
+    byte_index = question_id >> 3
+    if byte_index >= len(bitmap):
+        bitmap.extend(bytes(byte_index + 1 - len(bitmap)))
+    bitmap[byte_index] |= 1 << (question_id & 7)
+
+
+def strip_answer(question):
+    """Return a copy of a question without its answer key"""
+    return {key: value for key, value in question.items() if key != 'answer'}
+
+
+class SeenStore:
+    """Server-side seen-question bitmaps keyed by player token (LRU bounded)"""
+    
+    def __init__(self, max_players=MAX_SEEN_PLAYERS):
+        self.max_players = max_players
+        self.bitmaps = OrderedDict()  # {player_token: bytearray}
+        self.lock = threading.Lock()
+    
+    def get(self, token):
+        """Get a snapshot of a player's bitmap (empty if unknown)"""
+        with self.lock:
+            bitmap = self.bitmaps.get(token)
+            if bitmap is None:
+                return b''
+            self.bitmaps.move_to_end(token)
+            return bytes(bitmap)
+    
+    def mark(self, token, question_ids):
+        """Record questions as seen by a player"""
+        with self.lock:
+            bitmap = self.bitmaps.get(token)
+            if bitmap is None:
+                bitmap = self.bitmaps[token] = bytearray()
+                while len(self.bitmaps) > self.max_players:
+                    self.bitmaps.popitem(last=False)
+            self.bitmaps.move_to_end(token)
+            for question_id in question_ids:
+                bitmap_set(bitmap, question_id)
+    
+    def reset(self, token):
+        """Forget everything a player has seen"""
+        with self.lock:
+            return self.bitmaps.pop(token, None) is not None
+
+
+class _ChunkSink:
+    """Write-only file object that buffers bytes until drained by a generator"""
+    
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+    
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+    
+    def tell(self):
+        return self.position
+    
+    def flush(self):
+        pass
+    
+    def close(self):
+        self.closed = True
+    
+    def writable(self):
+        return True
+    
+    def readable(self):
+        return False
+    
+    def seekable(self):
+        return False
+    
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def columnar_schema(include_answers=True):
+    """Arrow schema for the question corpus with dictionary-encoded labels"""
+    fields = [
+        pa.field('id', pa.string()),
+        pa.field('legacy_id', pa.int32()),
+        pa.field('revision', pa.int32()),
+        pa.field('question', pa.string()),
+        pa.field('options', pa.list_(pa.string())),
+        pa.field('answer', pa.int8()),
+        pa.field('category', pa.dictionary(pa.int16(), pa.string())),
+        pa.field('difficulty', pa.dictionary(pa.int8(), pa.string())),
+        pa.field('level', pa.int8()),
+        pa.field('level_name', pa.dictionary(pa.int8(), pa.string()))
+    ]
+    if not include_answers:
+        fields = [f for f in fields if f.name != 'answer']
+    return pa.schema(fields)
+
+
+def iter_columnar_export(fmt, questions, include_answers=True, batch_size=EXPORT_BATCH_SIZE):
+    """Yield an Arrow IPC stream or Parquet file as bytes, one record batch at a time
+    
+    Dictionaries are fixed up front from the whole snapshot, so every batch
+    shares them and memory stays bounded by the batch size rather than the
+    corpus size.
+    """
+    schema = columnar_schema(include_answers)
+    dictionaries = {}
+    for name in ('category', 'difficulty', 'level_name'):
+        values = sorted({q.get(name, '') for q in questions})
+        dictionaries[name] = (pa.array(values, pa.string()), {v: i for i, v in enumerate(values)})
+    
+    sink = _ChunkSink()
+    if fmt == 'parquet':
+        writer = pq.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+    
+    for start in range(0, len(questions), batch_size):
+        batch = questions[start:start + batch_size]
+        columns = {
+            'id': pa.array([q['id'] for q in batch], pa.string()),
+            'legacy_id': pa.array([q['legacy_id'] for q in batch], pa.int32()),
+            'revision': pa.array([q['revision'] for q in batch], pa.int32()),
+            'question': pa.array([q['question'] for q in batch], pa.string()),
+            'options': pa.array([q['options'] for q in batch], pa.list_(pa.string())),
+            'level': pa.array([q['level'] for q in batch], pa.int8())
+        }
+        if include_answers:
+            columns['answer'] = pa.array([q['answer'] for q in batch], pa.int8())
+        for name, (dictionary, codes) in dictionaries.items():
+            index_type = schema.field(name).type.index_type
+            indices = pa.array([codes[q.get(name, '')] for q in batch], index_type)
+            columns[name] = pa.DictionaryArray.from_arrays(indices, dictionary)
+        
+        writer.write_batch(pa.record_batch([columns[f.name] for f in schema], schema=schema))
+        yield sink.drain()
+    
+    writer.close()
+    yield sink.drain()
+
+
+class AdmissionController:
+    """Tracks in-flight requests and recent latency to switch degraded mode on and off
+    
+    Degraded mode is entered when p95 latency over the recent window exceeds
+    the SLO or too many requests are in flight, and left (with hysteresis and
+    a minimum dwell time) once both are back under 80% of their limits.
+    """
+    
+    def __init__(self, slo_p95_ms=SLO_P95_MS, max_in_flight=MAX_IN_FLIGHT):
+        self.slo_p95_ms = slo_p95_ms
+        self.max_in_flight = max_in_flight
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)  # milliseconds
+        self.degraded = False
+        self.mode_changed_at = time.monotonic()
+        self.last_evaluated = 0.0
+        self.p95_ms = 0.0
+        self.mode_switches = 0
+        self.requests = 0
+        self.shed = {}  # {endpoint: count}
+        self.served_from_packs = 0
+    
+    def enter(self):
+        """Count a request in flight"""
+        with self.lock:
+            self.in_flight += 1
+            self.requests += 1
+            if self.in_flight > self.max_in_flight and not self.degraded:
+                self._set_degraded(True, time.monotonic())
+    
+    def leave(self, latency_ms):
+        """Record a finished request and periodically re-evaluate the mode"""
+        with self.lock:
+            self.in_flight -= 1
+            self.latencies.append(latency_ms)
+            now = time.monotonic()
+            if now - self.last_evaluated >= ADMISSION_EVAL_INTERVAL:
+                self.last_evaluated = now
+                self._evaluate(now)
+    
+    def _evaluate(self, now):
+        ordered = sorted(self.latencies)
+        self.p95_ms = ordered[int(len(ordered) * 0.95) - 1] if len(ordered) >= 20 else 0.0
+        breached = self.p95_ms > self.slo_p95_ms or self.in_flight > self.max_in_flight
+        recovered = (self.p95_ms < self.slo_p95_ms * 0.8
+                     and self.in_flight < self.max_in_flight * 0.8
+                     and now - self.mode_changed_at >= MIN_MODE_DWELL)
+        if breached and not self.degraded:
+            self._set_degraded(True, now)
+        elif recovered and self.degraded:
+            self._set_degraded(False, now)
+    
+    def _set_degraded(self, degraded, now):
+        self.degraded = degraded
+        self.mode_changed_at = now
+        self.mode_switches += 1
+        if not degraded:
+            # Latencies from the overload would otherwise re-trigger degraded mode
+            self.latencies.clear()
+        print(f"Admission control: {'degraded' if degraded else 'normal'} mode "
+              f"(p95 {self.p95_ms:.0f}ms, {self.in_flight} in flight)")
+    
+    def record_shed(self, endpoint):
+        with self.lock:
+            self.shed[endpoint] = self.shed.get(endpoint, 0) + 1
+    
+    def record_pack_served(self):
+        with self.lock:
+            self.served_from_packs += 1
+    
+    def get_metrics(self):
+        """Snapshot of admission control metrics"""
+        with self.lock:
+            return {
+                'mode': 'degraded' if self.degraded else 'normal',
+                'mode_switches': self.mode_switches,
+                'seconds_in_mode': round(time.monotonic() - self.mode_changed_at, 1),
+                'in_flight': self.in_flight,
+                'max_in_flight': self.max_in_flight,
+                'p95_ms': round(self.p95_ms, 1),
+                'slo_p95_ms': self.slo_p95_ms,
+                'requests': self.requests,
+                'shed': dict(self.shed),
+                'shed_total': sum(self.shed.values()),
+                'served_from_packs': self.served_from_packs
+            }
+
+
+class PackPool:
+    """Small pool of pre-built, pre-serialized random packs served while degraded
+    
+    A draw for a key with no pool yet costs one ordinary draw; the pool for
+    it is built on a background thread, once per key however many requests
+    miss meanwhile. Writes change api.version, so they start new keys.
+    """
+    
+    def __init__(self, api, packs_per_key=DEGRADED_PACKS_PER_KEY, max_keys=MAX_PACK_KEYS):
+        self.api = api
+        self.packs_per_key = packs_per_key
+        self.max_keys = max_keys
+        self.packs = OrderedDict()  # {(version, count, filters, include_answers): [data JSON]}
+        self.filling = set()  # Keys with a pool being built
+        self.lock = threading.Lock()
+    
+    def draw(self, count, filters=None, include_answers=True):
+        """Return the serialized data of a random pre-built pack, or of a fresh one on a miss"""
+        filters = filters or {}
+        key = self._key(count, filters, include_answers)
+        with self.lock:
+            packs = self.packs.get(key)
+            if packs is not None:
+                self.packs.move_to_end(key)
+                return random.choice(packs)
+            start_fill = key not in self.filling
+            if start_fill:
+                self.filling.add(key)
+        
+        pack = self._build(count, filters, include_answers)
+        if start_fill:
+            threading.Thread(target=self._fill, args=(key, count, filters, include_answers, [pack]),
+                             name='pack-fill', daemon=True).start()
+        return pack
+    
+    def fill(self, count, filters=None, include_answers=True):
+        """Build the pool for a draw now (warm-up), unless it exists or is being built"""
+        filters = filters or {}
+        key = self._key(count, filters, include_answers)
+        with self.lock:
+            if key in self.packs or key in self.filling:
+                return
+            self.filling.add(key)
+        self._fill(key, count, filters, include_answers, [])
+    
+    def _key(self, count, filters, include_answers):
+        return (self.api.version, count, tuple(sorted(filters.items())), include_answers)
+    
+    def _build(self, count, filters, include_answers):
+        result = self.api.get_random_questions(count, filters)
+        if not include_answers:
+            result['questions'] = [strip_answer(q) for q in result['questions']]
+        return json.dumps(result)
+    
+    def _fill(self, key, count, filters, include_answers, packs):
+        """Top packs up to packs_per_key and publish them under key"""
+        try:
+            while len(packs) < self.packs_per_key:
+                packs.append(self._build(count, filters, include_answers))
+            with self.lock:
+                self.packs[key] = packs
+                while len(self.packs) > self.max_keys:
+                    self.packs.popitem(last=False)
+        except Exception as e:
+            print(f"Pack pool fill failed: {e}")
+        finally:
+            with self.lock:
+                self.filling.discard(key)
+
 
 class QuestionsAPI:
     """Main API class for handling questions"""
     
-    def __init__(self):
+    def __init__(self, journal_path=QUESTIONS_JOURNAL):
+        self.lock = threading.RLock()
         self.all_questions = self._load_all_questions()
+        self.questions_by_id = {q['id']: q for q in self.all_questions}
+        self.legacy_ids = {q['legacy_id']: q['id'] for q in self.all_questions}
+        self.corpus_order = {q['id']: i for i, q in enumerate(self.all_questions)}  # Keeps index buckets in list order
+        self.next_order = len(self.all_questions)
+        self.max_legacy_id = max(self.legacy_ids, default=0)
         self.categories = self._extract_categories()
         self.difficulties = self._extract_difficulties()
         
+        # Change feed: the base corpus is version 1..N (one add each), and every
+        # later write appends an entry, so /changes?since=v is a bisect plus a
+        # slice proportional to the change set. The epoch identifies the base
+        # corpus; mirrors must resync from 0 when it changes between deploys.
+        self.epoch = hashlib.sha1(
+            json.dumps(self.all_questions, sort_keys=True).encode('utf-8')
+        ).hexdigest()[:12]
+        self.changelog = []  # [(version, op, question_id)]
+        self.change_versions = []  # versions, parallel to changelog for bisect
+        self.version = 0
+        for question in self.all_questions:
+            question['revision'] = 1
+            self._record_change('add', question['id'])
+        
+        # Built by warm_up(); until then filters scan the full list
+        self.filter_index = None  # {(field, value): [questions]}
+        self.fragments = {}  # {question_id: (json_with_answer, json_without_answer)}
+        self.export_cache = {}  # {include_answers: serialized question array}
+        self.indexed_version = None
+        
+        self.journal_path = journal_path
+        self.journal_offset = 0
+        self.sync_journal()
+        
     def _load_all_questions(self):
-        """Load all questions from all levels"""
+        """Load all questions from all levels
+        
+        Ids are content hashes, so editing the corpus only affects the
+        questions that changed. Each question also keeps a numeric legacy_id
+        from the frozen id table; questions missing from it are numbered after
+        the highest known legacy id in corpus order.
+        """
+        id_map = load_id_map()
+        next_legacy_id = max(id_map.values(), default=0)
         all_questions = []
+        seen_ids = set()
         for level_num, level_data in levels.items():
             for question in level_data['questions']:
                 question_copy = question.copy()
                 question_copy['level'] = level_num
                 question_copy['level_name'] = level_data['name']
-                question_copy['id'] = len(all_questions) + 1
+                question_copy['id'] = content_id(question_copy)
+                if question_copy['id'] in seen_ids:
+                    print(f"Skipping duplicate question: {question_copy['question']}")
+                    continue
+                seen_ids.add(question_copy['id'])
+                if question_copy['id'] in id_map:
+                    question_copy['legacy_id'] = id_map[question_copy['id']]
+                else:
+                    next_legacy_id += 1
+                    question_copy['legacy_id'] = next_legacy_id
                 all_questions.append(question_copy)
         return all_questions
     
+    def write_id_map(self, path=ID_MAP_PATH):
+        """Freeze the current legacy id table (run after adding questions to the corpus)"""
+        id_map = {str(legacy_id): stable_id for legacy_id, stable_id in sorted(self.legacy_ids.items())}
+        with open(path, 'w') as f:
+            json.dump(id_map, f, indent=2)
+            f.write('\n')
+        return len(id_map)
+    
+    def resolve_id(self, question_id):
+        """Resolve a content id or a legacy numeric id to the content id"""
+        if isinstance(question_id, bool):
+            return None
+        if isinstance(question_id, int):
+            return self.legacy_ids.get(question_id)
+        if isinstance(question_id, str) and question_id.isdigit():
+            return self.legacy_ids.get(int(question_id))
+        return question_id
+    
     def _extract_categories(self):
         """Extract unique categories from questions"""
         categories = set()
@@ -58,8 +535,293 @@ class QuestionsAPI:
                 difficulties.add(question['difficulty'])
         return sorted(list(difficulties))
     
-    def get_questions(self, filters=None, limit=DEFAULT_QUESTIONS_PER_REQUEST, offset=0, randomize=False):
-        """Get questions with optional filtering and pagination"""
+    def _record_change(self, op, question_id):
+        """Append a change entry and bump the corpus version"""
+        self.version += 1
+        self.changelog.append((self.version, op, question_id))
+        self.change_versions.append(self.version)
+    
+    def _validate_question(self, data, partial=False, current=None):
+        """Validate question fields for a write, raising ValueError on bad input
+        
+        current is the stored question a partial update applies to, so the
+        answer is checked against the options it will end up with.
+        """
+        if not isinstance(data, dict):
+            raise ValueError('Question must be a JSON object')
+        
+        allowed = {'question', 'options', 'answer', 'difficulty', 'category', 'level'}
+        unknown = set(data) - allowed
+        if unknown:
+            raise ValueError(f'Unknown fields: {sorted(unknown)}')
+        
+        if not partial:
+            missing = {'question', 'options', 'answer', 'level'} - set(data)
+            if missing:
+                raise ValueError(f'Missing fields: {sorted(missing)}')
+        
+        if 'question' in data and (not isinstance(data['question'], str) or not data['question'].strip()):
+            raise ValueError('question must be a non-empty string')
+        if 'options' in data:
+            options = data['options']
+            if not isinstance(options, list) or len(options) < 2 or not all(isinstance(o, str) for o in options):
+                raise ValueError('options must be a list of at least two strings')
+        if 'level' in data and data['level'] not in levels:
+            raise ValueError(f'level must be one of {list(levels.keys())}')
+        for field in ('difficulty', 'category'):
+            if field in data and not isinstance(data[field], str):
+                raise ValueError(f'{field} must be a string')
+        if 'answer' in data and (not isinstance(data['answer'], int) or isinstance(data['answer'], bool)):
+            raise ValueError('answer must be an integer option index')
+        merged = dict(current or {}, **data)
+        if 'answer' in merged and 'options' in merged and not 0 <= merged['answer'] < len(merged['options']):
+            raise ValueError(f"answer must be an option index from 0 to {len(merged['options']) - 1}")
+    
+    def _apply_change(self, change):
+        """Apply one journal entry to the in-memory store (copy-on-write)
+        
+        Readers never take the lock: the question list and the affected
+        question dicts are replaced rather than mutated in place.
+        """
+        op = change['op']
+        previous = None
+        
+        if op == 'add':
+            question = dict(change['question'])
+            question['level_name'] = levels[question['level']]['name']
+            question['id'] = content_id(question)
+            if question['id'] in self.questions_by_id:
+                return None
+            self.max_legacy_id += 1
+            question['legacy_id'] = self.max_legacy_id
+            question['revision'] = 1
+            self.all_questions = self.all_questions + [question]
+            self.questions_by_id[question['id']] = question
+            self.corpus_order[question['id']] = self.next_order
+            self.next_order += 1
+            self.legacy_ids[question['legacy_id']] = question['id']
+        
+        elif op == 'update':
+            current = self.questions_by_id.get(change['id'])
+            if current is None:
+                return None
+            previous = current
+            question = dict(current)
+            question.update(change['fields'])
+            question['level_name'] = levels[question['level']]['name']
+            question['revision'] = current['revision'] + 1
+            self.all_questions = [question if q is current else q for q in self.all_questions]
+            self.questions_by_id[question['id']] = question
+        
+        elif op == 'delete':
+            question = self.questions_by_id.pop(change['id'], None)
+            if question is None:
+                return None
+            self.all_questions = [q for q in self.all_questions if q is not question]
+            previous = question
+        
+        else:
+            return None
+        
+        self._record_change(op, question['id'])
+        self.categories = self._extract_categories()
+        self.difficulties = self._extract_difficulties()
+        if self.filter_index is not None:
+            # Keep a warm worker warm after writes
+            self._update_indexes(previous, None if op == 'delete' else question)
+        if op == 'delete':
+            del self.corpus_order[question['id']]
+        return question
+    
+    def build_indexes(self):
+        """Build filter indexes and pre-serialized per-question JSON fragments"""
+        with self.lock:
+            filter_index = {}
+            fragments = {}
+            for question in self.all_questions:
+                filter_index.setdefault(('level', question.get('level')), []).append(question)
+                filter_index.setdefault(('category', question.get('category', '').lower()), []).append(question)
+                filter_index.setdefault(('difficulty', question.get('difficulty', '').lower()), []).append(question)
+                fragments[question['id']] = (json.dumps(question), json.dumps(strip_answer(question)))
+            
+            self.filter_index = filter_index
+            self.fragments = fragments
+            self.export_cache = {}
+            self.indexed_version = self.version
+    
+    @staticmethod
+    def _index_keys(question):
+        return [('level', question.get('level')),
+                ('category', question.get('category', '').lower()),
+                ('difficulty', question.get('difficulty', '').lower())]
+    
+    def _update_indexes(self, old, new):
+        """Swap one written question into the indexes and fragments, without rebuilding the rest
+        
+        Buckets are replaced rather than mutated, so lock-free readers see
+        each one whole, and stay in list order.
+        """
+        with self.lock:
+            new_keys = self._index_keys(new) if new is not None else []
+            for key in set(self._index_keys(old) if old is not None else []) | set(new_keys):
+                bucket = [q for q in self.filter_index.get(key, []) if q is not old]
+                if key in new_keys:
+                    ranks = [self.corpus_order[q['id']] for q in bucket]
+                    bucket.insert(bisect.bisect(ranks, self.corpus_order[new['id']]), new)
+                if bucket:
+                    self.filter_index[key] = bucket
+                else:
+                    self.filter_index.pop(key, None)
+            if old is not None:
+                self.fragments.pop(old['id'], None)
+            if new is not None:
+                self.fragments[new['id']] = (json.dumps(new), json.dumps(strip_answer(new)))
+            self.export_cache = {}
+            self.indexed_version = self.version
+    
+    def serialized_questions(self, include_answers=True):
+        """Return (JSON array text, count, corpus version) for the whole bank
+        
+        Assembled from the pre-serialized fragments and cached per corpus
+        version; returns None when the indexes are not built.
+        """
+        with self.lock:
+            if self.indexed_version != self.version:
+                return None
+            cached = self.export_cache.get(include_answers)
+            if cached is None:
+                slot = 0 if include_answers else 1
+                fragments = self.fragments
+                array = '[' + ','.join(fragments[q['id']][slot] for q in self.all_questions) + ']'
+                cached = self.export_cache[include_answers] = (array, len(self.all_questions), self.version)
+            return cached
+    
+    def sync_journal(self):
+        """Replay journal entries appended since the last sync (by any worker)"""
+        if not self.journal_path:
+            return
+        
+        with self.lock:
+            try:
+                if os.path.getsize(self.journal_path) <= self.journal_offset:
+                    return
+                with open(self.journal_path, 'rb') as journal:
+                    journal.seek(self.journal_offset)
+                    for line in journal:
+                        if not line.endswith(b'\n'):
+                            break  # Partially written entry: pick it up next time
+                        self.journal_offset += len(line)
+                        self._apply_change(json.loads(line))
+            except FileNotFoundError:
+                return
+    
+    def _write_change(self, change):
+        """Persist a change (when journaling) and apply it, returning the affected question"""
+        with self.lock:
+            if not self.journal_path:
+                return self._apply_change(change)
+            
+            with open(self.journal_path, 'ab') as journal:
+                fcntl.flock(journal, fcntl.LOCK_EX)
+                try:
+                    # Catch up first so our entry's position (and so its id) is known
+                    self.sync_journal()
+                    journal.write(json.dumps(change).encode('utf-8') + b'\n')
+                    journal.flush()
+                    self.journal_offset = journal.tell()
+                finally:
+                    fcntl.flock(journal, fcntl.LOCK_UN)
+            return self._apply_change(change)
+    
+    def add_question(self, data):
+        """Add a question to the bank"""
+        self._validate_question(data)
+        with self.lock:
+            self.sync_journal()
+            if content_id(data) in self.questions_by_id:
+                raise ValueError('An identical question already exists')
+            return self._write_change({'op': 'add', 'question': data})
+    
+    def update_question(self, question_id, fields):
+        """Update fields of an existing question, bumping its revision
+        
+        The id is a hash of the question text and options, so edits that would
+        change it are refused: delete the question and add the new version.
+        """
+        with self.lock:
+            self.sync_journal()
+            question_id = self.resolve_id(question_id)
+            if question_id not in self.questions_by_id:
+                return None
+            current = self.questions_by_id[question_id]
+            self._validate_question(fields, partial=True, current=current)
+            if content_id(dict(current, **fields)) != question_id:
+                raise ValueError('Changing the question text or options changes its id: delete it and add '
+                                 'the new version instead')
+            return self._write_change({'op': 'update', 'id': question_id, 'fields': fields})
+    
+    def delete_question(self, question_id):
+        """Delete a question from the bank"""
+        with self.lock:
+            self.sync_journal()
+            question_id = self.resolve_id(question_id)
+            if question_id not in self.questions_by_id:
+                return None
+            return self._write_change({'op': 'delete', 'id': question_id})
+    
+    def get_changes(self, since=0):
+        """Collapse the changes after version since into one entry per question
+        
+        Cost is proportional to the number of change entries after since, not
+        to the corpus size.
+        """
+        with self.lock:
+            self.sync_journal()
+            start = bisect.bisect_right(self.change_versions, since)
+            entries = self.changelog[start:]
+            version = self.version
+            questions_by_id = self.questions_by_id
+            
+            changes = {}  # {question_id: change}, insertion-ordered by first change
+            for entry_version, op, question_id in entries:
+                previous = changes.get(question_id)
+                if op == 'update' and previous and previous['op'] == 'add':
+                    op = 'add'  # Still new to a mirror at since
+                changes[question_id] = {'op': op, 'id': question_id, 'version': entry_version}
+            
+            for change in changes.values():
+                if change['op'] != 'delete':
+                    question = questions_by_id.get(change['id'])
+                    if question is None:
+                        change['op'] = 'delete'
+                    else:
+                        change['revision'] = question['revision']
+                        change['question'] = question
+        
+        return {
+            'version': version,
+            'epoch': self.epoch,
+            'since': since,
+            'changes': list(changes.values())
+        }
+    
+    def _filter_questions(self, filters=None):
+        """Return the questions matching the level/category/difficulty filters"""
+        filter_index = self.filter_index
+        if filters and filter_index is not None and self.indexed_version == self.version:
+            # Start from the smallest matching index bucket, then check the rest
+            keys = [(field, value if field == 'level' else value.lower())
+                    for field, value in filters.items() if field in ('level', 'category', 'difficulty')]
+            if keys:
+                buckets = sorted((filter_index.get(key, []) for key in keys), key=len)
+                questions = buckets[0]
+                for field, value in keys:
+                    if field == 'level':
+                        questions = [q for q in questions if q.get('level') == value]
+                    else:
+                        questions = [q for q in questions if q.get(field, '').lower() == value]
+                return questions
+        
         questions = self.all_questions.copy()
         
         # Apply filters
@@ -73,6 +835,12 @@ class QuestionsAPI:
             if 'difficulty' in filters:
                 questions = [q for q in questions if q.get('difficulty', '').lower() == filters['difficulty'].lower()]
         
+        return questions
+    
+    def get_questions(self, filters=None, limit=DEFAULT_QUESTIONS_PER_REQUEST, offset=0, randomize=False):
+        """Get questions with optional filtering and pagination"""
+        questions = self._filter_questions(filters)
+        
         # Randomize if requested
         if randomize:
             random.shuffle(questions)
@@ -97,39 +865,170 @@ class QuestionsAPI:
         }
     
     def get_question_by_id(self, question_id):
-        """Get a specific question by ID"""
-        for question in self.all_questions:
-            if question.get('id') == question_id:
-                return question
-        return None
+        """Get a specific question by content id or legacy id"""
+        return self.questions_by_id.get(self.resolve_id(question_id))
     
-    def get_random_questions(self, count=DEFAULT_QUESTIONS_PER_REQUEST, filters=None):
-        """Get random questions with optional filtering"""
-        questions = self.all_questions.copy()
+    def grade_answers(self, answers):
+        """Grade a batch of {id, answer} pairs in one pass against the id index"""
+        questions_by_id = self.questions_by_id
+        results = []
+        score = 0
+        unknown = 0
         
-        # Apply filters
-        if filters:
-            if 'level' in filters:
-                questions = [q for q in questions if q.get('level') == filters['level']]
+        for item in answers:
+            question_id = item.get('id')
+            answer = item.get('answer')
+            question = None
+            if isinstance(question_id, str):
+                question = questions_by_id.get(question_id)
+            if question is None and isinstance(question_id, (int, str)):
+                question = questions_by_id.get(self.resolve_id(question_id))
             
-            if 'category' in filters:
-                questions = [q for q in questions if q.get('category', '').lower() == filters['category'].lower()]
+            if question is None:
+                unknown += 1
+                results.append({'id': question_id, 'correct': False, 'error': 'Question not found'})
+                continue
             
-            if 'difficulty' in filters:
-                questions = [q for q in questions if q.get('difficulty', '').lower() == filters['difficulty'].lower()]
+            correct = answer == question['answer']
+            if correct:
+                score += 1
+            results.append({'id': question_id, 'correct': correct, 'correct_answer': question['answer']})
+        
+        graded = len(results) - unknown
+        return {
+            'results': results,
+            'score': score,
+            'total': len(results),
+            'graded': graded,
+            'unknown': unknown,
+            'accuracy': round(score / graded, 4) if graded else 0.0
+        }
+    
+    def get_random_questions(self, count=DEFAULT_QUESTIONS_PER_REQUEST, filters=None, seen=None):
+        """Get random questions with optional filtering, skipping ids set in the seen bitmaps"""
+        questions = self._filter_questions(filters)
+        seen = [bitmap for bitmap in (seen or []) if bitmap]
         
         # Select random questions
-        count = min(count, len(questions))
-        selected_questions = random.sample(questions, count) if questions else []
+        if seen:
+            selected_questions = self._sample_unseen(questions, count, seen)
+        else:
+            count = min(count, len(questions))
+            selected_questions = random.sample(questions, count) if questions else []
         
         return {
             'questions': selected_questions,
             'count': len(selected_questions),
             'total_available': len(questions)
         }
+    
+    def _sample_unseen(self, questions, count, seen):
+        """Sample up to count questions whose ids are not set in any seen bitmap
+        
+        Rejection sampling is tried first with a fixed attempt budget; if the
+        seen set is dense enough to exhaust it, a single reservoir-sampling pass
+        over the candidates finishes the job, so the cost never exceeds
+        O(count + len(questions)) however many ids have been seen.
+        """
+        def is_seen(question):
+            return any(bitmap_has(bitmap, question['legacy_id']) for bitmap in seen)
+        
+        total = len(questions)
+        if total == 0 or count <= 0:
+            return []
+        
+        picked = {}  # {position: question}
+        for _ in range(count * SAMPLE_ATTEMPTS_PER_QUESTION):
+            if len(picked) >= count:
+                return list(picked.values())
+            position = random.randrange(total)
+            if position not in picked and not is_seen(questions[position]):
+                picked[position] = questions[position]
+        
+        # Dense seen set: reservoir-sample the unseen questions in one pass
+        reservoir = []
+        unseen_count = 0
+        for question in questions:
+            if is_seen(question):
+                continue
+            unseen_count += 1
+            if len(reservoir) < count:
+                reservoir.append(question)
+            else:
+                slot = random.randrange(unseen_count)
+                if slot < count:
+                    reservoir[slot] = question
+        random.shuffle(reservoir)
+        return reservoir
 
 # Initialize API
 questions_api = QuestionsAPI()
+seen_store = SeenStore()
+admission = AdmissionController()
+pack_pool = PackPool(questions_api)
+
+# Endpoints that are shed with 503 while degraded, and ones never tracked
+SHEDDABLE_ENDPOINTS = {'export_json', 'export_columnar'}
+UNTRACKED_ENDPOINTS = {'health_check', 'readiness_check', 'get_metrics'}
+WARMUP_ENVIRON_KEY = 'trivia.warmup'  # Set on warm-up requests (not settable by clients), which are not tracked
+
+def admin_required():
+    """Return an error response unless the request carries the admin token"""
+    if not ADMIN_TOKEN:
+        return jsonify({
+            'success': False,
+            'error': 'Writes disabled',
+            'message': 'Set API_ADMIN_TOKEN to enable question bank writes'
+        }), 403
+    if request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+        return jsonify({
+            'success': False,
+            'error': 'Unauthorized',
+            'message': 'A valid X-Admin-Token header is required'
+        }), 401
+    return None
+
+@app.before_request
+def sync_question_journal():
+    """Pick up question bank writes made by other workers"""
+    questions_api.sync_journal()
+
+@app.before_request
+def admit_request():
+    """Track the request for admission control and shed expensive work while degraded"""
+    if request.endpoint in UNTRACKED_ENDPOINTS or request.environ.get(WARMUP_ENVIRON_KEY):
+        return None
+    
+    if admission.degraded and request.endpoint in SHEDDABLE_ENDPOINTS:
+        admission.record_shed(request.endpoint)
+        response = jsonify({
+            'success': False,
+            'error': 'Service degraded',
+            'message': f'Exports are temporarily unavailable under load. Retry in {SHED_RETRY_AFTER} seconds.'
+        })
+        response.status_code = 503
+        response.headers['Retry-After'] = str(SHED_RETRY_AFTER)
+        return response
+    
+    admission.enter()
+    g.admission_started = time.perf_counter()
+    return None
+
+@app.after_request
+def release_streamed_request(response):
+    """Record a streamed response's latency once its body has been sent, not when the view returns"""
+    if response.is_streamed:
+        started = g.pop('admission_started', None)
+        if started is not None:
+            response.call_on_close(lambda: admission.leave((time.perf_counter() - started) * 1000))
+    return response
+
+@app.teardown_request
+def release_request(error=None):
+    """Record latency for admitted requests (runs even if the view raised)"""
+    started = g.pop('admission_started', None)
+    if started is not None:
+        admission.leave((time.perf_counter() - started) * 1000)
 
 # API Routes
 
@@ -149,7 +1048,40 @@ def health_check():
         'status': 'healthy',
         'timestamp': datetime.utcnow().isoformat(),
         'version': API_VERSION,
-        'total_questions': len(questions_api.all_questions)
+        'total_questions': len(questions_api.all_questions),
+        'corpus_version': questions_api.version
+    })
+
+@app.route(f'{API_BASE_URL}/ready')
+def readiness_check():
+    """Readiness check: green only once this worker has finished warming up"""
+    status = dict(warmup_status)
+    ready = status.pop('ready')
+    if ready:
+        state = 'ready'
+    elif status['error']:
+        state = 'warmup_failed'
+    elif status['started_at'] is None:
+        state = 'not_started'
+    else:
+        state = 'warming_up'
+    return jsonify({
+        'status': state,
+        'timestamp': datetime.utcnow().isoformat(),
+        'version': API_VERSION,
+        'warmup': status
+    }), 200 if ready else 503
+
+@app.route(f'{API_BASE_URL}/metrics')
+def get_metrics():
+    """Admission control and degraded-mode metrics for this worker"""
+    return jsonify({
+        'success': True,
+        'data': {
+            'admission': admission.get_metrics(),
+            'pid': os.getpid()
+        },
+        'timestamp': datetime.utcnow().isoformat()
     })
 
 @app.route(f'{API_BASE_URL}/info')
@@ -174,7 +1106,15 @@ def api_info():
             'by_level': f'{API_BASE_URL}/questions/level/{{level}}',
             'by_category': f'{API_BASE_URL}/questions/category/{{category}}',
             'by_difficulty': f'{API_BASE_URL}/questions/difficulty/{{difficulty}}',
-            'single_question': f'{API_BASE_URL}/questions/{{id}}'
+            'single_question': f'{API_BASE_URL}/questions/{{id}}',
+            'reset_seen': f'{API_BASE_URL}/seen/{{player}}',
+            'grade': f'{API_BASE_URL}/grade',
+            'changes': f'{API_BASE_URL}/changes?since={{version}}',
+            'id_map': f'{API_BASE_URL}/ids',
+            'ready': f'{API_BASE_URL}/ready',
+            'metrics': f'{API_BASE_URL}/metrics',
+            'export_arrow': f'{API_BASE_URL}/export/arrow',
+            'export_parquet': f'{API_BASE_URL}/export/parquet'
         }
     })
 
@@ -232,7 +1172,39 @@ def get_random_questions():
         if request.args.get('difficulty'):
             filters['difficulty'] = request.args.get('difficulty')
         
-        result = questions_api.get_random_questions(count, filters)
+        include_answers = request.args.get('include_answers', 'true').lower() == 'true'
+        
+        if admission.degraded:
+            # Degraded: hand out a pre-built pack (seen sets are not applied)
+            admission.record_pack_served()
+            body = ('{"data":' + pack_pool.draw(count, filters, include_answers)
+                    + ',"degraded":true,"success":true,"timestamp":"' + datetime.utcnow().isoformat() + '"}\n')
+            return Response(body, mimetype='application/json')
+        
+        # Already-seen questions: client bitmap and/or server-side set keyed by player token
+        max_id = questions_api.max_legacy_id
+        seen_param = request.args.get('seen')
+        player_token = request.args.get('player')
+        seen = []
+        if seen_param:
+            seen.append(decode_seen_bitmap(seen_param, max_id))
+        if player_token:
+            seen.append(seen_store.get(player_token))
+        
+        result = questions_api.get_random_questions(count, filters, seen)
+        
+        drawn_ids = [q['legacy_id'] for q in result['questions']]
+        if not include_answers:
+            # Clients grading server-side via /grade never need the answer key
+            result['questions'] = [strip_answer(q) for q in result['questions']]
+        if player_token:
+            seen_store.mark(player_token, drawn_ids)
+        if seen_param:
+            # Hand back the updated bitmap so clients can simply round-trip it
+            updated = bytearray(seen[0])
+            for question_id in drawn_ids:
+                bitmap_set(updated, question_id)
+            result['seen'] = encode_seen_bitmap(updated)
         
         return jsonify({
             'success': True,
@@ -253,7 +1225,176 @@ def get_random_questions():
             'message': str(e)
         }), 500
 
-@app.route(f'{API_BASE_URL}/questions/<int:question_id>')
+@app.route(f'{API_BASE_URL}/questions', methods=['POST'])
+def create_question():
+    """Add a question to the bank (admin only)"""
+    denied = admin_required()
+    if denied:
+        return denied
+    
+    try:
+        question = questions_api.add_question(request.get_json(silent=True))
+        return jsonify({
+            'success': True,
+            'data': question,
+            'timestamp': datetime.utcnow().isoformat()
+        }), 201
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': 'Invalid question',
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error',
+            'message': str(e)
+        }), 500
+
+@app.route(f'{API_BASE_URL}/questions/<question_id>', methods=['PATCH', 'DELETE'])
+def modify_question(question_id):
+    """Update or delete a question (admin only)"""
+    denied = admin_required()
+    if denied:
+        return denied
+    
+    try:
+        if request.method == 'DELETE':
+            question = questions_api.delete_question(question_id)
+        else:
+            question = questions_api.update_question(question_id, request.get_json(silent=True))
+        
+        if question is None:
+            return jsonify({
+                'success': False,
+                'error': 'Question not found',
+                'message': f'No question found with ID {question_id}'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'data': question,
+            'timestamp': datetime.utcnow().isoformat()
+        })
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': 'Invalid question',
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error',
+            'message': str(e)
+        }), 500
+
+@app.route(f'{API_BASE_URL}/changes')
+def get_changes():
+    """Stream question bank changes since a version as newline-delimited JSON
+    
+    The first line is a header ({version, epoch, since, count, reset}); each
+    following line is one {op, id, version[, revision, question]} change.
+    """
+    try:
+        since = int(request.args.get('since', 0))
+        if since < 0:
+            raise ValueError('since must be >= 0')
+        
+        # A mirror synced against a different base corpus must start over
+        epoch = request.args.get('epoch')
+        reset = bool(epoch) and epoch != questions_api.epoch
+        if reset or since > questions_api.version:
+            reset = True
+            since = 0
+        
+        feed = questions_api.get_changes(since)
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': 'Invalid parameter value',
+            'message': str(e)
+        }), 400
+    
+    def generate():
+        yield json.dumps({
+            'version': feed['version'],
+            'epoch': feed['epoch'],
+            'since': feed['since'],
+            'count': len(feed['changes']),
+            'reset': reset
+        }) + '\n'
+        for change in feed['changes']:
+            yield json.dumps(change) + '\n'
+    
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@app.route(f'{API_BASE_URL}/grade', methods=['POST'])
+def grade_answers():
+    """Grade a batch of answers server-side"""
+    try:
+        payload = request.get_json(silent=True)
+        answers = payload.get('answers') if isinstance(payload, dict) else payload
+        
+        if not isinstance(answers, list) or not all(isinstance(item, dict) for item in answers):
+            return jsonify({
+                'success': False,
+                'error': 'Invalid request body',
+                'message': 'Expected a JSON list of {"id": ..., "answer": ...} objects (optionally under "answers")'
+            }), 400
+        
+        if len(answers) > MAX_GRADE_ITEMS_PER_REQUEST:
+            return jsonify({
+                'success': False,
+                'error': 'Too many answers',
+                'message': f'At most {MAX_GRADE_ITEMS_PER_REQUEST} answers can be graded per request'
+            }), 413
+        
+        result = questions_api.grade_answers(answers)
+        
+        return jsonify({
+            'success': True,
+            'data': result,
+            'timestamp': datetime.utcnow().isoformat()
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error',
+            'message': str(e)
+        }), 500
+
+@app.route(f'{API_BASE_URL}/ids')
+def get_id_map():
+    """Legacy numeric id to content id mapping table"""
+    legacy_ids = questions_api.legacy_ids.copy()
+    return jsonify({
+        'success': True,
+        'data': {
+            'ids': {str(legacy_id): stable_id for legacy_id, stable_id in sorted(legacy_ids.items())},
+            'count': len(legacy_ids)
+        },
+        'timestamp': datetime.utcnow().isoformat()
+    })
+
+@app.route(f'{API_BASE_URL}/seen/<player_token>', methods=['DELETE'])
+def reset_seen(player_token):
+    """Forget the server-side seen set for a player token"""
+    return jsonify({
+        'success': True,
+        'data': {
+            'player': player_token,
+            'reset': seen_store.reset(player_token)
+        },
+        'timestamp': datetime.utcnow().isoformat()
+    })
+
+@app.route(f'{API_BASE_URL}/questions/<question_id>')
 def get_question_by_id(question_id):
     """Get a specific question by ID"""
     try:
@@ -445,11 +1586,30 @@ def export_json():
     try:
         include_answers = request.args.get('include_answers', 'true').lower() == 'true'
         
-        questions = questions_api.all_questions.copy()
+        serialized = questions_api.serialized_questions(include_answers)
+        if serialized:
+            # Warm path: splice the cached question array into the envelope
+            array, count, corpus_version = serialized
+            metadata = json.dumps({
+                'total_count': count,
+                'export_timestamp': datetime.utcnow().isoformat(),
+                'includes_answers': include_answers,
+                'corpus_version': corpus_version,
+                'corpus_epoch': questions_api.epoch,
+                'categories': questions_api.categories,
+                'difficulties': questions_api.difficulties,
+                'levels': list(levels.keys())
+            })
+            body = '{"data":{"metadata":' + metadata + ',"questions":' + array + '},"success":true}\n'
+            return Response(body, mimetype='application/json')
+        
+        with questions_api.lock:
+            questions = questions_api.all_questions.copy()
+            corpus_version = questions_api.version
         
         if not include_answers:
-            for question in questions:
-                question.pop('answer', None)
+            # Copy rather than pop in place: the shared store still needs answers for grading
+            questions = [strip_answer(q) for q in questions]
         
         return jsonify({
             'success': True,
@@ -459,6 +1619,8 @@ def export_json():
                     'total_count': len(questions),
                     'export_timestamp': datetime.utcnow().isoformat(),
                     'includes_answers': include_answers,
+                    'corpus_version': corpus_version,
+                    'corpus_epoch': questions_api.epoch,
                     'categories': questions_api.categories,
                     'difficulties': questions_api.difficulties,
                     'levels': list(levels.keys())
@@ -473,6 +1635,91 @@ def export_json():
             'message': str(e)
         }), 500
 
+@app.route(f'{API_BASE_URL}/export/<any(arrow, parquet):fmt>')
+def export_columnar(fmt):
+    """Export all questions as an Arrow IPC stream or a Parquet file"""
+    if pa is None:
+        return jsonify({
+            'success': False,
+            'error': 'Export unavailable',
+            'message': 'Columnar exports require pyarrow (pip install pyarrow)'
+        }), 501
+    
+    include_answers = request.args.get('include_answers', 'true').lower() == 'true'
+    questions = questions_api.all_questions  # Copy-on-write: a stable snapshot
+    
+    return Response(
+        iter_columnar_export(fmt, questions, include_answers),
+        mimetype=COLUMNAR_MIMETYPES[fmt],
+        headers={
+            'Content-Disposition': f'attachment; filename=aws_trivia_questions.{fmt}',
+            'X-Corpus-Version': str(questions_api.version)
+        }
+    )
+
+# Warm-up
+WARMUP_PATHS = [
+    '/',
+    f'{API_BASE_URL}/info',
+    f'{API_BASE_URL}/categories',
+    f'{API_BASE_URL}/difficulties',
+    f'{API_BASE_URL}/levels',
+    f'{API_BASE_URL}/questions',
+    f'{API_BASE_URL}/questions/random',
+    f'{API_BASE_URL}/export/json',
+    f'{API_BASE_URL}/export/json?include_answers=false',
+] + [f'{API_BASE_URL}/questions/level/{level}' for level in levels]
+
+warmup_status = {
+    'ready': False,
+    'started_at': None,
+    'completed_at': None,
+    'duration_ms': None,
+    'error': None
+}
+
+def warm_up():
+    """Build indexes and fragments, then prime common responses in-process
+    
+    The worker is marked ready only if this succeeds; a failure is recorded
+    in warmup_status and keeps /ready at 503.
+    """
+    warmup_status['started_at'] = datetime.utcnow().isoformat()
+    started = time.perf_counter()
+    try:
+        questions_api.build_indexes()
+        for kind in (True, False):
+            questions_api.serialized_questions(include_answers=kind)
+        
+        # Degraded-mode packs for the most common draws
+        pack_pool.fill(DEFAULT_QUESTIONS_PER_REQUEST)
+        for level in levels:
+            pack_pool.fill(DEFAULT_QUESTIONS_PER_REQUEST, {'level': level})
+        
+        client = app.test_client()
+        for path in WARMUP_PATHS:
+            response = client.get(path, environ_base={WARMUP_ENVIRON_KEY: True})
+            if response.status_code >= 500:
+                raise RuntimeError(f"{path} returned {response.status_code}")
+        warmup_status['ready'] = True
+    except Exception as e:
+        warmup_status['error'] = str(e)
+        print(f"Warm-up failed: {e}")
+    finally:
+        warmup_status['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        warmup_status['completed_at'] = datetime.utcnow().isoformat()
+
+def start_warm_up():
+    """Warm this worker up in the background; called by the server entrypoints only
+    
+    Importing the module (the CLI tools, benchmarks) does not warm up.
+    Under gunicorn, gunicorn.conf.py calls this in each worker.
+    """
+    if not WARMUP_ON_BOOT:
+        warmup_status['ready'] = True
+    elif warmup_status['started_at'] is None:
+        threading.Thread(target=warm_up, name='warmup', daemon=True).start()
+
 # Error handlers
 @app.errorhandler(404)
 def not_found(error):
@@ -499,6 +1746,31 @@ def internal_error(error):
     }), 500
 
 if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='AWS Trivia Questions API Server')
+    parser.add_argument('--write-id-map', action='store_true',
+                        help='Freeze legacy ids for the current corpus into question_ids.json and exit')
+    parser.add_argument('--export', choices=sorted(COLUMNAR_MIMETYPES),
+                        help='Write the corpus in a columnar format and exit')
+    parser.add_argument('--output', help='Output path for --export (default: aws_trivia_questions.<format>)')
+    parser.add_argument('--no-answers', action='store_true', help='Leave the answer column out of --export')
+    args = parser.parse_args()
+    
+    if args.export:
+        if pa is None:
+            raise SystemExit('Columnar exports require pyarrow (pip install pyarrow)')
+        output = args.output or f'aws_trivia_questions.{args.export}'
+        with open(output, 'wb') as f:
+            for chunk in iter_columnar_export(args.export, questions_api.all_questions, not args.no_answers):
+                f.write(chunk)
+        print(f"📦 Exported {len(questions_api.all_questions)} questions to {output}")
+        raise SystemExit(0)
+    
+    if args.write_id_map:
+        count = questions_api.write_id_map()
+        print(f"🆔 Wrote {count} legacy id mappings to {ID_MAP_PATH}")
+        raise SystemExit(0)
+    
     port = int(os.environ.get('PORT', 5001))
     debug = os.environ.get('DEBUG', 'False').lower() == 'true'
     
@@ -511,4 +1783,5 @@ if __name__ == '__main__':
     print(f"📚 API Docs: http://localhost:{port}")
     print(f"🔗 API Base: http://localhost:{port}{API_BASE_URL}")
     
+    start_warm_up()
     app.run(host='0.0.0.0', port=port, debug=debug)
@@ -0,0 +1,582 @@
+#!/usr/bin/env python3
+"""
+AWS Trivia Game Server - asyncio Version
+Same length-prefixed JSON protocol and game flow as server_fixed.py, served from
+a single event loop so one core can hold tens of thousands of connections
+"""
+
+import asyncio
+import resource
+import signal
+import time
+import argparse
+import json
+from questions import questions
+from question_pack import QuestionPack
+from network_utils import (encode_message, frame_payload, ping_message, rtt_summary, MessageReader, Heartbeat,
+                           HEARTBEAT_INTERVAL, IDLE_TIMEOUT)
+from leaderboard import Leaderboard
+
+try:
+    import uvloop  # Optional: faster drop-in event loop
+    HAS_UVLOOP = True
+except ImportError:
+    HAS_UVLOOP = False
+
+# Game configuration
+HOST = '0.0.0.0'
+PORT = 5000
+MAX_PLAYERS = 20000
+QUESTION_TIMEOUT = 15
+WAIT_TIME_BETWEEN_QUESTIONS = 3
+QUESTIONS_PER_GAME = 20
+JOIN_TIMEOUT = 30.0  # Seconds a new connection has to send its join message
+
+# Connection handling
+LISTEN_BACKLOG = 4096
+MAX_WRITE_BUFFER = 1024 * 1024  # Bytes queued for one client before it is dropped as too slow
+READ_BUFFER_SIZE = 1024  # Initial per-connection receive buffer; client messages are small and it grows on demand
+LOBBY_BROADCAST_INTERVAL = 0.1  # Seconds; player_joined/player_left are coalesced to one per interval
+METRICS_INTERVAL = 0  # Seconds between metrics lines; 0 disables
+METRICS_SLOWEST_PLAYERS = 5  # Players with the highest RTT listed per metrics line
+
+# Relays (relay_server.py): many players multiplexed over one connection
+RELAY_BATCH_LIMIT = 512  # Per-player messages per relay_batch frame; a full batch is sent at once
+RELAY_MAX_WRITE_BUFFER = 64 * 1024 * 1024  # A relay link carries every player behind it
+
+class TriviaProtocol(asyncio.Protocol):
+    """One client connection: frames incoming bytes and dispatches messages to the server"""
+    
+    link = None  # The RelayLink a player arrived through; None for direct connections
+    
+    def __init__(self, server):
+        self.server = server
+        self.reader = MessageReader(buffer_size=READ_BUFFER_SIZE)
+        self.transport = None
+        self.nickname = None
+        self.join_timer = None
+        self.relay_link = None  # Set when this connection is a relay rather than a player
+        self.heartbeat = Heartbeat()
+        
+    def connection_made(self, transport):
+        self.transport = transport
+        if self.server.player_count() >= self.server.max_players:
+            self.reject("Game is full. Try again later.")
+            return
+        self.join_timer = asyncio.get_running_loop().call_later(JOIN_TIMEOUT, transport.close)
+        
+    def data_received(self, data):
+        self.heartbeat.seen()
+        self.reader.feed(data)
+        try:
+            while True:
+                message = self.reader.pop_message()
+                if message is None:
+                    break
+                self.handle_message(message)
+                if self.transport.is_closing():
+                    break
+        except Exception as e:
+            print(f"Error handling client {self.nickname or self.peer()}: {e}")
+            self.transport.abort()
+            
+    def connection_lost(self, exc):
+        if self.join_timer:
+            self.join_timer.cancel()
+        if self.relay_link:
+            self.server.remove_relay(self.relay_link)
+        if self.nickname:
+            print(f"Client {self.nickname} disconnected")
+            self.server.remove_player(self)
+            
+    def handle_message(self, message):
+        """Dispatch one decoded message"""
+        if message["type"] == "pong":
+            self.heartbeat.pong(message)
+            return
+        if self.relay_link:
+            self.relay_link.handle_message(message)
+            return
+            
+        if self.nickname is None:
+            if message["type"] == "join":
+                self.join(message.get("nickname"))
+            elif message["type"] == "relay_hello" and self.link is None:
+                self.join_timer.cancel()
+                self.join_timer = None
+                self.relay_link = self.server.add_relay(self, str(message.get("name") or self.peer()))
+            return
+            
+        if message["type"] == "start_game":
+            self.server.start_game()
+        elif message["type"] == "answer" and self.server.game_in_progress:
+            self.server.process_answer(self, message["answer"])
+            
+    def join(self, nickname):
+        """Validate the nickname and register the player"""
+        if not nickname or len(nickname.strip()) == 0:
+            self.reject("Invalid nickname")
+            return
+            
+        if not self.server.accepting_joins():
+            self.reject("Game already in progress. Try again later.")
+            return
+            
+        nickname = nickname.strip()[:20]  # Limit nickname length
+        if not self.server.add_player(self, nickname):
+            self.reject("Nickname already taken")
+            return
+            
+        if self.join_timer:
+            self.join_timer.cancel()
+            self.join_timer = None
+        self.nickname = nickname
+        
+        # If this is the first player, give them admin controls
+        if self.server.player_count() == 1:
+            self.send({
+                "type": "admin_rights",
+                "message": "You are the host. Type 'start' to begin the game."
+            })
+        else:
+            self.send({
+                "type": "wait_message",
+                "message": "Waiting for the host to start the game..."
+            })
+            
+    def send(self, message):
+        """Send a message to this client"""
+        self.send_frame(encode_message(message))
+        
+    def send_frame(self, frame):
+        """Write a pre-encoded frame, dropping the client if it has stopped reading"""
+        if self.transport.is_closing():
+            return False
+        limit = MAX_WRITE_BUFFER if self.relay_link is None else RELAY_MAX_WRITE_BUFFER
+        if self.transport.get_write_buffer_size() > limit:
+            print(f"Dropping slow client {self.nickname or self.peer()}")
+            self.transport.abort()
+            return False
+        self.transport.writelines(frame)
+        return True
+        
+    def reject(self, reason):
+        """Send an error and close once it has been flushed"""
+        self.send({"type": "error", "message": reason})
+        self.transport.close()
+        
+    def peer(self):
+        return self.transport.get_extra_info('peername') if self.transport else None
+        
+        
+class RelayedPlayer(TriviaProtocol):
+    """A player connected to a relay: same game logic, but every message
+    to or from it travels in its relay's batches"""
+    
+    def __init__(self, server, link, player_id):
+        super().__init__(server)
+        self.link = link
+        self.player_id = player_id
+        
+    def send_frame(self, frame):
+        """Queue the frame's payload for the relay to deliver"""
+        return self.link.queue(self.player_id, frame[1])
+        
+    def reject(self, reason):
+        """Send an error, then tell the relay to close the client"""
+        self.send({"type": "error", "message": reason})
+        self.link.drop(self.player_id)
+        
+    def peer(self):
+        return f"relay {self.link.name}"
+        
+        
+class RelayLink:
+    """A relay connected downstream, carrying many players over one connection
+    
+    Broadcasts go to the relay once, in a relay_broadcast envelope stamped
+    with the origin's send time; the relay fans them out to its own players
+    and relays. Per-player messages in both directions travel as relay_batch
+    frames of [player id, message] pairs, where a null message means the
+    player left (upstream) or must be disconnected (downstream).
+    """
+    
+    def __init__(self, server, protocol, name):
+        self.server = server
+        self.protocol = protocol
+        self.name = name
+        self.players = {}  # {player id: RelayedPlayer}
+        self.pending = []  # Encoded [player id, message] pairs for the next batch
+        self.flush_handle = None
+        
+    def handle_message(self, message):
+        """Dispatch a batch of player messages from the relay"""
+        if message["type"] != "relay_batch":
+            return
+        for player_id, client_message in message["messages"]:
+            player = self.players.get(player_id)
+            if client_message is None:
+                if player:
+                    del self.players[player_id]
+                    player.connection_lost(None)
+                continue
+            if player is None:
+                player = self.players[player_id] = RelayedPlayer(self.server, self, player_id)
+                if self.server.player_count() >= self.server.max_players:
+                    player.reject("Game is full. Try again later.")
+                    continue
+            player.handle_message(client_message)
+            
+    def queue(self, player_id, payload):
+        """Queue an encoded message (None: disconnect) for one of this relay's players"""
+        if self.protocol.transport.is_closing():
+            return False
+        self.pending.append(b'[%d,%b]' % (player_id, payload if payload is not None else b'null'))
+        if len(self.pending) >= RELAY_BATCH_LIMIT:
+            self.flush()
+        elif self.flush_handle is None:
+            # Everything sent to this relay's players in one loop iteration shares a frame
+            self.flush_handle = asyncio.get_running_loop().call_soon(self.flush)
+        return True
+        
+    def drop(self, player_id):
+        """Forget a player and have the relay close its connection"""
+        self.players.pop(player_id, None)
+        self.queue(player_id, None)
+        
+    def flush(self):
+        """Send the pending per-player messages as one relay_batch frame"""
+        if self.flush_handle:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        if not self.pending:
+            return
+        payload = b'{"type": "relay_batch", "messages": [' + b', '.join(self.pending) + b']}'
+        self.pending = []
+        self.protocol.send_frame(frame_payload(payload))
+        
+    def send_broadcast(self, envelope):
+        """Forward a broadcast envelope, after any per-player messages queued before it"""
+        self.flush()
+        self.protocol.send_frame(envelope)
+        
+    def close(self):
+        """The relay went away: every player behind it leaves"""
+        if self.flush_handle:
+            self.flush_handle.cancel()
+        players, self.players = self.players, {}
+        for player in players.values():
+            player.connection_lost(None)
+            
+            
+def ping_connections(protocols):
+    """Ping each connection with one shared frame, aborting those silent for IDLE_TIMEOUT"""
+    frame = encode_message(ping_message())
+    now = time.monotonic()
+    for protocol in protocols:
+        if protocol.heartbeat.is_idle(now):
+            print(f"Client {protocol.nickname or protocol.peer()} sent nothing for {IDLE_TIMEOUT:.0f}s; "
+                  f"disconnecting")
+            protocol.transport.abort()
+        else:
+            protocol.send_frame(frame)
+
+
+class AsyncTriviaServer:
+    """Main server class that manages the game on one event loop
+    
+    All state is touched only from the loop thread, so no locks are needed.
+    """
+    
+    tier = 0  # Relays count their distance from this origin server
+    
+    def __init__(self, host=HOST, port=PORT, max_players=MAX_PLAYERS, question_count=QUESTIONS_PER_GAME,
+                 metrics_interval=METRICS_INTERVAL):
+        self.host = host
+        self.port = port
+        self.max_players = max_players
+        self.question_count = question_count
+        self.metrics_interval = metrics_interval
+        self.players = {}  # {TriviaProtocol: nickname}, in join order, direct and relayed
+        self.local_players = {}  # {TriviaProtocol: None}, players connected directly
+        self.relays = {}  # {RelayLink: None}
+        self.leaderboard = Leaderboard()  # Scores, ranks and top-K snapshots
+        self.game_in_progress = False
+        self.pack = QuestionPack([])  # Drawn afresh, and pre-encoded, as each game starts
+        self.current_question_index = 0
+        self.answered_current_question = set()
+        self.all_answered = None
+        self.game_task = None
+        self.lobby_update = None  # Latest coalesced player_joined/player_left message
+        self.lobby_handle = None
+        self.heartbeat_handle = None
+        self.metrics_handle = None
+        self.server = None
+        
+    async def serve(self):
+        """Accept connections until cancelled"""
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.shutdown)
+            
+        self.server = await loop.create_server(
+            lambda: TriviaProtocol(self), self.host, self.port,
+            reuse_address=True, backlog=LISTEN_BACKLOG)
+        print(f"Server started on {self.host}:{self.port}" + (" (uvloop)" if HAS_UVLOOP else ""))
+        print("Waiting for players to connect...")
+        self.heartbeat_handle = loop.call_later(HEARTBEAT_INTERVAL, self.send_heartbeats)
+        if self.metrics_interval > 0:
+            self.metrics_handle = loop.call_later(self.metrics_interval, self.report_metrics)
+        try:
+            await self.server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+            
+    def shutdown(self):
+        """Shutdown the server gracefully"""
+        print("\nShutting down server...")
+        if self.game_task:
+            self.game_task.cancel()
+        for handle in (self.heartbeat_handle, self.metrics_handle):
+            if handle:
+                handle.cancel()
+        if self.server:
+            self.server.close()
+            
+    def player_count(self):
+        return len(self.players)
+        
+    def accepting_joins(self):
+        """Players may only join between games"""
+        return not self.game_in_progress
+        
+    def add_player(self, protocol, nickname):
+        """Register a player; False if the nickname is taken"""
+        if nickname in self.leaderboard:
+            return False
+        self.players[protocol] = nickname
+        if protocol.link is None:
+            self.local_players[protocol] = None
+        self.leaderboard.add(nickname)
+        print(f"Player {nickname} joined from {protocol.peer()}")
+        self.queue_lobby_update({
+            "type": "player_joined",
+            "nickname": nickname,
+            "player_count": len(self.players)
+        })
+        return True
+        
+    def remove_player(self, protocol):
+        """Forget a disconnected player"""
+        nickname = self.players.pop(protocol, None)
+        if nickname is None:
+            return
+        self.local_players.pop(protocol, None)
+        self.leaderboard.remove(nickname)
+        self.answered_current_question.discard(protocol)
+        self.queue_lobby_update({
+            "type": "player_left",
+            "nickname": nickname,
+            "player_count": len(self.players)
+        })
+        self.check_all_answered()
+        
+    def add_relay(self, protocol, name):
+        """Accept a relay connection; its players join through relay_batch messages"""
+        link = RelayLink(self, protocol, name)
+        self.relays[link] = None
+        print(f"Relay {name} connected from {protocol.peer()}")
+        protocol.send({"type": "relay_welcome", "tier": self.tier + 1})
+        return link
+        
+    def remove_relay(self, link):
+        """Drop a relay and every player behind it"""
+        if self.relays.pop(link, 0) is None:
+            print(f"Relay {link.name} disconnected with {len(link.players)} players")
+            link.close()
+            
+    def queue_lobby_update(self, message):
+        """Coalesce lobby notifications so a join storm costs one broadcast per interval"""
+        self.lobby_update = message
+        if self.lobby_handle is None:
+            self.lobby_handle = asyncio.get_running_loop().call_later(
+                LOBBY_BROADCAST_INTERVAL, self.flush_lobby_update)
+                
+    def flush_lobby_update(self):
+        self.lobby_handle = None
+        message, self.lobby_update = self.lobby_update, None
+        if message:
+            self.broadcast(message)
+            
+    def broadcast(self, message):
+        """Encode once and write the same frame to every direct player, and one envelope per relay"""
+        self.broadcast_frame(encode_message(message))
+        
+    def broadcast_frame(self, frame):
+        """Write a pre-encoded frame to every direct player, and one envelope per relay"""
+        if self.relays:
+            # Relays first: their players sit one more hop away
+            envelope = frame_payload(b'{"type": "relay_broadcast", "sent_at": %.6f, "message": %b}'
+                                     % (time.time(), frame[1]))
+            for link in list(self.relays):
+                link.send_broadcast(envelope)
+        for protocol in list(self.local_players):
+            protocol.send_frame(frame)
+            
+    def send_heartbeats(self):
+        """Ping direct players and relays, dropping any gone silent, then reschedule"""
+        self.heartbeat_handle = asyncio.get_running_loop().call_later(HEARTBEAT_INTERVAL, self.send_heartbeats)
+        ping_connections(list(self.local_players) + [link.protocol for link in self.relays])
+        
+    def get_metrics(self):
+        """Player counts, RTT over direct players (slowest first) and per relay
+        
+        Players behind a relay are measured by the relay, which pings them itself.
+        """
+        rtt = rtt_summary({protocol.nickname: protocol.heartbeat for protocol in self.local_players})
+        rtt["slowest"] = rtt["slowest"][:METRICS_SLOWEST_PLAYERS]
+        return {
+            "players": len(self.players),
+            "direct_players": len(self.local_players),
+            "game_in_progress": self.game_in_progress,
+            "question": self.current_question_index,
+            "rtt": rtt,
+            "relays": {link.name: dict(link.protocol.heartbeat.stats(), players=len(link.players))
+                       for link in self.relays}
+        }
+        
+    def report_metrics(self):
+        """Print a metrics line, then reschedule for metrics_interval seconds later"""
+        print(f"[metrics] {json.dumps(self.get_metrics())}")
+        self.metrics_handle = asyncio.get_running_loop().call_later(self.metrics_interval, self.report_metrics)
+        
+    def start_game(self):
+        if self.game_in_progress or not self.players:
+            return
+        self.game_in_progress = True
+        self.game_task = asyncio.get_running_loop().create_task(self.run_game())
+        
+    async def run_game(self):
+        """Run the trivia game"""
+        self.pack = QuestionPack.draw(questions, self.question_count, {"timeout": QUESTION_TIMEOUT})
+        self.leaderboard.reset_snapshot()
+        self.broadcast({
+            "type": "game_starting",
+            "message": "Game is starting!",
+            "player_count": len(self.players)
+        })
+        await asyncio.sleep(2)
+        
+        try:
+            for number in range(1, len(self.pack) + 1):
+                self.answered_current_question = set()
+                self.all_answered = asyncio.Event()
+                self.current_question_index = number
+                self.broadcast_frame(self.pack.question(number))
+                
+                try:
+                    await asyncio.wait_for(self.all_answered.wait(), QUESTION_TIMEOUT)
+                except asyncio.TimeoutError:
+                    # Send the correct answer to all clients
+                    self.broadcast_frame(self.pack.timeout(number))
+                    
+                self.send_leaderboard()
+                if number < len(self.pack):
+                    await asyncio.sleep(WAIT_TIME_BETWEEN_QUESTIONS)
+                    
+            self.end_game()
+        finally:
+            # Reset game state
+            self.game_in_progress = False
+            self.current_question_index = 0
+            self.all_answered = None
+            
+    def process_answer(self, protocol, answer_index):
+        """Process a player's answer to the current question"""
+        if protocol in self.answered_current_question or self.all_answered is None:
+            return  # Already answered, or between questions
+        if self.all_answered.is_set():
+            return
+            
+        correct = answer_index == self.pack.answer(self.current_question_index)
+        if correct:
+            self.leaderboard.update(protocol.nickname)
+            
+        self.answered_current_question.add(protocol)
+        protocol.send_frame(self.pack.feedback(self.current_question_index, correct))
+        self.check_all_answered()
+        
+    def check_all_answered(self):
+        """Close the question early once every connected player has answered"""
+        if self.all_answered is not None and len(self.answered_current_question) >= len(self.players):
+            self.all_answered.set()
+            
+    def get_leaderboard(self):
+        """Get the top of the leaderboard, highest score first"""
+        return self.leaderboard.top()
+        
+    def send_leaderboard(self):
+        """Send the top K to everyone (in full once per game, then only changes) and each player's own rank"""
+        full, entries, size = self.leaderboard.top_delta()
+        if full:
+            self.broadcast({
+                "type": "leaderboard",
+                "scores": entries,
+                "players": len(self.players)
+            })
+        elif entries is not None:
+            self.broadcast({
+                "type": "leaderboard_delta",
+                "changes": entries,
+                "size": size,
+                "players": len(self.players)
+            })
+        protocols = {nickname: protocol for protocol, nickname in self.players.items()}
+        for nickname, rank, score in self.leaderboard.rank_changes():
+            protocols[nickname].send({
+                "type": "rank",
+                "rank": rank,
+                "score": score,
+                "players": len(self.players)
+            })
+            
+    def end_game(self):
+        """End the game and announce the winner"""
+        leaderboard = self.get_leaderboard()
+        winner = leaderboard[0] if leaderboard else None
+        self.broadcast({
+            "type": "game_over",
+            "winner": winner[0] if winner else "No winner",
+            "final_scores": leaderboard
+        })
+
+
+def raise_file_limit():
+    """Raise the open-file soft limit to the hard limit so 10k+ sockets fit"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='AWS Trivia Game Server (asyncio)')
+    parser.add_argument('--host', default=HOST, help='Interface to bind')
+    parser.add_argument('--port', type=int, default=PORT, help='Port to listen on')
+    parser.add_argument('--max-players', type=int, default=MAX_PLAYERS, help='Maximum players per game')
+    parser.add_argument('--questions', type=int, default=QUESTIONS_PER_GAME, help='Questions per game')
+    parser.add_argument('--metrics-interval', type=float, default=METRICS_INTERVAL,
+                        help='Seconds between metrics lines with per-player and per-relay RTT (0 disables)')
+    
+    args = parser.parse_args()
+    
+    print(f"Open file limit: {raise_file_limit()}")
+    if HAS_UVLOOP:
+        uvloop.install()
+    server = AsyncTriviaServer(args.host, args.port, args.max_players, args.questions, args.metrics_interval)
+    asyncio.run(server.serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Benchmark script for the AWS Trivia Questions API
+Runs in-process against the Flask test client, so no server needs to be running
+"""
+
+import argparse
+import random
+import time
+from api_server import app, questions_api, MAX_GRADE_ITEMS_PER_REQUEST
+
+def benchmark_grade(batch_size=MAX_GRADE_ITEMS_PER_REQUEST, rounds=20):
+    """Benchmark POST /api/v1/grade with a batch of answers per request"""
+    client = app.test_client()
+    question_ids = list(questions_api.questions_by_id.keys())
+    answers = [
+        {"id": random.choice(question_ids), "answer": random.randint(0, 3)}
+        for _ in range(batch_size)
+    ]
+
+    # Warm up once so the first request's setup cost is not measured
+    client.post('/api/v1/grade', json={"answers": answers})
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        response = client.post('/api/v1/grade', json={"answers": answers})
+        assert response.status_code == 200, response.get_data(as_text=True)
+    elapsed = time.perf_counter() - start
+
+    per_request = elapsed / rounds
+    print(f"grade: {batch_size} answers/request, {rounds} requests")
+    print(f"  {per_request * 1000:.1f} ms/request, {batch_size / per_request:,.0f} answers/s")
+
+    # Grading alone, without HTTP and JSON overhead
+    start = time.perf_counter()
+    for _ in range(rounds):
+        questions_api.grade_answers(answers)
+    elapsed = time.perf_counter() - start
+    print(f"  grade_answers() only: {elapsed / rounds * 1000:.1f} ms/batch")
+
+def main():
+    parser = argparse.ArgumentParser(description='AWS Trivia API benchmarks')
+    parser.add_argument('--batch-size', type=int, default=MAX_GRADE_ITEMS_PER_REQUEST, help='Answers per grade request')
+    parser.add_argument('--rounds', type=int, default=20, help='Requests per benchmark')
+    args = parser.parse_args()
+
+    print("⏱️  AWS Trivia API Benchmarks")
+    print("=" * 40)
+    benchmark_grade(args.batch_size, args.rounds)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the length-prefixed message protocol
+Compares the framed MessageReader with the original receive_message implementation,
+per-client encoding with encode-once broadcast, and queued sends with a stalled client
+"""
+
+import argparse
+import json
+import socket
+import struct
+import threading
+import time
+from network_utils import (MessageReader, receive_message, send_message, encode_message, send_frame,
+                           ClientConnection, OutboundPump)
+
+def legacy_receive_all(sock, n):
+    """Original implementation: bytes concatenation, one recv per chunk"""
+    data = b''
+    while len(data) < n:
+        packet = sock.recv(n - len(data))
+        if not packet:
+            return None
+        data += packet
+    return data
+
+def legacy_receive_message(sock):
+    """Original implementation: separate reads for the length and the body"""
+    length_bytes = legacy_receive_all(sock, 4)
+    if not length_bytes:
+        return None
+    length = struct.unpack('!I', length_bytes)[0]
+    message_bytes = legacy_receive_all(sock, length)
+    if not message_bytes:
+        return None
+    return json.loads(message_bytes.decode('utf-8'))
+
+def encode(message):
+    payload = json.dumps(message).encode('utf-8')
+    return struct.pack('!I', len(payload)) + payload
+
+def run_case(name, message, count, receivers):
+    """Stream count copies of message over a socketpair and time each receiver"""
+    frame = encode(message)
+    print(f"{name}: {count} x {len(frame):,} bytes")
+    
+    for label, make_receive in receivers:
+        sender, receiver = socket.socketpair()
+        receiver.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        
+        def produce():
+            # Batch small frames together like a busy broadcast would
+            batch = frame * max(1, 65536 // len(frame))
+            per_batch = len(batch) // len(frame)
+            sent = 0
+            while sent < count:
+                n = min(per_batch, count - sent)
+                sender.sendall(batch if n == per_batch else frame * n)
+                sent += n
+            sender.close()
+            
+        producer = threading.Thread(target=produce)
+        receive = make_receive(receiver)
+        start = time.perf_counter()
+        producer.start()
+        received = 0
+        while receive() is not None:
+            received += 1
+        elapsed = time.perf_counter() - start
+        producer.join()
+        receiver.close()
+        
+        assert received == count, f"{label} received {received} of {count}"
+        mb = len(frame) * count / (1024 * 1024)
+        print(f"  {label:<22} {elapsed * 1000:8.1f} ms  {count / elapsed:12,.0f} msg/s  {mb / elapsed:8.1f} MB/s")
+
+def run_broadcast_case(players, messages=50):
+    """Time broadcasting a question to many sockets: encode per client vs encode once"""
+    question = {"type": "question", "question_number": 1, "total_questions": 20,
+                "question": "Which AWS service is used for object storage?",
+                "options": ["EBS", "S3", "EFS", "FSx"], "timeout": 15}
+    pairs = [socket.socketpair() for _ in range(players)]
+    senders = [sender for sender, _ in pairs]
+    
+    def per_client():
+        for sock in senders:
+            send_message(sock, question)
+    
+    def encode_once():
+        frame = encode_message(question)
+        for sock in senders:
+            send_frame(sock, frame)
+    
+    print(f"broadcast: {players} players x {messages} messages")
+    for label, broadcast in (('send_message per client', per_client), ('encode once + sendmsg', encode_once)):
+        start = time.process_time()
+        for _ in range(messages):
+            broadcast()
+        cpu = time.process_time() - start
+        print(f"  {label:<24} {cpu / messages * 1e6 / players:8.2f} us CPU per player per message")
+        # Drain so socket buffers never fill between runs
+        for _, receiver in pairs:
+            receiver.setblocking(False)
+            try:
+                while receiver.recv(1 << 20):
+                    pass
+            except BlockingIOError:
+                pass
+    
+    for sender, receiver in pairs:
+        sender.close()
+        receiver.close()
+
+def run_slow_client_case(players, messages=200):
+    """Broadcast through outbound queues while one client never reads
+    
+    Reports the skew between the first and last healthy client receiving
+    each message, and whether the stalled client was cut off.
+    """
+    pump = OutboundPump()
+    pairs = [socket.socketpair() for _ in range(players + 1)]
+    connections = [ClientConnection(sender, pump) for sender, _ in pairs]
+    arrivals = [[] for _ in range(players)]
+    
+    def read(index, sock):
+        reader = MessageReader(sock)
+        while len(arrivals[index]) < messages:
+            if reader.receive() is None:
+                break
+            arrivals[index].append(time.perf_counter())
+    
+    # The last client is stalled: its socket is never read
+    readers = [threading.Thread(target=read, args=(i, pairs[i][1])) for i in range(players)]
+    for thread in readers:
+        thread.start()
+    
+    padding = 'x' * 4096
+    enqueue_time = 0.0
+    for number in range(messages):
+        frame = encode_message({"type": "question", "question_number": number, "padding": padding})
+        sent_at = time.perf_counter()
+        for connection in connections:
+            connection.send(frame)
+        enqueue_time += time.perf_counter() - sent_at
+        time.sleep(0.001)  # Broadcasts are paced by the game, not back to back
+    for thread in readers:
+        thread.join()
+    
+    delivered = min(len(times) for times in arrivals)
+    skews = sorted(max(times[n] for times in arrivals) - min(times[n] for times in arrivals)
+                   for n in range(delivered))
+    print(f"stalled client: {players} healthy players + 1 stalled x {messages} messages")
+    print(f"  delivered to every healthy client: {delivered} of {messages}")
+    print(f"  broadcast enqueue {enqueue_time / messages * 1e6:8.1f} us per message")
+    print(f"  first-to-last skew p50 {skews[len(skews) // 2] * 1000:.2f} ms, max {skews[-1] * 1000:.2f} ms")
+    print(f"  stalled client disconnected: {connections[-1].overflowed}")
+    
+    for sender, receiver in pairs:
+        sender.close()
+        receiver.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Network protocol microbenchmarks')
+    parser.add_argument('--small', type=int, default=100000, help='Number of small messages')
+    parser.add_argument('--large', type=int, default=20, help='Number of large messages')
+    parser.add_argument('--large-size', type=int, default=4 * 1024 * 1024, help='Size of large messages in bytes')
+    args = parser.parse_args()
+    
+    receivers = [
+        ('legacy receive_message', lambda sock: lambda: legacy_receive_message(sock)),
+        ('receive_message', lambda sock: lambda: receive_message(sock)),
+        ('MessageReader', lambda sock: MessageReader(sock).receive),
+    ]
+    
+    print("⏱️  Length-prefixed protocol microbenchmarks")
+    print("=" * 40)
+    run_case("small (answer-sized)", {"type": "answer", "answer": 2}, args.small, receivers)
+    print()
+    leaderboard = {"type": "game_over", "winner": "p0",
+                   "final_scores": [[f"player{i}", i] for i in range(args.large_size // 20)]}
+    run_case("large (final scores)", leaderboard, args.large, receivers)
+    print()
+    for players in (10, 100, 500):
+        run_broadcast_case(players)
+    print()
+    run_slow_client_case(20, 400)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the broadcast relay tree
+Starts async_server.py as the origin plus a tree of relay_server.py processes
+(--fanout relays under each node, --depth tiers), spreads bot players evenly
+over the origin and every relay, plays a short game and reports, per tier,
+how long after the first delivery each question reached the players, along
+with the relays' own origin-to-tier latency lines
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+import time
+from network_utils import encode_message
+from async_server import raise_file_limit
+from benchmark_servers import Bot, new_stats, percentile, process_usage, wait_for_port
+
+CONNECT_CONCURRENCY = 200  # Connects in flight per bot process
+
+async def run_bots(endpoints, results):
+    """Connect one slice of bots, each to its (tier, port, name), and wait for the game to end"""
+    loop = asyncio.get_running_loop()
+    stats = {}
+    done = loop.create_future()
+    limit = asyncio.Semaphore(CONNECT_CONCURRENCY)
+    bots = []
+    
+    async def connect(tier, port, name):
+        tier_stats = stats.setdefault(tier, new_stats())
+        async with limit:
+            try:
+                _, bot = await loop.create_connection(lambda: Bot(name, tier_stats, done), '127.0.0.1', port)
+            except OSError:
+                tier_stats['errors'] += 1
+                return
+            bots.append(bot)
+            await bot.joined
+            
+    await asyncio.gather(*(connect(*endpoint) for endpoint in endpoints))
+    results.put(('joined', len(endpoints)))
+    while sum(s['finished'] + s['lost'] for s in stats.values()) < len(bots):
+        await asyncio.sleep(0.1)
+    done.set_result(None)
+    for bot in bots:
+        bot.transport.close()
+    results.put(('stats', stats))
+
+
+def bot_process(endpoints, results):
+    raise_file_limit()
+    asyncio.run(run_bots(endpoints, results))
+
+
+async def run_host(port, endpoints, results, processes, timeout):
+    """Join the origin as the host, wait for every bot to join, then start the game"""
+    loop = asyncio.get_running_loop()
+    stats = new_stats()
+    done = loop.create_future()
+    _, host = await loop.create_connection(lambda: Bot("host", stats, done), '127.0.0.1', port)
+    await host.joined
+    
+    workers = [multiprocessing.Process(target=bot_process, args=(endpoints[i::processes], results))
+               for i in range(processes)]
+    for worker in workers:
+        worker.start()
+    joined = 0
+    deadline = time.time() + timeout
+    while joined < len(endpoints) and time.time() < deadline:
+        try:
+            kind, count = await loop.run_in_executor(None, results.get, True, 1.0)
+            joined += count
+        except Exception:
+            pass
+    print(f"{joined:,} bots joined")
+    
+    host.transport.writelines(encode_message({"type": "start_game"}))
+    while True:
+        message = await host.messages.get()
+        if message["type"] == "game_over":
+            break
+    done.set_result(None)
+    
+    merged = {0: [stats]}
+    for _ in workers:
+        kind, worker_stats = await loop.run_in_executor(None, results.get)
+        for tier, tier_stats in worker_stats.items():
+            merged.setdefault(tier, []).append(tier_stats)
+    for worker in workers:
+        worker.join()
+    return merged
+
+
+def start_process(args, log_lines):
+    """Start a server or relay, keeping its '[relay' log lines"""
+    process = subprocess.Popen([sys.executable] + args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    
+    def collect_output():
+        for line in process.stdout:
+            if line.startswith('[relay'):
+                log_lines.append(line.rstrip())
+                
+    threading.Thread(target=collect_output, daemon=True).start()
+    return process
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Relay tree broadcast latency benchmark')
+    parser.add_argument('--players', type=int, default=2000, help='Bot players, spread over the origin and every relay')
+    parser.add_argument('--fanout', type=int, default=2, help='Relays under the origin and under each relay')
+    parser.add_argument('--depth', type=int, default=2, help='Relay tiers below the origin')
+    parser.add_argument('--questions', type=int, default=3, help='Questions per game')
+    parser.add_argument('--port', type=int, default=5200, help='Origin port; relays use the following ports')
+    parser.add_argument('--client-processes', type=int, default=4, help='Bot processes')
+    parser.add_argument('--join-timeout', type=float, default=120.0, help='Seconds to wait for all bots to join')
+    args = parser.parse_args()
+    
+    raise_file_limit()
+    here = os.path.dirname(os.path.abspath(__file__))
+    log_lines = []
+    processes = []
+    print("⏱️  Relay tree benchmark")
+    print("=" * 40)
+    try:
+        origin = start_process([os.path.join(here, 'async_server.py'), '--port', str(args.port),
+                                '--max-players', str(args.players + 1), '--questions', str(args.questions)],
+                               log_lines)
+        processes.append(origin)
+        if not wait_for_port(args.port):
+            print("Origin server did not start")
+            return
+            
+        # Build the tree a tier at a time: (tier, port) of every node
+        nodes = [(0, args.port)]
+        parents = [args.port]
+        next_port = args.port + 1
+        for tier in range(1, args.depth + 1):
+            children = []
+            for parent in parents:
+                for _ in range(args.fanout):
+                    processes.append(start_process(
+                        [os.path.join(here, 'relay_server.py'), '--port', str(next_port),
+                         '--upstream-port', str(parent), '--name', f"t{tier}-{next_port}"], log_lines))
+                    children.append(next_port)
+                    nodes.append((tier, next_port))
+                    next_port += 1
+            for port in children:
+                if not wait_for_port(port):
+                    print(f"Relay on port {port} did not start")
+                    return
+            parents = children
+        print(f"origin + {len(nodes) - 1} relays in {args.depth} tiers, {args.players:,} players")
+        time.sleep(0.5)  # Let the probe connections' join timers lapse quietly
+        
+        endpoints = [(*nodes[i % len(nodes)], f"bot{i}") for i in range(args.players)]
+        results = multiprocessing.Queue()
+        cpu_before = [process_usage(process.pid)[0] for process in processes]
+        merged = asyncio.run(run_host(args.port, endpoints, results, max(1, args.client_processes), args.join_timeout))
+        cpu_after = [process_usage(process.pid)[0] for process in processes]
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+            
+    for number in range(1, args.questions + 1):
+        arrivals = {tier: [t for stats in tier_stats for t in stats['questions'].get(number, [])]
+                    for tier, tier_stats in merged.items()}
+        first = min((min(times) for times in arrivals.values() if times), default=None)
+        if first is None:
+            continue
+        print(f"question {number}:")
+        for tier in sorted(arrivals):
+            times = arrivals[tier]
+            if times:
+                print(f"  tier {tier}: {len(times):>6,} players, after first delivery "
+                      f"p50 {(percentile(times, 0.5) - first) * 1000:.1f} ms "
+                      f"p99 {(percentile(times, 0.99) - first) * 1000:.1f} ms "
+                      f"last {(max(times) - first) * 1000:.1f} ms")
+    for line in log_lines:
+        if 'broadcasts this game' in line or 'player RTT' in line:
+            print(line)
+    finished = sum(stats['finished'] for tier_stats in merged.values() for stats in tier_stats)
+    errors = sum(stats['errors'] + stats['lost'] for tier_stats in merged.values() for stats in tier_stats)
+    print(f"finished {finished:,} of {args.players + 1:,}, errors {errors}")
+    print(f"origin CPU {cpu_after[0] - cpu_before[0]:.2f}s, relays CPU "
+          f"{sum(cpu_after[1:]) - sum(cpu_before[1:]):.2f}s")
+
+if __name__ == '__main__':
+    main()
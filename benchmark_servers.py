@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the trivia game servers
+Starts server_fixed.py (thread per client) or async_server.py (one event loop) as a
+subprocess, connects many bot players, plays a short game and reports join rate,
+question fan-out skew, answer feedback latency and server CPU/memory
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from network_utils import encode_message, pong_message, MessageReader
+from async_server import raise_file_limit
+
+SERVERS = {
+    'fixed': 'server_fixed.py',
+    'async': 'async_server.py',
+}
+CONNECT_CONCURRENCY = 200  # Connects in flight per bot process
+MAX_ANSWER_DELAY = 0.5     # Bots answer after a random delay up to this many seconds
+
+class Bot(asyncio.Protocol):
+    """A player that joins, answers every question and records timings"""
+    
+    def __init__(self, nickname, stats, done, answer=True):
+        self.nickname = nickname
+        self.stats = stats
+        self.done = done
+        self.answer = answer
+        self.reader = MessageReader()
+        self.transport = None
+        self.joined = asyncio.get_running_loop().create_future()
+        self.sent_at = None
+        self.finished = False
+        self.messages = asyncio.Queue()
+        
+    def connection_made(self, transport):
+        self.transport = transport
+        self.sent_at = time.time()
+        transport.writelines(encode_message({"type": "join", "nickname": self.nickname}))
+        
+    def data_received(self, data):
+        self.reader.feed(data)
+        while True:
+            message = self.reader.pop_message()
+            if message is None:
+                break
+            self.handle(message, time.time())
+            
+    def connection_lost(self, exc):
+        if not self.joined.done():
+            self.joined.set_result(False)
+        if not self.finished and not self.done.done():
+            self.stats['lost'] += 1
+            
+    def handle(self, message, now):
+        kind = message["type"]
+        if kind == "ping":
+            self.transport.writelines(encode_message(pong_message(message)))
+        elif kind in ("admin_rights", "wait_message"):
+            self.stats['join'].append(now - self.sent_at)
+            self.joined.set_result(True)
+        elif kind == "error":
+            self.stats['errors'] += 1
+        elif kind == "question":
+            self.stats['questions'].setdefault(message["question_number"], []).append(now)
+            if self.answer:
+                asyncio.get_running_loop().call_later(random.uniform(0, MAX_ANSWER_DELAY), self.send_answer)
+        elif kind == "answer_feedback":
+            self.stats['feedback'].append(now - self.sent_at)
+        elif kind == "game_over":
+            self.stats['finished'] += 1
+            self.finished = True
+            self.transport.close()
+        self.messages.put_nowait(message)
+        
+    def send_answer(self):
+        if not self.transport.is_closing():
+            self.sent_at = time.time()
+            self.transport.writelines(encode_message({"type": "answer", "answer": random.randint(0, 3)}))
+
+
+def new_stats():
+    return {'join': [], 'questions': {}, 'feedback': [], 'finished': 0, 'errors': 0, 'lost': 0}
+
+
+async def run_bots(port, names, results):
+    """Connect one slice of bots and wait for the game to end"""
+    loop = asyncio.get_running_loop()
+    stats = new_stats()
+    done = loop.create_future()
+    limit = asyncio.Semaphore(CONNECT_CONCURRENCY)
+    bots = []
+    
+    async def connect(name):
+        async with limit:
+            try:
+                _, bot = await loop.create_connection(lambda: Bot(name, stats, done), '127.0.0.1', port)
+            except OSError:
+                stats['errors'] += 1
+                return
+            bots.append(bot)
+            await bot.joined
+            
+    await asyncio.gather(*(connect(name) for name in names))
+    results.put(('joined', len(names)))
+    # Wait until every bot has seen game_over or lost its connection
+    while stats['finished'] + stats['lost'] < len(bots):
+        await asyncio.sleep(0.1)
+    done.set_result(None)
+    for bot in bots:
+        bot.transport.close()
+    results.put(('stats', stats))
+
+
+def bot_process(port, names, results):
+    raise_file_limit()
+    asyncio.run(run_bots(port, names, results))
+
+
+async def run_host(port, players, results, processes, timeout):
+    """Join as the host, wait for every bot to join, then start the game"""
+    loop = asyncio.get_running_loop()
+    stats = new_stats()
+    done = loop.create_future()
+    _, host = await loop.create_connection(lambda: Bot("host", stats, done), '127.0.0.1', port)
+    await host.joined
+    
+    # Host first (it gets admin rights), then the bots
+    names = [f"bot{i}" for i in range(players)]
+    workers = [multiprocessing.Process(target=bot_process, args=(port, names[i::processes], results))
+               for i in range(processes)]
+    join_start = time.time()
+    for worker in workers:
+        worker.start()
+    joined = 0
+    deadline = time.time() + timeout
+    while joined < players and time.time() < deadline:
+        try:
+            kind, count = await loop.run_in_executor(None, results.get, True, 1.0)
+            joined += count
+        except Exception:
+            pass
+    join_elapsed = time.time() - join_start
+    
+    host.transport.writelines(encode_message({"type": "start_game"}))
+    while True:
+        message = await host.messages.get()
+        if message["type"] == "game_over":
+            break
+    done.set_result(None)
+    
+    merged = [stats]
+    for _ in workers:
+        kind, worker_stats = await loop.run_in_executor(None, results.get)
+        merged.append(worker_stats)
+    for worker in workers:
+        worker.join()
+    return join_elapsed, merged
+
+
+def percentile(values, p):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def process_usage(pid):
+    """Server CPU seconds and resident memory in MB, from /proc (Linux only)"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        cpu = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+        with open(f"/proc/{pid}/status") as f:
+            rss = next(int(line.split()[1]) for line in f if line.startswith('VmRSS'))
+        return cpu, rss / 1024
+    except (OSError, StopIteration):
+        return float('nan'), float('nan')
+
+
+def wait_for_port(port, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def benchmark(server, players, args):
+    """Run one game on one server and print its numbers"""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), SERVERS[server])
+    process = subprocess.Popen(
+        [sys.executable, script, '--port', str(args.port), '--max-players', str(players + 1),
+         '--questions', str(args.questions)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_for_port(args.port):
+            print(f"{server}: server did not start")
+            return
+        time.sleep(0.5)  # Let the probe connection's handler give up on its join
+        results = multiprocessing.Queue()
+        processes = max(1, min(args.client_processes, players))
+        cpu_before, _ = process_usage(process.pid)
+        join_elapsed, merged = asyncio.run(run_host(args.port, players, results, processes, args.join_timeout))
+        cpu_after, rss = process_usage(process.pid)
+    finally:
+        process.terminate()
+        process.wait()
+        
+    joins = [t for stats in merged for t in stats['join']]
+    feedback = [t for stats in merged for t in stats['feedback']]
+    finished = sum(stats['finished'] for stats in merged)
+    errors = sum(stats['errors'] + stats['lost'] for stats in merged)
+    skews = []
+    for number in range(1, args.questions + 1):
+        arrivals = [t for stats in merged for t in stats['questions'].get(number, [])]
+        if arrivals:
+            skews.append(max(arrivals) - min(arrivals))
+            
+    print(f"{server:<6} {players:>6} players")
+    print(f"  joined {len(joins)} in {join_elapsed:.2f}s ({len(joins) / join_elapsed:,.0f}/s), "
+          f"join latency p50 {percentile(joins, 0.5) * 1000:.1f} ms p99 {percentile(joins, 0.99) * 1000:.1f} ms")
+    print(f"  question fan-out first-to-last: max {max(skews, default=float('nan')) * 1000:.1f} ms")
+    print(f"  answer feedback p50 {percentile(feedback, 0.5) * 1000:.1f} ms p99 {percentile(feedback, 0.99) * 1000:.1f} ms")
+    print(f"  finished {finished} of {players + 1}, errors {errors}")
+    print(f"  server CPU {cpu_after - cpu_before:.2f}s, RSS {rss:.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Trivia server benchmarks: threaded vs asyncio')
+    parser.add_argument('--servers', default='fixed,async', help='Comma-separated: fixed, async')
+    parser.add_argument('--players', default='100,1000', help='Comma-separated player counts')
+    parser.add_argument('--questions', type=int, default=2, help='Questions per game')
+    parser.add_argument('--port', type=int, default=5077, help='Port for the server under test')
+    parser.add_argument('--client-processes', type=int, default=4, help='Bot processes')
+    parser.add_argument('--join-timeout', type=float, default=120.0, help='Seconds to wait for all bots to join')
+    args = parser.parse_args()
+    
+    raise_file_limit()
+    print("⏱️  Trivia server benchmarks")
+    print("=" * 40)
+    for players in (int(p) for p in args.players.split(',')):
+        for server in args.servers.split(','):
+            benchmark(server, players, args)
+
+if __name__ == '__main__':
+    main()
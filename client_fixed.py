@@ -6,17 +6,20 @@ Reliable connection handling for multiplayer games
 
 import socket
 import json
+import math
 import threading
 import sys
 import time
 import curses
 import argparse
 from curses import wrapper
-from network_utils import send_message, receive_message
+from network_utils import send_message, pong_message, clock_sync_request, MessageReader, ClockSync, IDLE_TIMEOUT
 
 # Default connection settings
 DEFAULT_HOST = 'localhost'
 DEFAULT_PORT = 5000
+RESUME_ATTEMPTS = 5  # Reconnects tried after the connection drops mid-session
+RESUME_RETRY_DELAY = 1.0  # Seconds between them
 
 # UI Constants
 TITLE = "AWS Trivia Game"
@@ -30,10 +33,11 @@ NORMAL_COLOR = 6
 class TriviaClient:
     """Client for the AWS Trivia Game"""
     
-    def __init__(self, host, port, nickname):
+    def __init__(self, host, port, nickname, room=None):
         self.host = host
         self.port = port
         self.nickname = nickname
+        self.room = room
         self.client_socket = None
         self.connected = False
         self.current_question = None
@@ -43,14 +47,19 @@ class TriviaClient:
         self.answer_correct = None
         self.correct_answer = None
         self.leaderboard = []
+        self.my_rank = None  # (rank, score, players) from the server's rank messages
         self.timer_value = 0
         self.timer_active = False
+        self.deadline = None  # Current question's deadline on our monotonic clock
+        self.clock = ClockSync()  # Offset to the server's clock, measured after joining
         self.is_admin = False
         self.game_started = False
         self.game_over = False
         self.message = "Connecting to server..."
         self.lock = threading.RLock()
         self.receive_thread = None
+        self.resume_token = None  # From the server's session message; lets a dropped connection resume
+        self.last_seq = 0  # Highest broadcast sequence number seen, so a resume replays only what was missed
         
     def connect(self):
         """Connect to the server"""
@@ -63,13 +72,14 @@ class TriviaClient:
             self.client_socket.connect((self.host, self.port))
             self.connected = True
             
-            # Remove timeout after connection
-            self.client_socket.settimeout(None)
+            # The server pings every few seconds, so a silent connection is a dead one
+            self.client_socket.settimeout(IDLE_TIMEOUT)
             
             # Send nickname to server
             if not send_message(self.client_socket, {
                 "type": "join",
-                "nickname": self.nickname
+                "nickname": self.nickname,
+                "room": self.room
             }):
                 self.message = "Failed to send join message"
                 return False
@@ -92,28 +102,89 @@ class TriviaClient:
         return False
                 
     def receive_messages(self):
-        """Receive and process messages from the server"""
-        while self.connected:
-            try:
-                message = receive_message(self.client_socket)
-                if not message:
+        """Receive and process messages from the server, resuming the session if the connection drops"""
+        while True:
+            reader = MessageReader(self.client_socket)
+            while self.connected:
+                try:
+                    message = reader.receive()
+                    if not message:
+                        break
+                    self.process_message(message)
+                except Exception as e:
+                    with self.lock:
+                        self.message = f"Error receiving message: {e}"
                     break
-                self.process_message(message)
-            except Exception as e:
-                with self.lock:
-                    self.message = f"Error receiving message: {e}"
+            if not self.connected or self.game_over or not self.resume():
                 break
                 
         self.disconnect()
         
+    def resume(self):
+        """Reconnect and resume the session; False if there is none or the server is unreachable"""
+        for attempt in range(RESUME_ATTEMPTS):
+            if not self.resume_token:
+                return False
+            with self.lock:
+                self.message = f"Connection lost. Reconnecting ({attempt + 1}/{RESUME_ATTEMPTS})..."
+            time.sleep(RESUME_RETRY_DELAY)
+            try:
+                new_socket = socket.create_connection((self.host, self.port), timeout=10.0)
+                new_socket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+                new_socket.settimeout(IDLE_TIMEOUT)
+            except OSError:
+                continue
+            if send_message(new_socket, {
+                "type": "resume",
+                "room": self.room,
+                "nickname": self.nickname,
+                "token": self.resume_token,
+                "last_seq": self.last_seq
+            }):
+                old_socket, self.client_socket = self.client_socket, new_socket
+                try:
+                    old_socket.close()
+                except:
+                    pass
+                return True
+            new_socket.close()
+        return False
+                
     def process_message(self, message):
         """Process a message from the server"""
         message_type = message.get("type", "")
-        
+        if message_type == "ping":
+            self.send_game_message(pong_message(message))
+            return
+        if message_type == "clock_sync":
+            if self.clock.reply(message) and not self.clock.done:
+                self.send_game_message(clock_sync_request())
+            return
+            
         with self.lock:
+            self.last_seq = max(self.last_seq, message.get("seq", 0))
             if message_type == "error":
                 self.message = message["message"]
                 
+            elif message_type == "session":
+                self.resume_token = message["resume_token"]
+                self.room = message["room"]
+                self.nickname = message["nickname"]
+                self.clock = ClockSync()
+                self.send_game_message(clock_sync_request())
+                
+            elif message_type == "resumed":
+                # Missed broadcasts follow; after too long a gap, only new ones will
+                if not message["complete"]:
+                    self.last_seq = message["last_seq"]
+                self.answered = self.answered or message["answered"]
+                self.my_rank = (message["rank"], message["score"], message["players"])
+                self.message = f"Reconnected ({message['replayed']} missed updates)"
+                
+            elif message_type == "resume_failed":
+                self.resume_token = None
+                self.message = message["message"]
+                                
             elif message_type == "admin_rights":
                 self.is_admin = True
                 self.message = message["message"]
@@ -138,7 +209,8 @@ class TriviaClient:
                 self.answered = False
                 self.answer_correct = None
                 self.correct_answer = None
-                self.timer_value = message["timeout"]
+                self.deadline = self.local_deadline(message)
+                self.timer_value = max(0, math.ceil(self.deadline - time.monotonic()))
                 self.timer_active = True
                 self.message = f"Question {message['question_number']} of {message['total_questions']}"
                 
@@ -147,6 +219,10 @@ class TriviaClient:
                 timer_thread.daemon = True
                 timer_thread.start()
                 
+            elif message_type == "question_deadline":
+                # Most players have answered: the question now closes sooner
+                self.deadline = self.local_deadline(message)
+                
             elif message_type == "answer_feedback":
                 self.answered = True
                 self.answer_correct = message["correct"]
@@ -161,18 +237,46 @@ class TriviaClient:
             elif message_type == "leaderboard":
                 self.leaderboard = message["scores"]
                 
+            elif message_type == "leaderboard_delta":
+                # Only the changed top-K positions are sent after the first snapshot
+                del self.leaderboard[message["size"]:]
+                for position, nickname, score in message["changes"]:
+                    if position < len(self.leaderboard):
+                        self.leaderboard[position] = [nickname, score]
+                    else:
+                        self.leaderboard.append([nickname, score])
+                        
+            elif message_type == "rank":
+                self.my_rank = (message["rank"], message["score"], message["players"])
+                
             elif message_type == "game_over":
                 self.game_over = True
                 self.timer_active = False
                 self.message = f"Game Over! Winner: {message['winner']}"
                 self.leaderboard = message["final_scores"]
                 
+    def local_deadline(self, question):
+        """A question's deadline on our monotonic clock
+        
+        The server sends an absolute deadline on its own clock; without a clock
+        sync yet, the time between sent_at and the deadline is counted from now.
+        Servers without clock sync send a relative timeout instead.
+        """
+        if "deadline" not in question:
+            return time.monotonic() + question["timeout"]
+        if self.clock.offset is None:
+            return time.monotonic() + question["deadline"] - question["sent_at"]
+        return time.monotonic() + self.clock.remaining(question["deadline"])
+        
     def countdown_timer(self):
-        """Countdown timer for questions"""
-        while self.timer_active and self.timer_value > 0:
-            time.sleep(1)
+        """Countdown timer for questions, recomputed from the deadline so it cannot drift"""
+        while self.timer_active:
+            remaining = self.deadline - time.monotonic()
             with self.lock:
-                self.timer_value -= 1
+                self.timer_value = max(0, math.ceil(remaining))
+            if remaining <= 0:
+                break
+            time.sleep(remaining % 1 or 1)  # Wake as the displayed second changes
                 
     def submit_answer(self):
         """Submit the selected answer"""
@@ -198,7 +302,7 @@ class TriviaClient:
             except:
                 pass
             self.client_socket = None
-
+            
     # ... (rest of the UI code remains the same)
     def draw_screen(self, stdscr):
         """Draw the game screen"""
@@ -266,6 +370,11 @@ class TriviaClient:
                         leaderboard_text = f"{i+1}. {nickname}: {score} points"
                         stdscr.addstr(y_pos, 4, leaderboard_text[:width-6])
                         y_pos += 1
+                
+                if self.my_rank and y_pos < height - 2:
+                    rank, score, players = self.my_rank
+                    stdscr.addstr(y_pos, 4, f"You: #{rank} of {players} with {score} points"[:width-6], curses.A_BOLD)
+                    y_pos += 1
             
             # Draw instructions
             if y_pos < height - 4:
@@ -356,10 +465,11 @@ def main():
     parser.add_argument('--host', default=DEFAULT_HOST, help='Server host')
     parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='Server port')
     parser.add_argument('--nickname', required=True, help='Your nickname')
+    parser.add_argument('--room', help='Room code (players with the same code play together)')
     
     args = parser.parse_args()
     
-    client = TriviaClient(args.host, args.port, args.nickname)
+    client = TriviaClient(args.host, args.port, args.nickname, args.room)
     
     if not client.connect():
         print(f"Failed to connect to server: {client.message}")
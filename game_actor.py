@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Single-writer game actors
+Each game's state is changed only by the one thread that owns it: client
+threads and timers post steps (an answer, a timeout, the next question) to
+the game's mailbox instead of locking, so steps apply one at a time in
+arrival order. A small pool of threads owns every game, each game hashed to
+one of them, so thousands of rooms do not need a thread apiece.
+"""
+
+import queue
+import threading
+import zlib
+
+ACTOR_THREADS = 4  # Threads owning games; a game's steps always run on the same one
+
+class Actor:
+    """A game's mailbox on its owner thread"""
+    
+    def __init__(self, mailbox, owner):
+        self.mailbox = mailbox
+        self.owner = owner
+        
+    def post(self, callback, *args):
+        """Queue callback(*args) to run on the owner thread"""
+        self.mailbox.put((callback, args))
+        
+    def is_owner(self):
+        return threading.current_thread() is self.owner
+        
+    def call(self, callback, *args):
+        """Run callback(*args) on the owner thread and return its result (raising its exception)
+        
+        Called from the owner thread itself, it runs at once rather than
+        waiting on its own mailbox.
+        """
+        if self.is_owner():
+            return callback(*args)
+        done = threading.Event()
+        outcome = []
+        
+        def step():
+            try:
+                outcome.append((True, callback(*args)))
+            except Exception as e:
+                outcome.append((False, e))
+            finally:
+                done.set()
+                
+        self.post(step)
+        done.wait()
+        ok, value = outcome[0]
+        if not ok:
+            raise value
+        return value
+
+
+class ActorPool:
+    """The threads that own games, each draining its own mailbox"""
+    
+    def __init__(self, threads=ACTOR_THREADS):
+        self.mailboxes = []
+        self.threads = []
+        for index in range(threads):
+            mailbox = queue.SimpleQueue()
+            thread = threading.Thread(target=self.run, args=(mailbox,), name=f'game-actor-{index}')
+            thread.daemon = True
+            thread.start()
+            self.mailboxes.append(mailbox)
+            self.threads.append(thread)
+            
+    def actor(self, key):
+        """The actor for a game, by a stable key such as its room code"""
+        index = zlib.crc32(key.encode('utf-8')) % len(self.threads)
+        return Actor(self.mailboxes[index], self.threads[index])
+        
+    def run(self, mailbox):
+        while True:
+            callback, args = mailbox.get()
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"Error in {threading.current_thread().name}: {e}")
+
+
+_shared_pool = None
+_shared_lock = threading.Lock()
+
+def get_actor_pool():
+    """The process-wide actor pool, created on first use"""
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None:
+            _shared_pool = ActorPool()
+        return _shared_pool
@@ -0,0 +1,9 @@
+"""
+Gunicorn settings for the Trivia Questions API
+Each worker imports the app itself (no preload), then warms up in the
+background once it is running; /ready stays 503 until that succeeds.
+"""
+
+def post_worker_init(worker):
+    from api_server import start_warm_up
+    start_warm_up()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Socket handoff for zero-downtime restarts
+The running server listens on a Unix socket. A new process connects, and the
+old one pauses its games and passes the listening socket and every client
+socket (SCM_RIGHTS) along with a JSON snapshot of game state, then exits
+once the new process has everything. Clients keep their TCP connections.
+"""
+
+import json
+import os
+import socket
+import threading
+
+HANDOFF_FDS_PER_MESSAGE = 250  # Linux accepts at most 253 descriptors per SCM_RIGHTS message
+HANDOFF_CHUNK_SIZE = 32 * 1024  # Snapshot bytes per message
+HANDOFF_TIMEOUT = 10.0  # Seconds either side waits for the other
+HANDOFF_ACK = b'ack'  # New process: everything received
+HANDOFF_BYE = b'bye'  # Old process: exiting, the sockets are yours
+
+class ActivityGate:
+    """Lets threads work on game state until close() has waited them all out
+    
+    Every message handler and timer callback runs between enter() and exit();
+    once the gate is closed, enter() returns False and the work is left for
+    the process that takes over.
+    """
+    
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.active = 0
+        self.closed = False
+        
+    def enter(self):
+        with self.condition:
+            if self.closed:
+                return False
+            self.active += 1
+            return True
+            
+    def exit(self):
+        with self.condition:
+            self.active -= 1
+            if not self.active:
+                self.condition.notify_all()
+                
+    def close(self, timeout=HANDOFF_TIMEOUT):
+        """Refuse new work and wait for running work to finish; False on timeout"""
+        with self.condition:
+            self.closed = True
+            return self.condition.wait_for(lambda: self.active == 0, timeout)
+
+
+def handoff_listener(path):
+    """Unix socket on which a new process asks for the handoff"""
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+    try:
+        listener.bind(path)
+    except OSError:
+        # A stale path from a process that is gone (a live one would accept a connection)
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        try:
+            probe.connect(path)
+            raise
+        except ConnectionRefusedError:
+            os.unlink(path)
+            listener.bind(path)
+        finally:
+            probe.close()
+    listener.listen(1)
+    return listener
+
+
+def send_handoff(conn, sockets, state):
+    """Pass sockets and a JSON-serializable state; True once the receiver acknowledged"""
+    conn.settimeout(HANDOFF_TIMEOUT)
+    data = json.dumps(state).encode('utf-8')
+    fds = [sock.fileno() for sock in sockets]
+    conn.send(json.dumps({"fds": len(fds), "state_bytes": len(data)}).encode('utf-8'))
+    for start in range(0, len(fds), HANDOFF_FDS_PER_MESSAGE):
+        socket.send_fds(conn, [b'F'], fds[start:start + HANDOFF_FDS_PER_MESSAGE])
+    for start in range(0, len(data), HANDOFF_CHUNK_SIZE):
+        conn.send(data[start:start + HANDOFF_CHUNK_SIZE])
+    return conn.recv(16) == HANDOFF_ACK
+
+
+def receive_handoff(path):
+    """Ask the server listening on path for its sockets
+    
+    Returns (conn, sockets, state). Acknowledge with HANDOFF_ACK on conn, then
+    wait for HANDOFF_BYE before using the sockets: only then has the old
+    process stopped touching them.
+    """
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+    conn.settimeout(HANDOFF_TIMEOUT)
+    conn.connect(path)
+    header = json.loads(conn.recv(4096))
+    fds = []
+    while len(fds) < header["fds"]:
+        data, received, _, _ = socket.recv_fds(conn, 16, HANDOFF_FDS_PER_MESSAGE)
+        if not data:
+            raise ConnectionError("handoff connection closed while receiving sockets")
+        fds.extend(received)
+    chunks = []
+    remaining = header["state_bytes"]
+    while remaining > 0:
+        chunk = conn.recv(HANDOFF_CHUNK_SIZE)
+        if not chunk:
+            raise ConnectionError("handoff connection closed while receiving state")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    sockets = [socket.socket(fileno=fd) for fd in fds]
+    return conn, sockets, json.loads(b''.join(chunks))
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Incremental leaderboard for the game servers
+Keeps players bucketed by score with a Fenwick tree of bucket sizes, so score
+updates and rank lookups are O(log S) and the top K never needs a full sort
+"""
+
+LEADERBOARD_TOP_K = 10  # Entries broadcast to every player
+INITIAL_MAX_SCORE = 32  # Grows on demand
+
+class FenwickTree:
+    """Prefix sums over score buckets"""
+    
+    def __init__(self, size):
+        self.size = size
+        self.tree = [0] * (size + 1)
+        
+    def add(self, index, delta):
+        """Add delta to bucket index"""
+        index += 1
+        while index <= self.size:
+            self.tree[index] += delta
+            index += index & -index
+            
+    def prefix_sum(self, index):
+        """Sum of buckets 0..index"""
+        total = 0
+        index = min(index, self.size - 1) + 1
+        while index > 0:
+            total += self.tree[index]
+            index -= index & -index
+        return total
+
+
+class Leaderboard:
+    """Players ranked by score, updated incrementally
+    
+    Ranks are competition ranks: 1 + the number of players with a higher score.
+    Players on the same score are listed in the order they reached it. Not
+    thread-safe; callers hold their own lock.
+    """
+    
+    def __init__(self, top_k=LEADERBOARD_TOP_K, max_score=INITIAL_MAX_SCORE):
+        self.top_k = top_k
+        self.scores = {}   # {name: score}
+        self.buckets = {}  # {score: {name: None}}, insertion ordered
+        self.counts = FenwickTree(max_score + 1)
+        self.high_score = 0
+        self.last_top = None  # Top K as last sent, for deltas
+        self.last_ranks = {}  # {name: (rank, score)} as last sent
+        
+    def __len__(self):
+        return len(self.scores)
+        
+    def __contains__(self, name):
+        return name in self.scores
+        
+    def add(self, name, score=0):
+        """Add a player; False if the name is already on the board"""
+        if name in self.scores:
+            return False
+        self._place(name, score)
+        return True
+        
+    def remove(self, name):
+        """Remove a player; returns their score, or None"""
+        score = self.scores.pop(name, None)
+        if score is None:
+            return None
+        self._unbucket(name, score)
+        self.last_ranks.pop(name, None)
+        return score
+        
+    def rename(self, name, new_name):
+        """Move a player to a new name, keeping score, tie order and what was last sent"""
+        score = self.scores.pop(name)
+        self.scores[new_name] = score
+        self.buckets[score] = {new_name if entry == name else entry: None for entry in self.buckets[score]}
+        if name in self.last_ranks:
+            self.last_ranks[new_name] = self.last_ranks.pop(name)
+        if self.last_top is not None:
+            self.last_top = [(new_name if entry == name else entry, entry_score) for entry, entry_score in self.last_top]
+            
+    def update(self, name, delta=1):
+        """Add delta to a player's score"""
+        if name in self.scores:
+            self.set_score(name, self.scores[name] + delta)
+            
+    def set_score(self, name, score):
+        """Move a player to a new score"""
+        old = self.scores.pop(name, None)
+        if old is not None:
+            self._unbucket(name, old)
+        self._place(name, score)
+        
+    def score(self, name):
+        return self.scores.get(name)
+        
+    def rank(self, name):
+        """Competition rank of a player (1 is best), or None"""
+        score = self.scores.get(name)
+        if score is None:
+            return None
+        return self._rank_of_score(score)
+        
+    def top(self, k=None):
+        """The best k players as [(name, score)], highest first"""
+        k = self.top_k if k is None else k
+        result = []
+        score = self.high_score
+        while score >= 0 and len(result) < k:
+            bucket = self.buckets.get(score)
+            if bucket:
+                for name in bucket:
+                    result.append((name, score))
+                    if len(result) == k:
+                        break
+            score -= 1
+        return result
+        
+    def ranking(self):
+        """Every player as [(name, score)], highest first"""
+        return self.top(len(self.scores))
+        
+    def reset_snapshot(self):
+        """Forget what was last sent, so the next snapshot is sent in full"""
+        self.last_top = None
+        self.last_ranks = {}
+        
+    def top_delta(self):
+        """Compare the top K with the last snapshot
+        
+        Returns (full, entries, size): full=True with the whole top K when no
+        snapshot was taken yet, otherwise only the changed [position, name,
+        score] entries (None when nothing changed). size is the new length of
+        the top K.
+        """
+        top = self.top()
+        previous, self.last_top = self.last_top, top
+        if previous is None:
+            return True, [list(entry) for entry in top], len(top)
+        changes = [[position, name, score] for position, (name, score) in enumerate(top)
+                   if position >= len(previous) or previous[position] != (name, score)]
+        if not changes and len(previous) == len(top):
+            return False, None, len(top)
+        return False, changes, len(top)
+        
+    def rank_changes(self):
+        """[(name, rank, score)] for players whose rank or score changed since the last call"""
+        rank_by_score = {}
+        changed = []
+        for name, score in self.scores.items():
+            rank = rank_by_score.get(score)
+            if rank is None:
+                rank = rank_by_score[score] = self._rank_of_score(score)
+            if self.last_ranks.get(name) != (rank, score):
+                self.last_ranks[name] = (rank, score)
+                changed.append((name, rank, score))
+        return changed
+        
+    def _rank_of_score(self, score):
+        # Players strictly above this score, plus one
+        return len(self.scores) - self.counts.prefix_sum(score) + 1
+        
+    def _place(self, name, score):
+        if score < 0:
+            raise ValueError("scores must be non-negative")
+        if score >= self.counts.size:
+            self._grow(score)
+        self.scores[name] = score
+        self.buckets.setdefault(score, {})[name] = None
+        self.counts.add(score, 1)
+        self.high_score = max(self.high_score, score)
+        
+    def _unbucket(self, name, score):
+        bucket = self.buckets[score]
+        del bucket[name]
+        if not bucket:
+            del self.buckets[score]
+        self.counts.add(score, -1)
+        while self.high_score > 0 and self.high_score not in self.buckets:
+            self.high_score -= 1
+            
+    def _grow(self, score):
+        """Rebuild the tree with room for score (doubling, so amortized O(1))"""
+        size = self.counts.size
+        while size <= score:
+            size *= 2
+        self.counts = FenwickTree(size)
+        for bucket_score, bucket in self.buckets.items():
+            self.counts.add(bucket_score, len(bucket))
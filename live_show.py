@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+AWS Trivia Game Server - Live Show Mode
+Mass-audience mode of async_server.py: one host question goes to 50k+ players,
+answers land in sharded per-option counters and are scored in batches when the
+question closes; each player gets only its own result plus the answer histogram
+"""
+
+import asyncio
+import argparse
+import heapq
+import itertools
+import time
+import random
+from array import array
+from questions import questions
+from network_utils import encode_message
+from async_server import AsyncTriviaServer, HAS_UVLOOP, HOST, PORT, raise_file_limit
+
+try:
+    import numpy as np  # Optional: scores each shard with one array operation
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+if HAS_UVLOOP:
+    import uvloop
+
+# Live show configuration
+LIVE_MAX_PLAYERS = 100000
+LIVE_QUESTIONS = 10
+LIVE_QUESTION_TIMEOUT = 10
+LIVE_RESULT_PAUSE = 5  # Seconds between a question's results and the next question
+GAME_START_DELAY = 2
+TOP_K = 10  # Entries in the final standings
+
+# Answer intake
+ANSWER_SHARDS = 16  # Player slots are striped across shards so each shard has a single writer
+SHARD_INITIAL_CAPACITY = 1024  # Slots per shard; doubles on demand
+AUDIENCE_BROADCAST_INTERVAL = 2.0  # Seconds between audience-size updates (replaces per-join broadcasts)
+NO_ANSWER = 0  # Choice byte for "did not answer"; option k is stored as k + 1
+
+class AnswerShard:
+    """Answers and running scores for every ANSWER_SHARDS-th player slot
+    
+    Recording an answer is two stores: one choice byte and one per-option
+    counter. Scoring at question close runs over the whole shard at once.
+    """
+    
+    def __init__(self, capacity=SHARD_INITIAL_CAPACITY):
+        self.choices = bytearray(capacity)  # NO_ANSWER or option + 1, per slot
+        self.active = bytearray(capacity)   # 1 while a player holds the slot
+        self.scores = array('I', bytes(capacity * array('I').itemsize))
+        self.counts = []  # Answers per option for the open question
+        
+    def ensure(self, index):
+        """Grow the shard so index is a valid slot"""
+        capacity = len(self.choices)
+        if index < capacity:
+            return
+        extra = max(capacity, index + 1 - capacity)
+        self.choices.extend(bytes(extra))
+        self.active.extend(bytes(extra))
+        self.scores.frombytes(bytes(extra * self.scores.itemsize))
+        
+    def occupy(self, index):
+        self.ensure(index)
+        self.active[index] = 1
+        self.choices[index] = NO_ANSWER
+        self.scores[index] = 0
+        
+    def release(self, index):
+        """Free a slot, withdrawing its answer to the open question; True if it had one"""
+        choice = self.choices[index]
+        self.active[index] = 0
+        self.choices[index] = NO_ANSWER
+        self.scores[index] = 0
+        if choice != NO_ANSWER:
+            self.counts[choice - 1] -= 1
+            return True
+        return False
+        
+    def reset(self, options):
+        """Clear answers for a new question"""
+        self.choices[:] = bytes(len(self.choices))
+        self.counts = [0] * options
+        
+    def reset_scores(self):
+        self.scores = array('I', bytes(len(self.choices) * self.scores.itemsize))
+        
+    def record(self, index, option):
+        """Record a first answer; False if the slot already answered"""
+        if self.choices[index] != NO_ANSWER:
+            return False
+        self.choices[index] = option + 1
+        self.counts[option] += 1
+        return True
+        
+    def score(self, correct_option):
+        """Add a point to every slot that chose correct_option"""
+        if HAS_NUMPY:
+            scores = np.frombuffer(self.scores, dtype=np.uint32)
+            scores += np.frombuffer(self.choices, dtype=np.uint8) == correct_option + 1
+            return
+        # Without numpy: translate() builds the 0/1 mask in C, compress() skips wrong answers
+        table = bytearray(256)
+        table[correct_option + 1] = 1
+        scores = self.scores
+        for index in itertools.compress(range(len(self.choices)), self.choices.translate(table)):
+            scores[index] += 1
+            
+    def score_counts(self, totals):
+        """Add this shard's number of active players per score into totals"""
+        if HAS_NUMPY:
+            active = np.frombuffer(self.active, dtype=np.uint8).astype(bool)
+            for score, count in enumerate(np.bincount(np.frombuffer(self.scores, dtype=np.uint32)[active])):
+                if count:
+                    totals[score] = totals.get(score, 0) + int(count)
+            return
+        for score in itertools.compress(self.scores, self.active):
+            totals[score] = totals.get(score, 0) + 1
+
+
+class LiveShowServer(AsyncTriviaServer):
+    """One question stream for a very large audience
+    
+    Players may join at any time. There is no per-answer feedback: at close,
+    every player gets one result frame (correct, score, rank). Players with
+    the same answer and score share one pre-encoded frame.
+    """
+    
+    def __init__(self, host=HOST, port=PORT, max_players=LIVE_MAX_PLAYERS, question_count=LIVE_QUESTIONS,
+                 question_timeout=LIVE_QUESTION_TIMEOUT, result_pause=LIVE_RESULT_PAUSE, auto_start=0):
+        super().__init__(host, port, max_players, question_count)
+        self.question_timeout = question_timeout
+        self.result_pause = result_pause
+        self.auto_start = auto_start  # Start once this many players have joined (0: host starts)
+        self.shards = [AnswerShard() for _ in range(ANSWER_SHARDS)]
+        self.slots = {}  # {protocol: slot}
+        self.slot_players = {}  # {slot: nickname}
+        self.free_slots = []  # Heap of released slots, reused lowest first
+        self.next_slot = 0
+        self.nicknames = set()
+        self.question_open = False
+        self.answers_received = 0
+        self.options = 0
+        
+    def accepting_joins(self):
+        """Late joiners are welcome; they start from zero"""
+        return True
+        
+    def locate(self, slot):
+        return self.shards[slot % ANSWER_SHARDS], slot // ANSWER_SHARDS
+        
+    def add_player(self, protocol, nickname):
+        """Register a player in a free slot; False if the nickname is taken"""
+        if nickname in self.nicknames:
+            return False
+        slot = heapq.heappop(self.free_slots) if self.free_slots else self.next_slot
+        if slot == self.next_slot:
+            self.next_slot += 1
+        shard, index = self.locate(slot)
+        shard.occupy(index)
+        self.nicknames.add(nickname)
+        self.players[protocol] = nickname
+        if protocol.link is None:
+            self.local_players[protocol] = None
+        self.slots[protocol] = slot
+        self.slot_players[slot] = nickname
+        self.queue_lobby_update(None)
+        if self.auto_start and len(self.players) >= self.auto_start and not self.game_in_progress:
+            asyncio.get_running_loop().call_soon(self.start_game)
+        return True
+        
+    def remove_player(self, protocol):
+        """Free the player's slot, withdrawing any answer to the open question"""
+        nickname = self.players.pop(protocol, None)
+        if nickname is None:
+            return
+        self.local_players.pop(protocol, None)
+        slot = self.slots.pop(protocol)
+        del self.slot_players[slot]
+        self.nicknames.discard(nickname)
+        shard, index = self.locate(slot)
+        if shard.release(index):
+            self.answers_received -= 1
+        heapq.heappush(self.free_slots, slot)
+        self.queue_lobby_update(None)
+        self.check_all_answered()
+        
+    def queue_lobby_update(self, message):
+        """Announce the audience size at most once per interval instead of every join"""
+        if self.lobby_handle is None:
+            self.lobby_handle = asyncio.get_running_loop().call_later(
+                AUDIENCE_BROADCAST_INTERVAL, self.flush_lobby_update)
+                
+    def flush_lobby_update(self):
+        self.lobby_handle = None
+        self.broadcast({"type": "audience", "player_count": len(self.players)})
+        
+    def process_answer(self, protocol, answer_index):
+        """Tally an answer in its shard; scoring waits for the question to close"""
+        if not self.question_open or not isinstance(answer_index, int) or not 0 <= answer_index < self.options:
+            return
+        shard, index = self.locate(self.slots[protocol])
+        if shard.record(index, answer_index):
+            self.answers_received += 1
+            self.check_all_answered()
+            
+    def check_all_answered(self):
+        if self.question_open and self.answers_received >= len(self.players):
+            self.all_answered.set()
+            
+    async def run_game(self):
+        """Run the show: question, close, results, pause"""
+        self.game_questions = random.sample(questions, min(len(questions), self.question_count))
+        for shard in self.shards:
+            shard.reset_scores()
+        print(f"[live] show starting with {len(self.players)} players"
+              + (" (numpy scoring)" if HAS_NUMPY else ""))
+        self.broadcast({
+            "type": "game_starting",
+            "message": "The live show is starting!",
+            "player_count": len(self.players)
+        })
+        await asyncio.sleep(GAME_START_DELAY)
+        
+        try:
+            for index, question in enumerate(self.game_questions):
+                self.options = len(question["options"])
+                for shard in self.shards:
+                    shard.reset(self.options)
+                self.answers_received = 0
+                self.current_question_index = index + 1
+                self.all_answered = asyncio.Event()
+                self.question_open = True
+                self.broadcast({
+                    "type": "question",
+                    "question_number": index + 1,
+                    "total_questions": len(self.game_questions),
+                    "question": question["question"],
+                    "options": question["options"],
+                    "timeout": self.question_timeout
+                })
+                
+                try:
+                    await asyncio.wait_for(self.all_answered.wait(), self.question_timeout)
+                except asyncio.TimeoutError:
+                    pass
+                self.question_open = False
+                self.close_question(index + 1, question["answer"])
+                
+                if index + 1 < len(self.game_questions):
+                    await asyncio.sleep(self.result_pause)
+                    
+            self.end_game()
+        finally:
+            self.game_in_progress = False
+            self.question_open = False
+            self.current_question_index = 0
+            self.all_answered = None
+            
+    def close_question(self, question_number, correct_option):
+        """Score every shard, then send the histogram to all and each player its own result"""
+        started = time.perf_counter()
+        started_cpu = time.process_time()
+        counts = [sum(shard.counts[option] for shard in self.shards) for option in range(self.options)]
+        score_totals = {}
+        for shard in self.shards:
+            shard.score(correct_option)
+            shard.score_counts(score_totals)
+            
+        # Competition rank per score: 1 + players with a higher score
+        rank_of_score = {}
+        above = 0
+        for score in sorted(score_totals, reverse=True):
+            rank_of_score[score] = above + 1
+            above += score_totals[score]
+        scored = time.perf_counter()
+        
+        players = len(self.players)
+        self.broadcast({
+            "type": "answer_distribution",
+            "question_number": question_number,
+            "correct_answer": correct_option,
+            "counts": counts,
+            "answers": sum(counts),
+            "players": players
+        })
+        
+        frames = {}  # {(choice, score): frame}; a handful of distinct results for the whole audience
+        for protocol, slot in self.slots.items():
+            shard, index = self.locate(slot)
+            key = (shard.choices[index], shard.scores[index])
+            frame = frames.get(key)
+            if frame is None:
+                choice, score = key
+                frame = frames[key] = encode_message({
+                    "type": "result",
+                    "question_number": question_number,
+                    "correct": choice == correct_option + 1,
+                    "your_answer": choice - 1 if choice != NO_ANSWER else None,
+                    "correct_answer": correct_option,
+                    "score": score,
+                    "rank": rank_of_score.get(score, players),
+                    "players": players
+                })
+            protocol.send_frame(frame)
+        sent = time.perf_counter()
+        cpu = time.process_time() - started_cpu
+        
+        print(f"[live] question {question_number}: {sum(counts)}/{players} answered, "
+              f"scored in {(scored - started) * 1000:.1f} ms, results queued in {(sent - scored) * 1000:.1f} ms "
+              f"({cpu * 1000:.0f} ms CPU in total, {len(frames)} distinct frames)")
+              
+    def get_leaderboard(self):
+        """The top K players by score"""
+        scored = []
+        for slot, nickname in self.slot_players.items():
+            shard, index = self.locate(slot)
+            scored.append((shard.scores[index], -slot, nickname))  # Ties go to the earlier slot
+        return [(nickname, score) for score, _, nickname in heapq.nlargest(TOP_K, scored)]
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='AWS Trivia Live Show Server')
+    parser.add_argument('--host', default=HOST, help='Interface to bind')
+    parser.add_argument('--port', type=int, default=PORT, help='Port to listen on')
+    parser.add_argument('--max-players', type=int, default=LIVE_MAX_PLAYERS, help='Maximum audience size')
+    parser.add_argument('--questions', type=int, default=LIVE_QUESTIONS, help='Questions per show')
+    parser.add_argument('--question-timeout', type=float, default=LIVE_QUESTION_TIMEOUT, help='Seconds per question')
+    parser.add_argument('--result-pause', type=float, default=LIVE_RESULT_PAUSE, help='Seconds between questions')
+    parser.add_argument('--auto-start', type=int, default=0,
+                        help='Start the show once this many players have joined (0: the host starts it)')
+                        
+    args = parser.parse_args()
+    
+    print(f"Open file limit: {raise_file_limit()}")
+    if HAS_UVLOOP:
+        uvloop.install()
+    server = LiveShowServer(args.host, args.port, args.max_players, args.questions,
+                            args.question_timeout, args.result_pause, args.auto_start)
+    asyncio.run(server.serve())
+
+
+if __name__ == "__main__":
+    main()
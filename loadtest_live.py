@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Load test for the live show server
+Starts live_show.py, connects a large audience from several bot processes and
+plays a short show, then reports join rate, question fan-out, result delivery
+and server CPU/memory. Run with a high open-file limit (ulimit -n), e.g.:
+
+    ulimit -n 120000 && python3 loadtest_live.py --players 50000
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from network_utils import encode_message, pong_message, MessageReader
+from async_server import raise_file_limit, READ_BUFFER_SIZE
+from benchmark_servers import percentile, process_usage, wait_for_port
+
+CONNECT_CONCURRENCY = 500  # Connects in flight per bot process
+FD_MARGIN = 200  # Descriptors kept spare per process
+
+class Viewer(asyncio.Protocol):
+    """An audience member: joins, answers each question after a random delay, records timings"""
+    
+    def __init__(self, nickname, stats, answer_window):
+        self.nickname = nickname
+        self.stats = stats
+        self.answer_window = answer_window
+        self.reader = MessageReader(buffer_size=READ_BUFFER_SIZE)
+        self.transport = None
+        self.joined = asyncio.get_running_loop().create_future()
+        self.finished = False
+        
+    def connection_made(self, transport):
+        self.transport = transport
+        transport.writelines(encode_message({"type": "join", "nickname": self.nickname}))
+        
+    def data_received(self, data):
+        self.reader.feed(data)
+        now = time.time()
+        while True:
+            message = self.reader.pop_message()
+            if message is None:
+                break
+            self.handle(message, now)
+            
+    def connection_lost(self, exc):
+        if not self.joined.done():
+            self.joined.set_result(False)
+        if not self.finished:
+            self.stats['lost'] += 1
+            self.finished = True
+            
+    def handle(self, message, now):
+        kind = message["type"]
+        if kind == "ping":
+            self.transport.writelines(encode_message(pong_message(message)))
+        elif kind in ("admin_rights", "wait_message"):
+            self.stats['joined'] += 1
+            self.joined.set_result(True)
+        elif kind == "error":
+            self.stats['errors'] += 1
+        elif kind == "question":
+            self.stats['questions'].setdefault(message["question_number"], []).append(now)
+            asyncio.get_running_loop().call_later(random.uniform(0, self.answer_window), self.send_answer,
+                                                  len(message["options"]))
+        elif kind == "result":
+            self.stats['results'].setdefault(message["question_number"], []).append(now)
+        elif kind == "game_over":
+            self.finished = True
+            self.stats['finished'] += 1
+            self.transport.close()
+            
+    def send_answer(self, options):
+        if not self.transport.is_closing():
+            self.transport.writelines(encode_message({"type": "answer", "answer": random.randrange(options)}))
+
+
+async def run_viewers(port, source, names, answer_window, results):
+    """Connect one slice of the audience and wait for the show to end"""
+    loop = asyncio.get_running_loop()
+    stats = {'joined': 0, 'errors': 0, 'lost': 0, 'finished': 0, 'questions': {}, 'results': {}}
+    limit = asyncio.Semaphore(CONNECT_CONCURRENCY)
+    viewers = []
+    
+    async def connect(name):
+        async with limit:
+            try:
+                # Spread connections over loopback source addresses so ephemeral ports never run out
+                _, viewer = await loop.create_connection(
+                    lambda: Viewer(name, stats, answer_window), '127.0.0.1', port, local_addr=(source, 0))
+            except OSError:
+                stats['errors'] += 1
+                return
+            viewers.append(viewer)
+            await viewer.joined
+            
+    await asyncio.gather(*(connect(name) for name in names))
+    results.put(('joined', stats['joined']))
+    while any(not viewer.finished for viewer in viewers):
+        await asyncio.sleep(0.2)
+    results.put(('stats', stats))
+
+
+def viewer_process(port, source, names, answer_window, results):
+    raise_file_limit()
+    asyncio.run(run_viewers(port, source, names, answer_window, results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Live show load test')
+    parser.add_argument('--players', type=int, default=50000, help='Audience size')
+    parser.add_argument('--processes', type=int, default=8, help='Bot processes')
+    parser.add_argument('--questions', type=int, default=3, help='Questions in the show')
+    parser.add_argument('--question-timeout', type=float, default=10.0, help='Seconds per question')
+    parser.add_argument('--port', type=int, default=5088, help='Port for the live show server')
+    parser.add_argument('--join-timeout', type=float, default=300.0, help='Seconds to wait for the audience to join')
+    args = parser.parse_args()
+    
+    limit = raise_file_limit()
+    per_process = -(-args.players // args.processes)
+    print("⏱️  Live show load test")
+    print("=" * 40)
+    if limit < args.players + FD_MARGIN or limit < per_process + FD_MARGIN:
+        print(f"⚠️  Open file limit is {limit}; the server needs about {args.players + FD_MARGIN}. "
+              f"Raise it (ulimit -n) or expect failed connections.")
+              
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'live_show.py')
+    server = subprocess.Popen(
+        [sys.executable, script, '--port', str(args.port), '--max-players', str(args.players + 1),
+         '--questions', str(args.questions), '--question-timeout', str(args.question_timeout),
+         '--result-pause', '2', '--auto-start', str(args.players)],
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    server_lines = []
+    
+    def collect_output():
+        for line in server.stdout:
+            if line.startswith('[live]'):
+                server_lines.append(line.rstrip())
+                
+    threading.Thread(target=collect_output, daemon=True).start()
+    
+    try:
+        if not wait_for_port(args.port):
+            print("Live show server did not start")
+            return
+        results = multiprocessing.Queue()
+        names = [f"viewer{i}" for i in range(args.players)]
+        workers = [multiprocessing.Process(
+            target=viewer_process,
+            args=(args.port, f"127.0.0.{2 + i % 250}", names[i::args.processes], args.question_timeout / 2, results))
+            for i in range(args.processes)]
+        cpu_before, _ = process_usage(server.pid)
+        join_start = time.time()
+        for worker in workers:
+            worker.start()
+            
+        joined = 0
+        deadline = join_start + args.join_timeout
+        for _ in workers:
+            try:
+                joined += results.get(timeout=max(1.0, deadline - time.time()))[1]
+            except Exception:
+                break
+        join_elapsed = time.time() - join_start
+        _, rss_joined = process_usage(server.pid)
+        print(f"joined {joined:,} of {args.players:,} in {join_elapsed:.1f}s ({joined / join_elapsed:,.0f}/s), "
+              f"server RSS {rss_joined:.0f} MB")
+              
+        merged = [results.get() for _ in workers]
+        cpu_after, _ = process_usage(server.pid)
+        for worker in workers:
+            worker.join()
+    finally:
+        server.terminate()
+        server.wait()
+        
+    for number in range(1, args.questions + 1):
+        arrivals = [t for _, stats in merged for t in stats['questions'].get(number, [])]
+        delivered = [t for _, stats in merged for t in stats['results'].get(number, [])]
+        if not arrivals:
+            continue
+        print(f"question {number}: delivered to {len(arrivals):,}, "
+              f"fan-out first-to-last {(max(arrivals) - min(arrivals)) * 1000:.0f} ms "
+              f"(p99 {(percentile(arrivals, 0.99) - min(arrivals)) * 1000:.0f} ms)")
+        if delivered:
+            print(f"  results to {len(delivered):,}, first-to-last {(max(delivered) - min(delivered)) * 1000:.0f} ms")
+    for line in server_lines:
+        print(f"  {line}")
+    finished = sum(stats['finished'] for _, stats in merged)
+    errors = sum(stats['errors'] + stats['lost'] for _, stats in merged)
+    print(f"finished {finished:,} of {args.players:,}, errors {errors}")
+    print(f"server CPU {cpu_after - cpu_before:.1f}s")
+
+if __name__ == '__main__':
+    main()
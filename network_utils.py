@@ -5,31 +5,117 @@ Network utilities for reliable message transmission
 
 import json
 import struct
+import select
 import socket
+import selectors
+import threading
+import time
+from collections import deque
+
+HEADER_SIZE = 4
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024  # Refuse frames larger than this (corrupt or hostile length prefix)
+RECV_BUFFER_SIZE = 64 * 1024  # Initial per-connection receive buffer
+HAS_SENDMSG = hasattr(socket.socket, 'sendmsg')  # Not available on Windows
+MSG_DONTWAIT = getattr(socket, 'MSG_DONTWAIT', 0)  # Windows: pump sends fall back to blocking
+
+# Outbound queues: what to do when a client's queue is full
+OUTBOUND_QUEUE_LIMIT = 256  # Frames
+OVERFLOW_DISCONNECT = 'disconnect'  # Close the slow client
+OVERFLOW_DROP = 'drop'              # Drop the new frame
+OVERFLOW_COALESCE = 'coalesce'      # Replace a queued frame of the same kind, else disconnect
+
+# Heartbeats: servers ping, clients echo the ping's clock reading back in a pong
+HEARTBEAT_INTERVAL = 5.0  # Seconds between pings
+IDLE_TIMEOUT = 15.0  # A peer silent this long (three missed pongs) is treated as dead
+RTT_GAIN = 0.125  # Weight of a new sample in the smoothed RTT (RFC 6298 alpha)
+RTT_JITTER_GAIN = 0.25  # Weight of a new deviation in the RTT jitter (RFC 6298 beta)
+
+# Clock sync: clients estimate the offset to the server's monotonic clock, NTP-style
+CLOCK_SYNC_SAMPLES = 5  # Request/reply exchanges at join; the one with the lowest delay wins
+
+def encode_message(message):
+    """Serialize and frame a message once
+    
+    Returns an immutable (header, payload) tuple that can be handed to
+    send_frame for any number of sockets.
+    """
+    # Convert message to JSON bytes
+    message_bytes = json.dumps(message).encode('utf-8')
+    return frame_payload(message_bytes)
+    
+def frame_payload(payload):
+    """Frame an already-serialized JSON payload (e.g. one spliced from other encoded messages)"""
+    # Length prefix (4 bytes)
+    return (struct.pack('!I', len(payload)), payload)
+
+def ping_message():
+    """A heartbeat carrying the sender's monotonic clock, to be echoed back"""
+    return {"type": "ping", "t": round(time.monotonic(), 6)}
+    
+def pong_message(ping):
+    """The reply to a ping: its clock reading, unchanged"""
+    return {"type": "pong", "t": ping.get("t")}
+    
+def clock_sync_request():
+    """Client: ask for the server's clock, stamped with our send time (t0)"""
+    return {"type": "clock_sync", "t0": round(time.monotonic(), 6)}
+    
+def clock_sync_reply(request, received_at):
+    """Server: echo t0 with our receive (t1) and send (t2) times"""
+    return {"type": "clock_sync", "t0": request.get("t0"), "t1": round(received_at, 6),
+            "t2": round(time.monotonic(), 6)}
+    
+def send_frame(sock, frame):
+    """Send a pre-encoded frame (a tuple of byte buffers, header first)
+    
+    Uses scatter-gather sendmsg so header and payload are never
+    concatenated, resuming after partial sends.
+    """
+    try:
+        if HAS_SENDMSG:
+            buffers = [memoryview(part) for part in frame]
+            while buffers:
+                sent = sock.sendmsg(buffers)
+                while sent and buffers:
+                    if sent >= len(buffers[0]):
+                        sent -= len(buffers.pop(0))
+                    else:
+                        buffers[0] = buffers[0][sent:]
+                        sent = 0
+        else:
+            sock.sendall(b''.join(frame))
+        return True
+    except Exception as e:
+        print(f"Error sending message: {e}")
+        return False
 
 def send_message(sock, message):
     """Send a JSON message with length prefix"""
     try:
-        # Convert message to JSON bytes
-        message_bytes = json.dumps(message).encode('utf-8')
-        # Send length first (4 bytes)
-        length = struct.pack('!I', len(message_bytes))
-        sock.sendall(length + message_bytes)
-        return True
+        frame = encode_message(message)
     except Exception as e:
         print(f"Error sending message: {e}")
         return False
+    return send_frame(sock, frame)
 
 def receive_message(sock):
-    """Receive a JSON message with length prefix"""
+    """Receive a JSON message with length prefix
+    
+    Reads exactly one frame per call. Connections that read many messages
+    should use a MessageReader, which also decodes frames that arrive
+    together in a single recv.
+    """
     try:
         # First, receive the length (4 bytes)
-        length_bytes = receive_all(sock, 4)
+        length_bytes = receive_all(sock, HEADER_SIZE)
         if not length_bytes:
             return None
         
         # Unpack the length
         length = struct.unpack('!I', length_bytes)[0]
+        if length > MAX_MESSAGE_SIZE:
+            print(f"Error receiving message: frame of {length} bytes exceeds limit")
+            return None
         
         # Now receive the actual message
         message_bytes = receive_all(sock, length)
@@ -44,10 +130,472 @@ def receive_message(sock):
 
 def receive_all(sock, n):
     """Helper function to receive exactly n bytes"""
-    data = b''
-    while len(data) < n:
-        packet = sock.recv(n - len(data))
-        if not packet:
+    data = bytearray(n)
+    view = memoryview(data)
+    received = 0
+    while received < n:
+        count = sock.recv_into(view[received:])
+        if not count:
             return None
-        data += packet
+        received += count
     return data
+
+
+class MessageReader:
+    """Per-connection framed reader
+    
+    Reads into one growable bytearray with recv_into and decodes frames
+    straight out of memoryview slices, so a single recv can yield several
+    messages and large messages are not rebuilt by repeated concatenation.
+    Do not mix with receive_message on the same socket: bytes already
+    buffered here would be skipped.
+    
+    With poll_interval, receive() waits for data with poll() in steps of that
+    many seconds, so a blocking socket can still be given up on; a socket
+    timeout would also make every send on it wait, even with MSG_DONTWAIT.
+    """
+    
+    def __init__(self, sock=None, buffer_size=RECV_BUFFER_SIZE, poll_interval=None):
+        self.sock = sock  # None when bytes are supplied with feed()
+        self.buffer = bytearray(buffer_size)
+        self.start = 0  # First unconsumed byte
+        self.end = 0    # One past the last received byte
+        self.poll_interval = poll_interval
+        self.poller = None
+        if sock is not None and poll_interval is not None and hasattr(select, 'poll'):  # No poll() on Windows
+            self.poller = select.poll()
+            self.poller.register(sock, select.POLLIN)
+            
+    def receive(self, keep_waiting=None):
+        """Return the next message, or None when the connection closed or failed
+        
+        After each poll_interval, or socket timeout, with nothing received,
+        keep_waiting() is asked whether to go on waiting (True) or give up
+        and return None.
+        """
+        try:
+            while True:
+                message = self._next_frame()
+                if message is not None:
+                    return message
+                if self.poll_interval is not None and not self._readable():
+                    if keep_waiting is None or not keep_waiting():
+                        raise socket.timeout("timed out")
+                    continue
+                try:
+                    if not self._fill():
+                        return None
+                except socket.timeout:
+                    if keep_waiting is None or not keep_waiting():
+                        raise
+        except Exception as e:
+            print(f"Error receiving message: {e}")
+            return None
+            
+    def pop_message(self):
+        """Decode the next buffered message without reading (None if incomplete)
+        
+        For event-driven callers that feed() received bytes themselves.
+        """
+        return self._next_frame()
+    
+    def has_buffered_message(self):
+        """True when a complete frame is already buffered (no recv needed)"""
+        available = self.end - self.start
+        if available < HEADER_SIZE:
+            return False
+        length = struct.unpack_from('!I', self.buffer, self.start)[0]
+        return available >= HEADER_SIZE + length
+        
+    def buffered_bytes(self):
+        """Copy of the received-but-unconsumed bytes"""
+        return bytes(self.buffer[self.start:self.end])
+        
+    def feed(self, data):
+        """Append bytes received elsewhere (e.g. carried over from another reader)"""
+        self._reserve(len(data))
+        self.buffer[self.end:self.end + len(data)] = data
+        self.end += len(data)
+        
+    def _next_frame(self):
+        """Decode one complete frame from the buffer, if there is one"""
+        available = self.end - self.start
+        if available < HEADER_SIZE:
+            return None
+        length = struct.unpack_from('!I', self.buffer, self.start)[0]
+        if length > MAX_MESSAGE_SIZE:
+            raise ValueError(f"frame of {length} bytes exceeds limit")
+        if available < HEADER_SIZE + length:
+            self._reserve(HEADER_SIZE + length - available)
+            return None
+            
+        body_start = self.start + HEADER_SIZE
+        with memoryview(self.buffer)[body_start:body_start + length] as body:
+            message = json.loads(str(body, 'utf-8'))
+        self.start = body_start + length
+        if self.start == self.end:
+            self.start = self.end = 0
+        return message
+        
+    def _reserve(self, extra):
+        """Make room for extra bytes after end, compacting or growing the buffer"""
+        if self.end + extra <= len(self.buffer):
+            return
+        pending = self.end - self.start
+        if pending + extra > len(self.buffer):
+            # Grow geometrically so big frames cost amortized O(n)
+            new_buffer = bytearray(max(len(self.buffer) * 2, pending + extra))
+            new_buffer[:pending] = self.buffer[self.start:self.end]
+            self.buffer = new_buffer
+        else:
+            self.buffer[:pending] = self.buffer[self.start:self.end]
+        self.start = 0
+        self.end = pending
+        
+    def _readable(self):
+        """Wait up to poll_interval for data (or EOF) on the socket"""
+        if self.poller is None:
+            return bool(select.select([self.sock], [], [], self.poll_interval)[0])
+        return bool(self.poller.poll(self.poll_interval * 1000))
+        
+    def _fill(self):
+        """recv_into the free tail of the buffer; False on EOF"""
+        if self.end == len(self.buffer):
+            self._reserve(RECV_BUFFER_SIZE)
+        with memoryview(self.buffer)[self.end:] as tail:
+            count = self.sock.recv_into(tail)
+        if not count:
+            return False
+        self.end += count
+        return True
+
+
+class ClientConnection:
+    """Bounded outbound queue for one client socket
+    
+    send() only enqueues a pre-encoded frame and wakes the OutboundPump, so
+    callers never block on a slow client. Once a connection exists, every
+    frame for that socket must go through it to keep frames whole and in
+    order.
+    """
+    
+    def __init__(self, sock, pump, max_frames=OUTBOUND_QUEUE_LIMIT, overflow=OVERFLOW_DISCONNECT,
+                 coalesce_kinds=()):
+        self.sock = sock
+        self.pump = pump
+        self.max_frames = max_frames
+        self.overflow = overflow
+        self.coalesce_kinds = set(coalesce_kinds)
+        self.queue = deque()  # [(kind, frame)]
+        self.current = []     # memoryviews left of the frame being written
+        self.lock = threading.Lock()
+        self.closed = False
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.overflowed = False
+    
+    def send(self, frame, kind=None):
+        """Queue a frame; False if the connection is closed or was closed by overflow"""
+        with self.lock:
+            if self.closed:
+                return False
+            if len(self.queue) >= self.max_frames:
+                if not self._make_room(kind):
+                    return False
+            self.queue.append((kind, frame))
+        self.pump.schedule(self)
+        return True
+    
+    def send_message(self, message):
+        """Encode and queue a single message"""
+        return self.send(encode_message(message), message.get('type'))
+    
+    def pending(self):
+        """Number of frames waiting to be written"""
+        with self.lock:
+            return len(self.queue) + (1 if self.current else 0)
+    
+    def _make_room(self, kind):
+        """Apply the overflow policy (lock held); True if the new frame may be queued"""
+        if self.overflow == OVERFLOW_DROP:
+            self.frames_dropped += 1
+            return False
+        if self.overflow == OVERFLOW_COALESCE and kind in self.coalesce_kinds:
+            for index, (queued_kind, _) in enumerate(self.queue):
+                if queued_kind == kind:
+                    del self.queue[index]
+                    self.frames_dropped += 1
+                    return True
+        self.overflowed = True
+        self._close_locked()
+        return False
+    
+    def flush(self):
+        """Write queued frames without blocking; True once the queue is empty
+        
+        Called only from the pump thread. Raises OSError if the socket failed.
+        """
+        while True:
+            with self.lock:
+                if not self.current:
+                    if not self.queue or self.closed:
+                        return True
+                    _, frame = self.queue.popleft()
+                    self.current = [memoryview(part) for part in frame]
+                buffers = self.current
+            
+            try:
+                if HAS_SENDMSG:
+                    sent = self.sock.sendmsg(buffers, [], MSG_DONTWAIT)
+                else:
+                    sent = self.sock.send(b''.join(buffers), MSG_DONTWAIT)
+            except (BlockingIOError, InterruptedError):
+                return False
+            
+            while sent and buffers:
+                if sent >= len(buffers[0]):
+                    sent -= len(buffers.pop(0))
+                else:
+                    buffers[0] = buffers[0][sent:]
+                    sent = 0
+            if buffers:
+                return False  # Socket buffer full: wait for writability
+            self.frames_sent += 1
+    
+    def close(self):
+        """Close the connection; wakes a reader blocked on the socket"""
+        with self.lock:
+            self._close_locked()
+            
+    def detach(self):
+        """Stop using the socket without closing it; returns the unsent bytes
+        
+        For handing the socket to another process. The pump must be stopped
+        first, so no write is in progress.
+        """
+        with self.lock:
+            unsent = [b''.join(bytes(part) for part in self.current)] if self.current else []
+            unsent += [b''.join(frame) for _, frame in self.queue]
+            self.queue.clear()
+            self.current = []
+            self.closed = True
+            return unsent
+    
+    def _close_locked(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.clear()
+        self.current = []
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.pump.schedule(self)  # Lets the pump unregister the socket
+
+
+class OutboundPump:
+    """Single I/O thread that drains every ClientConnection queue
+    
+    Connections with queued frames are written with non-blocking sends; a
+    socket whose buffer is full is parked on a selector until writable,
+    so one slow client never delays the others.
+    """
+    
+    def __init__(self, name='outbound-pump'):
+        self.selector = selectors.DefaultSelector()
+        self.lock = threading.Lock()
+        self.ready = []            # Connections with new frames to write
+        self.ready_set = set()
+        self.waiting = set()       # Connections registered for writability
+        self.wake_pending = False
+        self.wake_reader, self.wake_writer = socket.socketpair()
+        self.wake_reader.setblocking(False)
+        self.selector.register(self.wake_reader, selectors.EVENT_READ)
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name=name, daemon=True)
+        self.thread.start()
+    
+    def schedule(self, connection):
+        """Ask the pump to write a connection's queue (cheap; safe from any thread)"""
+        with self.lock:
+            if connection not in self.ready_set:
+                self.ready_set.add(connection)
+                self.ready.append(connection)
+            if self.wake_pending:
+                return
+            self.wake_pending = True
+        try:
+            self.wake_writer.send(b'\0')
+        except OSError:
+            pass
+    
+    def run(self):
+        """Pump loop: write scheduled connections, then wait for wake-ups or writability"""
+        while self.running:
+            for key, _ in self.selector.select():
+                if key.fileobj is self.wake_reader:
+                    try:
+                        while self.wake_reader.recv(4096):
+                            pass
+                    except (BlockingIOError, InterruptedError):
+                        pass
+                else:
+                    self._flush(key.data)
+            
+            with self.lock:
+                ready, self.ready = self.ready, []
+                self.ready_set.clear()
+                self.wake_pending = False
+            for connection in ready:
+                self._flush(connection)
+    
+    def drain(self, connections, timeout):
+        """Wait until the connections have no queued frames; False if some still do after timeout"""
+        deadline = time.monotonic() + timeout
+        while any(connection.pending() and not connection.closed for connection in connections):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+        
+    def stop(self):
+        """Stop the pump thread after its current pass; queued frames stay queued"""
+        self.running = False
+        try:
+            self.wake_writer.send(b'\0')
+        except OSError:
+            pass
+        self.thread.join()
+        
+    def _flush(self, connection):
+        try:
+            drained = connection.closed or connection.flush()
+        except OSError:
+            connection.close()
+            drained = True
+        
+        if drained and connection in self.waiting:
+            self.waiting.discard(connection)
+            try:
+                self.selector.unregister(connection.sock)
+            except (KeyError, ValueError, OSError):
+                pass
+        elif not drained and connection not in self.waiting:
+            try:
+                try:
+                    self.selector.register(connection.sock, selectors.EVENT_WRITE, connection)
+                except KeyError:
+                    # The fd number was reused after a parked socket was closed elsewhere
+                    stale = self.selector.get_key(connection.sock).data
+                    self.waiting.discard(stale)
+                    self.selector.unregister(connection.sock)
+                    self.selector.register(connection.sock, selectors.EVENT_WRITE, connection)
+                self.waiting.add(connection)
+            except (KeyError, ValueError, OSError):
+                connection.close()
+
+
+class Heartbeat:
+    """Liveness and round-trip time of one connection, as seen by the server
+    
+    Every pong echoes the clock reading of the ping it answers, so it is an
+    RTT sample without any per-ping bookkeeping. The smoothed RTT and its
+    jitter (mean deviation) are EWMAs as in TCP's retransmission timer.
+    Any data from the peer counts as a sign of life.
+    """
+    
+    def __init__(self):
+        self.last_seen = time.monotonic()
+        self.rtt = None  # Smoothed RTT in seconds; None until the first pong
+        self.jitter = 0.0
+        self.samples = 0
+        
+    def seen(self):
+        self.last_seen = time.monotonic()
+        
+    def pong(self, message):
+        """Take an RTT sample from a pong; returns it, or None if it was not one of our pings"""
+        now = self.last_seen = time.monotonic()
+        try:
+            sample = now - float(message["t"])
+        except (KeyError, TypeError, ValueError):
+            return None
+        if not 0 <= sample <= IDLE_TIMEOUT:
+            return None
+        if self.rtt is None:
+            self.rtt = sample
+            self.jitter = sample / 2
+        else:
+            self.jitter += RTT_JITTER_GAIN * (abs(self.rtt - sample) - self.jitter)
+            self.rtt += RTT_GAIN * (sample - self.rtt)
+        self.samples += 1
+        return sample
+        
+    def is_idle(self, now=None, timeout=IDLE_TIMEOUT):
+        """True once nothing has arrived for timeout seconds"""
+        return (now or time.monotonic()) - self.last_seen > timeout
+        
+    def stats(self):
+        """{"rtt_ms", "jitter_ms"}, None until measured"""
+        if self.rtt is None:
+            return {"rtt_ms": None, "jitter_ms": None}
+        return {"rtt_ms": round(self.rtt * 1000, 1), "jitter_ms": round(self.jitter * 1000, 1)}
+
+
+class ClockSync:
+    """A client's estimate of the server's monotonic clock
+    
+    Each clock_sync exchange gives an offset ((t1 - t0) + (t2 - t3)) / 2 and a
+    round-trip delay (t3 - t0) - (t2 - t1). The sample with the lowest delay
+    has the least room for asymmetric queueing, so its offset is kept.
+    """
+    
+    def __init__(self, samples=CLOCK_SYNC_SAMPLES):
+        self.wanted = samples
+        self.samples = 0
+        self.offset = None  # Server clock minus ours, in seconds; None until the first reply
+        self.delay = None
+        
+    @property
+    def done(self):
+        return self.samples >= self.wanted
+        
+    def reply(self, message):
+        """Take a sample from a clock_sync reply; False if it was malformed"""
+        t3 = time.monotonic()
+        try:
+            t0, t1, t2 = float(message["t0"]), float(message["t1"]), float(message["t2"])
+        except (KeyError, TypeError, ValueError):
+            return False
+        delay = (t3 - t0) - (t2 - t1)
+        if delay < 0:
+            return False
+        self.samples += 1
+        if self.delay is None or delay < self.delay:
+            self.delay = delay
+            self.offset = ((t1 - t0) + (t2 - t3)) / 2
+        return True
+        
+    def server_time(self):
+        """Our best guess at the server's monotonic clock right now"""
+        return time.monotonic() + (self.offset or 0.0)
+        
+    def remaining(self, deadline):
+        """Seconds until a deadline given in server time"""
+        return deadline - self.server_time()
+        
+        
+def rtt_summary(heartbeats):
+    """Room-level RTT from {name: Heartbeat}: averages, the maximum and the slowest peers first"""
+    measured = sorted(((heartbeat.rtt, heartbeat.jitter, name) for name, heartbeat in heartbeats.items()
+                       if heartbeat.rtt is not None), reverse=True)
+    if not measured:
+        return {"measured": 0, "rtt_avg_ms": None, "rtt_max_ms": None, "jitter_avg_ms": None, "slowest": []}
+    return {
+        "measured": len(measured),
+        "rtt_avg_ms": round(sum(rtt for rtt, _, _ in measured) / len(measured) * 1000, 1),
+        "rtt_max_ms": round(measured[0][0] * 1000, 1),
+        "jitter_avg_ms": round(sum(jitter for _, jitter, _ in measured) / len(measured) * 1000, 1),
+        "slowest": [[name, round(rtt * 1000, 1), round(jitter * 1000, 1)] for rtt, jitter, name in measured]
+    }
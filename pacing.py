@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Adaptive question pacing
+Each room times its questions from how fast its players actually answer:
+the next deadline covers a high percentile of recent answer times, within
+configured bounds, and once a quorum has answered the rest get a short
+closing window instead of the full deadline. Time saved is measured against
+running every question for the fixed default timeout.
+"""
+
+import collections
+import math
+
+PACING_WINDOW = 200  # Answer times kept per room (several questions' worth)
+PACING_MIN_SAMPLES = 5  # Below this, questions use the default timeout
+PACING_PERCENTILE = 0.9  # The deadline covers this share of recent answer times...
+PACING_HEADROOM = 1.5  # ...with this much slack on top
+ANSWER_QUORUM = 0.75  # Share of connected players whose answers start the closing window
+QUORUM_CLOSING_TIME = 3.0  # Seconds left for everyone else once the quorum is in
+PACER_STATE = ("timeout", "questions", "early_closes", "quorum_closes", "time_saved", "game_time_saved")
+
+def percentile(sorted_values, fraction):
+    """The value at fraction (0..1) of a sorted, non-empty list"""
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class QuestionPacer:
+    """Per-room deadlines fitted to the answer-time distribution
+    
+    Players who had not answered when a question closed count as having
+    taken the whole time it was open, so a room that keeps running out of
+    time gets longer deadlines, and one that answers fast gets shorter ones.
+    Not thread-safe: callers hold their room's lock or run on one thread.
+    """
+    
+    def __init__(self, default_timeout, min_timeout, max_timeout, quorum=ANSWER_QUORUM,
+                 closing_time=QUORUM_CLOSING_TIME, window=PACING_WINDOW):
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.quorum = quorum
+        self.closing_time = closing_time
+        self.latencies = collections.deque(maxlen=window)
+        self.timeout = default_timeout  # The current (or last) question's
+        self.questions = 0
+        self.early_closes = 0  # Closed before the deadline: everyone answered, or the quorum window ran out
+        self.quorum_closes = 0
+        self.time_saved = 0.0  # Seconds, against default_timeout per question; negative when extended
+        self.game_time_saved = 0.0
+        
+    def new_game(self):
+        self.game_time_saved = 0.0
+        
+    def next_timeout(self):
+        """The next question's timeout: PACING_HEADROOM over the PACING_PERCENTILE answer time, within bounds"""
+        if len(self.latencies) < PACING_MIN_SAMPLES:
+            timeout = self.default_timeout
+        else:
+            timeout = percentile(sorted(self.latencies), PACING_PERCENTILE) * PACING_HEADROOM
+        self.timeout = round(min(self.max_timeout, max(self.min_timeout, timeout)))  # Whole seconds, for countdowns
+        return self.timeout
+        
+    def answered(self, latency):
+        """Record how long a player took to answer"""
+        self.latencies.append(max(0.0, latency))
+        
+    def quorum_deadline(self, answered, players, now, deadline):
+        """An earlier deadline once a quorum of players has answered; None to keep the current one"""
+        if answered >= players or answered < math.ceil(players * self.quorum):
+            return None  # Everyone is in (the caller closes the question), or not enough yet
+        closing = now + self.closing_time
+        if closing >= deadline:
+            return None
+        self.quorum_closes += 1
+        return closing
+        
+    def closed(self, duration, unanswered):
+        """Account for a question that was open for duration seconds, with unanswered players left"""
+        for _ in range(unanswered):
+            self.latencies.append(duration)
+        self.questions += 1
+        if duration < self.timeout:
+            self.early_closes += 1
+        saved = self.default_timeout - duration
+        self.time_saved += saved
+        self.game_time_saved += saved
+        
+    def stats(self):
+        """Current timeout, answer-time percentiles and time saved, for metrics"""
+        latencies = sorted(self.latencies)
+        return {
+            "timeout": self.timeout,
+            "answer_p50": round(percentile(latencies, 0.5), 2) if latencies else None,
+            "answer_p90": round(percentile(latencies, PACING_PERCENTILE), 2) if latencies else None,
+            "questions": self.questions,
+            "early_closes": self.early_closes,
+            "quorum_closes": self.quorum_closes,
+            "time_saved": round(self.time_saved, 1)
+        }
+        
+    def snapshot(self):
+        state = {name: getattr(self, name) for name in PACER_STATE}
+        state["latencies"] = list(self.latencies)
+        return state
+        
+    def restore(self, state):
+        for name in PACER_STATE:
+            setattr(self, name, state[name])
+        self.latencies.extend(state["latencies"])
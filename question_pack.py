@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Pre-encoded question packs
+When a game starts, its questions are drawn fresh from the bank and every
+frame the game will send about them (each question, its timeout with the
+correct answer, and the right and wrong answer feedback) is serialized once,
+up front. Sending a question is then a handoff of bytes already built.
+Fields only known at send time, such as a deadline or a sequence number, are
+spliced onto the pre-encoded JSON rather than re-serializing the question.
+"""
+
+import json
+import random
+from network_utils import encode_message, frame_payload
+
+def encode_head(message):
+    """A message's JSON without its closing brace, for fields added at send time"""
+    return json.dumps(message).encode('utf-8')[:-1]
+
+def finish_head(head, fields):
+    """Frame a head from encode_head() with fields appended"""
+    if not fields:
+        return frame_payload(head + b'}')
+    return frame_payload(head + b', ' + json.dumps(fields).encode('utf-8')[1:])
+
+
+class QuestionPack:
+    """One game's questions and their frames, ready to send
+    
+    Questions are numbered from 1, as in the messages. A pack is not changed
+    once built, so any thread can read it.
+    """
+    
+    def __init__(self, game_questions, question_fields=None):
+        self.questions = game_questions
+        self.answers = [question["answer"] for question in game_questions]
+        self.question_heads = []
+        self.timeout_heads = []
+        self.feedback_frames = []  # (wrong, right) per question
+        for number, question in enumerate(game_questions, 1):
+            self.question_heads.append(encode_head(dict({
+                "type": "question",
+                "question_number": number,
+                "total_questions": len(game_questions),
+                "question": question["question"],
+                "options": question["options"]
+            }, **(question_fields or {}))))
+            self.timeout_heads.append(encode_head({"type": "timeout", "correct_answer": question["answer"]}))
+            self.feedback_frames.append(tuple(encode_message({
+                "type": "answer_feedback",
+                "correct": correct,
+                "correct_answer": question["answer"]
+            }) for correct in (False, True)))
+        # Messages with no send-time fields are sent exactly as built
+        self.question_frames = [finish_head(head, None) for head in self.question_heads]
+        self.timeout_frames = [finish_head(head, None) for head in self.timeout_heads]
+        
+    @classmethod
+    def draw(cls, bank, count, question_fields=None):
+        """A pack of count questions picked at random from bank"""
+        return cls(random.sample(bank, min(len(bank), count)), question_fields)
+        
+    def __len__(self):
+        return len(self.questions)
+        
+    def answer(self, number):
+        return self.answers[number - 1]
+        
+    def question(self, number, **fields):
+        """The frame for question number, with any send-time fields"""
+        if not fields:
+            return self.question_frames[number - 1]
+        return finish_head(self.question_heads[number - 1], fields)
+        
+    def timeout(self, number, **fields):
+        """The frame revealing question number's answer when time runs out"""
+        if not fields:
+            return self.timeout_frames[number - 1]
+        return finish_head(self.timeout_heads[number - 1], fields)
+        
+    def feedback(self, number, correct):
+        """The frame telling a player whether their answer to question number was right"""
+        return self.feedback_frames[number - 1][bool(correct)]
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+AWS Trivia Game Relay
+Holds one multiplexed connection upstream (to async_server.py or to another
+relay) and serves players and child relays downstream. Broadcasts arrive once
+and are fanned out locally; players' messages are batched upstream. Relays
+stack into a tree, and each one logs how long broadcasts took to reach its tier.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import signal
+import time
+from network_utils import encode_message, frame_payload, pong_message, rtt_summary, MessageReader, HEARTBEAT_INTERVAL
+from async_server import (TriviaProtocol, RelayLink, ping_connections, raise_file_limit, LISTEN_BACKLOG,
+                          RELAY_BATCH_LIMIT)
+
+try:
+    import uvloop  # Optional: faster drop-in event loop
+    HAS_UVLOOP = True
+except ImportError:
+    HAS_UVLOOP = False
+
+# Relay configuration
+HOST = '0.0.0.0'
+PORT = 5100
+UPSTREAM_HOST = '127.0.0.1'
+UPSTREAM_PORT = 5000
+MAX_CLIENTS = 20000  # Players and child relays connected to this relay
+UPSTREAM_BATCH_INTERVAL = 0.005  # Seconds a player message may wait to share an upstream batch
+LOGGED_BROADCASTS = ('question', 'game_over')  # Broadcast types whose tier latency is printed
+
+class DownstreamProtocol(TriviaProtocol):
+    """A player or child relay connected to this relay
+    
+    A player's messages go upstream unchanged under an id assigned here; the
+    origin server does all validation and game logic.
+    """
+    
+    def __init__(self, relay):
+        super().__init__(relay)
+        self.player_id = None
+        self.member = False  # True once the origin accepted the join; only members get broadcasts
+        
+    def connection_made(self, transport):
+        super().connection_made(transport)
+        self.server.downstream[self] = None
+        
+    def connection_lost(self, exc):
+        super().connection_lost(exc)
+        self.server.downstream.pop(self, None)
+        
+    def handle_message(self, message):
+        """Forward a player's message upstream; a relay_hello makes this a child relay, and pongs stop here"""
+        if (self.relay_link or message["type"] == "pong"
+                or (self.player_id is None and message["type"] == "relay_hello")):
+            super().handle_message(message)
+            return
+            
+        if self.player_id is None:
+            if message["type"] != "join":
+                return
+            self.nickname = str(message.get("nickname") or "").strip()[:20]  # For log lines
+            self.player_id = self.server.add_route(self)
+        self.server.send_upstream(self.player_id, message)
+        
+    def deliver(self, message):
+        """A message from the origin for this player; None closes the connection"""
+        if message is None:
+            self.server.members.pop(self, None)
+            self.player_id = None
+            self.nickname = None
+            self.transport.close()
+            return
+        if not self.member and message["type"] != "error":
+            self.member = True
+            self.server.members[self] = None
+            if self.join_timer:
+                self.join_timer.cancel()
+                self.join_timer = None
+        self.send(message)
+
+
+class ChildRelay(RelayLink):
+    """A relay connected below this one
+    
+    Its player ids are mapped onto ids of this relay, so every player in the
+    subtree has one id on the upstream connection.
+    """
+    
+    def __init__(self, relay, protocol, name):
+        super().__init__(relay, protocol, name)
+        self.ids = {}  # {child's player id: our player id}
+        
+    def handle_message(self, message):
+        """Pass the child's batched player messages upstream under our ids"""
+        if message["type"] != "relay_batch":
+            return
+        for child_id, client_message in message["messages"]:
+            player_id = self.ids.get(child_id)
+            if client_message is None:
+                if player_id is not None:
+                    del self.ids[child_id]
+                    self.server.remove_route(player_id)
+                continue
+            if player_id is None:
+                player_id = self.ids[child_id] = self.server.add_route(self, child_id)
+            self.server.send_upstream(player_id, client_message)
+            
+    def deliver(self, child_id, message):
+        """Queue a message from the origin for one of the child's players; None disconnects it"""
+        if message is None:
+            self.ids.pop(child_id, None)
+            self.queue(child_id, None)
+        else:
+            self.queue(child_id, json.dumps(message).encode('utf-8'))
+            
+    def close(self):
+        """The child went away: every player behind it leaves"""
+        if self.flush_handle:
+            self.flush_handle.cancel()
+        ids, self.ids = self.ids, {}
+        for player_id in ids.values():
+            self.server.remove_route(player_id)
+
+
+class UpstreamProtocol(asyncio.Protocol):
+    """The relay's single connection towards the origin"""
+    
+    def __init__(self, relay):
+        self.relay = relay
+        self.reader = MessageReader()
+        self.transport = None
+        
+    def connection_made(self, transport):
+        self.transport = transport
+        transport.writelines(encode_message({"type": "relay_hello", "name": self.relay.name}))
+        
+    def data_received(self, data):
+        self.reader.feed(data)
+        while True:
+            message = self.reader.pop_message()
+            if message is None:
+                break
+            self.relay.handle_upstream(message)
+            
+    def connection_lost(self, exc):
+        self.relay.upstream_lost()
+
+
+class RelayServer:
+    """One relay process: a node in the broadcast tree
+    
+    All state is touched only from the loop thread, so no locks are needed.
+    """
+    
+    def __init__(self, host=HOST, port=PORT, upstream_host=UPSTREAM_HOST, upstream_port=UPSTREAM_PORT,
+                 name=None, max_clients=MAX_CLIENTS):
+        self.host = host
+        self.port = port
+        self.upstream_host = upstream_host
+        self.upstream_port = upstream_port
+        self.name = name or f"relay-{port}"
+        self.max_players = max_clients  # Checked by TriviaProtocol.connection_made
+        self.tier = None  # Hops from the origin, assigned by relay_welcome
+        self.upstream = None
+        self.welcomed = None
+        self.server = None
+        self.downstream = {}  # {DownstreamProtocol: None}, every connection
+        self.members = {}  # {DownstreamProtocol: None}, players the origin accepted
+        self.children = {}  # {ChildRelay: None}
+        self.routes = {}  # {player id: (DownstreamProtocol, None) or (ChildRelay, child's player id)}
+        self.player_ids = itertools.count(1)
+        self.pending = []  # Encoded [player id, message] pairs for the next upstream batch
+        self.flush_handle = None
+        self.heartbeat_handle = None
+        self.latencies = []  # Origin-to-this-tier broadcast latencies since the last game_over
+        
+    async def serve(self):
+        """Connect upstream, then accept players and child relays until cancelled"""
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.shutdown)
+            
+        self.welcomed = loop.create_future()
+        _, self.upstream = await loop.create_connection(
+            lambda: UpstreamProtocol(self), self.upstream_host, self.upstream_port)
+        try:
+            await self.welcomed
+        except asyncio.CancelledError:
+            return
+            
+        self.server = await loop.create_server(
+            lambda: DownstreamProtocol(self), self.host, self.port,
+            reuse_address=True, backlog=LISTEN_BACKLOG)
+        print(f"Relay {self.name} (tier {self.tier}) started on {self.host}:{self.port}, "
+              f"upstream {self.upstream_host}:{self.upstream_port}" + (" (uvloop)" if HAS_UVLOOP else ""))
+        self.heartbeat_handle = loop.call_later(HEARTBEAT_INTERVAL, self.send_heartbeats)
+        try:
+            await self.server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+            
+    def shutdown(self):
+        """Stop the relay; players see their connection close"""
+        print(f"\nShutting down relay {self.name}...")
+        if self.heartbeat_handle:
+            self.heartbeat_handle.cancel()
+        if self.upstream:
+            self.upstream.transport.close()
+        for protocol in list(self.downstream):
+            protocol.transport.close()
+        if self.server:
+            self.server.close()
+        if self.welcomed and not self.welcomed.done():
+            self.welcomed.cancel()
+            
+    def upstream_lost(self):
+        if self.upstream:
+            print(f"Relay {self.name} lost its upstream connection")
+            self.upstream = None
+            self.shutdown()
+            
+    def player_count(self):
+        return len(self.downstream)
+        
+    def send_heartbeats(self):
+        """Ping players and child relays, dropping any gone silent, then reschedule"""
+        self.heartbeat_handle = asyncio.get_running_loop().call_later(HEARTBEAT_INTERVAL, self.send_heartbeats)
+        ping_connections(list(self.downstream))
+        
+    def add_route(self, target, child_id=None):
+        """Assign an upstream player id to a local player or a child relay's player"""
+        player_id = next(self.player_ids)
+        self.routes[player_id] = (target, child_id)
+        return player_id
+        
+    def remove_route(self, player_id):
+        """A player below this relay left: tell the origin"""
+        if self.routes.pop(player_id, None):
+            self.send_upstream(player_id, None)
+            
+    def remove_player(self, protocol):
+        """Called by TriviaProtocol.connection_lost for a local player"""
+        self.members.pop(protocol, None)
+        if protocol.player_id is not None:
+            self.remove_route(protocol.player_id)
+            
+    def add_relay(self, protocol, name):
+        """Accept a child relay one tier below this one"""
+        link = ChildRelay(self, protocol, name)
+        self.children[link] = None
+        print(f"Relay {name} connected from {protocol.peer()}")
+        protocol.send({"type": "relay_welcome", "tier": self.tier + 1})
+        return link
+        
+    def remove_relay(self, link):
+        if self.children.pop(link, 0) is None:
+            print(f"Relay {link.name} disconnected with {len(link.ids)} players")
+            link.close()
+            
+    def send_upstream(self, player_id, message):
+        """Queue a player's message (None: the player left) for the next upstream batch"""
+        if self.upstream is None:
+            return
+        payload = json.dumps(message).encode('utf-8') if message is not None else b'null'
+        self.pending.append(b'[%d,%b]' % (player_id, payload))
+        if len(self.pending) >= RELAY_BATCH_LIMIT:
+            self.flush_upstream()
+        elif self.flush_handle is None:
+            self.flush_handle = asyncio.get_running_loop().call_later(UPSTREAM_BATCH_INTERVAL, self.flush_upstream)
+            
+    def flush_upstream(self):
+        """Send queued player messages as one relay_batch frame"""
+        if self.flush_handle:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        if not self.pending or self.upstream is None:
+            return
+        payload = b'{"type": "relay_batch", "messages": [' + b', '.join(self.pending) + b']}'
+        self.pending = []
+        self.upstream.transport.writelines(frame_payload(payload))
+        
+    def handle_upstream(self, message):
+        """Dispatch one message from the origin (or the relay above)"""
+        if message["type"] == "relay_batch":
+            for player_id, player_message in message["messages"]:
+                route = self.routes.get(player_id)
+                if route is None:
+                    continue  # Left while the message was in flight
+                target, child_id = route
+                if player_message is None:
+                    del self.routes[player_id]
+                if child_id is None:
+                    target.deliver(player_message)
+                else:
+                    target.deliver(child_id, player_message)
+                    
+        elif message["type"] == "relay_broadcast":
+            self.fan_out(message)
+            
+        elif message["type"] == "ping":
+            self.upstream.transport.writelines(encode_message(pong_message(message)))
+            
+        elif message["type"] == "relay_welcome":
+            self.tier = message["tier"]
+            self.welcomed.set_result(True)
+            
+    def fan_out(self, envelope):
+        """Forward a broadcast to child relays (still enveloped) and to local players"""
+        latency = time.time() - envelope["sent_at"]
+        started = time.perf_counter()
+        if self.children:
+            child_frame = encode_message(envelope)
+            for link in list(self.children):
+                link.send_broadcast(child_frame)
+        message = envelope["message"]
+        frame = encode_message(message)
+        for protocol in list(self.members):
+            protocol.send_frame(frame)
+        elapsed = time.perf_counter() - started
+        
+        self.latencies.append(latency)
+        kind = message.get("type")
+        if kind in LOGGED_BROADCASTS:
+            label = f"question {message['question_number']}" if kind == "question" else kind
+            print(f"[relay {self.name}] tier {self.tier}: {label} arrived {latency * 1000:.1f} ms after the "
+                  f"origin sent it, fanned out to {len(self.members)} players and {len(self.children)} relays "
+                  f"in {elapsed * 1000:.1f} ms", flush=True)
+        if kind == "game_over":
+            latencies = sorted(self.latencies)
+            self.latencies = []
+            print(f"[relay {self.name}] tier {self.tier}: {len(latencies)} broadcasts this game, latency "
+                  f"p50 {latencies[len(latencies) // 2] * 1000:.1f} ms "
+                  f"p99 {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000:.1f} ms "
+                  f"max {latencies[-1] * 1000:.1f} ms", flush=True)
+            rtt = rtt_summary({protocol.nickname: protocol.heartbeat for protocol in self.members})
+            if rtt["measured"]:
+                print(f"[relay {self.name}] tier {self.tier}: player RTT avg {rtt['rtt_avg_ms']} ms "
+                      f"max {rtt['rtt_max_ms']} ms jitter avg {rtt['jitter_avg_ms']} ms, "
+                      f"slowest {rtt['slowest'][:3]}", flush=True)
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='AWS Trivia Game Relay')
+    parser.add_argument('--host', default=HOST, help='Interface to bind')
+    parser.add_argument('--port', type=int, default=PORT, help='Port to listen on')
+    parser.add_argument('--upstream-host', default=UPSTREAM_HOST, help='Origin server or parent relay host')
+    parser.add_argument('--upstream-port', type=int, default=UPSTREAM_PORT, help='Origin server or parent relay port')
+    parser.add_argument('--name', help='Name shown in upstream logs (default relay-PORT)')
+    parser.add_argument('--max-clients', type=int, default=MAX_CLIENTS, help='Maximum players and child relays')
+    
+    args = parser.parse_args()
+    
+    print(f"Open file limit: {raise_file_limit()}")
+    if HAS_UVLOOP:
+        uvloop.install()
+    relay = RelayServer(args.host, args.port, args.upstream_host, args.upstream_port, args.name, args.max_clients)
+    try:
+        asyncio.run(relay.serve())
+    except (ConnectionError, OSError) as e:
+        print(f"Relay error: {e}")
+
+
+if __name__ == "__main__":
+    main()
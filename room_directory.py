@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Room directory for multi-process game servers
+Workers sharing a port with SO_REUSEPORT agree on room ownership through a
+consistent hash ring. A join that lands on the wrong worker is handed over:
+the client socket is passed to the owner over a Unix datagram socket
+(SCM_RIGHTS) together with the join message already read from it.
+"""
+
+import array
+import base64
+import bisect
+import hashlib
+import json
+import os
+import socket
+import threading
+
+RING_REPLICAS = 64  # Virtual nodes per worker, so rooms spread evenly
+HANDOFF_BUFFER_SIZE = 64 * 1024  # Largest handoff datagram (join message plus buffered bytes)
+
+def ring_hash(key):
+    """Stable 64-bit hash of a string (Python's hash() differs per process)"""
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """Consistent hash ring: adding or removing a worker only moves its share of rooms"""
+    
+    def __init__(self, nodes, replicas=RING_REPLICAS):
+        self.points = sorted((ring_hash(f"{node}#{replica}"), node) for node in nodes for replica in range(replicas))
+        self.keys = [point for point, _ in self.points]
+        
+    def owner(self, key):
+        """The node owning key: the first ring point at or after its hash"""
+        index = bisect.bisect(self.keys, ring_hash(key)) % len(self.points)
+        return self.points[index][1]
+
+
+class RoomDirectory:
+    """Which worker owns which room, and the Unix sockets used to hand joins over"""
+    
+    def __init__(self, path, worker, workers):
+        self.path = path  # Directory holding one socket per worker
+        self.worker = worker
+        self.ring = HashRing(range(workers))
+        self.listener = None
+        self.sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.handoffs_sent = 0
+        self.handoffs_received = 0
+        
+    def socket_path(self, worker):
+        return os.path.join(self.path, f"worker-{worker}.sock")
+        
+    def owner(self, room_code):
+        return self.ring.owner(room_code)
+        
+    def owns(self, room_code):
+        return self.owner(room_code) == self.worker
+        
+    def start(self, on_handoff):
+        """Listen for joins handed over by other workers; on_handoff(sock, addr, message, buffered)"""
+        path = self.socket_path(self.worker)
+        try:
+            os.unlink(path)  # Left behind by a worker this one replaces
+        except FileNotFoundError:
+            pass
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.listener.bind(path)
+        thread = threading.Thread(target=self.receive_handoffs, args=(on_handoff,), name='room-directory')
+        thread.daemon = True
+        thread.start()
+        
+    def receive_handoffs(self, on_handoff):
+        while True:
+            try:
+                data, fds, _, _ = socket.recv_fds(self.listener, HANDOFF_BUFFER_SIZE, 1)
+            except OSError:
+                return  # Listener closed
+            if not fds:
+                continue
+            client_socket = socket.socket(fileno=fds[0])
+            try:
+                handoff = json.loads(data)
+            except ValueError:
+                client_socket.close()
+                continue
+            self.handoffs_received += 1
+            on_handoff(client_socket, tuple(handoff["addr"]), handoff["message"],
+                       base64.b64decode(handoff["buffered"]))
+                       
+    def forward(self, room_code, client_socket, addr, message, buffered=b''):
+        """Pass a client socket and its join message to the room's owner; False if it is unreachable
+        
+        The caller still closes its own copy of the socket afterwards.
+        """
+        handoff = json.dumps({
+            "addr": list(addr),
+            "message": message,
+            "buffered": base64.b64encode(buffered).decode('ascii')
+        }).encode('utf-8')
+        try:
+            # socket.send_fds() drops its address argument, so build the SCM_RIGHTS message here
+            self.sender.sendmsg([handoff], [(socket.SOL_SOCKET, socket.SCM_RIGHTS,
+                                             array.array('i', [client_socket.fileno()]))],
+                                0, self.socket_path(self.owner(room_code)))
+        except OSError as e:
+            print(f"Room handoff to worker {self.owner(room_code)} failed: {e}")
+            return False
+        self.handoffs_sent += 1
+        return True
+        
+    def close(self):
+        if self.listener:
+            self.listener.close()
+        self.sender.close()
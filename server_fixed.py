@@ -4,61 +4,220 @@ AWS Trivia Game Server - Fixed Version
 Handles multiple client connections reliably
 """
 
+import os
+import base64
 import socket
+import selectors
 import threading
 import json
 import time
-import random
+import secrets
+import shutil
 import signal
 import sys
+import tempfile
+import argparse
 from questions import questions
-from network_utils import send_message, receive_message
+from timer_wheel import get_timer_wheel
+from leaderboard import Leaderboard
+from room_directory import RoomDirectory
+from session_resume import ReplayBuffer, new_resume_token, RESUME_GRACE_PERIOD
+from pacing import QuestionPacer
+from question_pack import QuestionPack
+from game_actor import get_actor_pool
+from admission import Admission, LISTEN_BACKLOG, ACCEPT_RATE, ACCEPT_BURST, MAX_CONNECTIONS
+from handoff import (ActivityGate, handoff_listener, send_handoff, receive_handoff, HANDOFF_TIMEOUT,
+                     HANDOFF_ACK, HANDOFF_BYE)
+from network_utils import (send_message, send_frame, encode_message, frame_payload, ping_message, clock_sync_reply,
+                           rtt_summary, MessageReader, ClientConnection, OutboundPump, Heartbeat, OUTBOUND_QUEUE_LIMIT,
+                           OVERFLOW_COALESCE, HEARTBEAT_INTERVAL, IDLE_TIMEOUT)
 
 # Game configuration
 HOST = '0.0.0.0'
 PORT = 5000
 MAX_PLAYERS = 10
-QUESTION_TIMEOUT = 15
+QUESTION_TIMEOUT = 15  # Until a room has answer times to pace by (pacing.py)
+QUESTION_TIMEOUT_MIN = 5  # Bounds for adaptively paced questions
+QUESTION_TIMEOUT_MAX = 30
+MAX_LATENCY_COMPENSATION = 0.5  # Most one-way delay (RTT / 2) credited to an answer that arrives after the deadline
 WAIT_TIME_BETWEEN_QUESTIONS = 3
+GAME_START_DELAY = 2
+QUESTIONS_PER_GAME = 20
+
+# Rooms: a join message may carry a room code; players without one share DEFAULT_ROOM
+DEFAULT_ROOM = 'lobby'
+ROOM_CODE_MAX_LENGTH = 16
+MAX_ROOMS = 10000
+METRICS_INTERVAL = 0  # Seconds between metrics lines; 0 disables
+METRICS_TOP_ROOMS = 10  # Busiest rooms printed per metrics line
+METRICS_SLOWEST_PLAYERS = 5  # Players with the highest RTT listed per room
+
+# Multi-process mode: workers share the port with SO_REUSEPORT and each room lives on one worker
+WORKERS = 1  # More than 1 runs a supervisor that forks this many workers
+WORKER_RESTART_DELAY = 1.0  # Seconds before a crashed worker is replaced
+
+# Zero-downtime restarts: a new process started with --takeover receives the sockets and games
+JOIN_TIMEOUT = 30.0  # Seconds a new connection has to send its join message
+HANDOFF_POLL_INTERVAL = 1.0  # Client threads wake this often to notice a handoff
+HANDOFF_DRAIN_TIMEOUT = 2.0  # Seconds to let queued frames go out before the rest is carried over
+
+# Per-client outbound queues: a client whose queue overflows has stale
+# leaderboard/lobby updates coalesced, and is disconnected otherwise
+OUTBOUND_OVERFLOW_POLICY = OVERFLOW_COALESCE
+COALESCE_KINDS = ('leaderboard', 'rank', 'player_joined', 'player_left', 'ping')
 
 class TriviaBroadcaster:
     """Manages broadcasting messages to all connected clients"""
     
-    def __init__(self):
+    def __init__(self, pump=None):
         self.clients = {}  # {client_socket: nickname}
-        self.scores = {}   # {nickname: score}
+        self.leaderboard = Leaderboard()  # Scores, ranks and top-K snapshots
+        self.connections = {}  # {client_socket: ClientConnection}
+        self.heartbeats = {}  # {client_socket: Heartbeat}
+        self.pump = pump or OutboundPump()
+        self.replay = ReplayBuffer()  # Recent broadcasts as (kind, frame), for players resuming a session
         self.lock = threading.RLock()  # Use RLock for nested locking
         
     def add_client(self, client_socket, nickname):
         """Add a new client to the broadcaster"""
         with self.lock:
             # Check for duplicate nicknames
-            if nickname in self.scores:
+            if nickname in self.leaderboard:
                 return False
-            self.clients[client_socket] = nickname
-            self.scores[nickname] = 0
+            self.leaderboard.add(nickname)
+            self._attach(client_socket, nickname)
             return True
             
+    def _attach(self, client_socket, nickname):
+        self.clients[client_socket] = nickname
+        self.heartbeats[client_socket] = Heartbeat()
+        connection = self.connections[client_socket] = ClientConnection(
+            client_socket, self.pump, OUTBOUND_QUEUE_LIMIT, OUTBOUND_OVERFLOW_POLICY, COALESCE_KINDS)
+        return connection
+        
+    def disconnect_client(self, client_socket):
+        """Close a client's connection but keep its nickname and score, so the player can resume"""
+        with self.lock:
+            nickname = self.clients.pop(client_socket, None)
+            if nickname is not None:
+                self.connections.pop(client_socket).close()
+                self.heartbeats.pop(client_socket, None)
+            return nickname
+            
+    def resume_client(self, client_socket, nickname, last_seq, message):
+        """Put a held nickname on a new connection: queue message, then every broadcast after last_seq
+        
+        message is completed with the player's score and rank and whether the
+        replay is complete (False when the gap is older than the replay buffer).
+        Runs under the lock, so no live broadcast can slip in between.
+        """
+        with self.lock:
+            previous = self.get_client_by_nickname(nickname)
+            if previous is not None:
+                self.disconnect_client(previous)  # Its reader has not noticed the drop yet
+            connection = self._attach(client_socket, nickname)
+            missed = self.replay.since(last_seq)
+            connection.send_message(dict(
+                message,
+                score=self.leaderboard.score(nickname),
+                rank=self.leaderboard.rank(nickname),
+                players=len(self.clients),
+                last_seq=self.replay.last_seq,
+                replayed=len(missed or []),
+                complete=missed is not None))
+            for kind, frame in missed or []:
+                connection.send(frame, kind)
+            
+    def note_received(self, client_socket, message):
+        """Any message is a sign of life; a pong is also an RTT sample"""
+        heartbeat = self.heartbeats.get(client_socket)
+        if heartbeat is None:
+            return
+        if message["type"] == "pong":
+            heartbeat.pong(message)
+        else:
+            heartbeat.seen()
+            
+    def ping(self, frame):
+        """Queue a heartbeat frame for every client and disconnect those idle for IDLE_TIMEOUT
+        
+        Returns the nicknames disconnected; their reader threads see the socket
+        close and handle the rest as for any dropped connection.
+        """
+        now = time.monotonic()
+        idle = []
+        with self.lock:
+            for client_socket, heartbeat in list(self.heartbeats.items()):
+                if heartbeat.is_idle(now):
+                    idle.append(self.clients[client_socket])
+                    self.connections[client_socket].close()
+                else:
+                    self.connections[client_socket].send(frame, "ping")
+        return idle
+        
+    def one_way_delay(self, client_socket):
+        """Estimated client-to-server delay: half the smoothed RTT, capped at MAX_LATENCY_COMPENSATION"""
+        heartbeat = self.heartbeats.get(client_socket)
+        if heartbeat is None or heartbeat.rtt is None:
+            return 0.0
+        return min(heartbeat.rtt / 2, MAX_LATENCY_COMPENSATION)
+        
+    def max_one_way_delay(self):
+        """The largest one_way_delay() of any connected client"""
+        with self.lock:
+            return max((self.one_way_delay(s) for s in self.heartbeats), default=0.0)
+            
+    def get_rtt_stats(self):
+        """RTT summary over connected players, slowest first"""
+        with self.lock:
+            return rtt_summary({self.clients[s]: heartbeat for s, heartbeat in self.heartbeats.items()})
+            
+    def forget(self, nickname):
+        """Drop a disconnected player's score for good"""
+        with self.lock:
+            self.leaderboard.remove(nickname)
+                        
     def remove_client(self, client_socket):
         """Remove a client from the broadcaster"""
         with self.lock:
             if client_socket in self.clients:
                 nickname = self.clients[client_socket]
                 del self.clients[client_socket]
-                if nickname in self.scores:
-                    del self.scores[nickname]
+                self.connections.pop(client_socket).close()
+                self.heartbeats.pop(client_socket, None)
+                self.leaderboard.remove(nickname)
                 return nickname
             return None
                 
     def broadcast(self, message, exclude=None):
         """Send a message to all connected clients except excluded ones"""
+        # Serialize and frame once, however many players are connected. Numbered
+        # and kept, so a player resuming a session can be sent what it missed
+        with self.lock:
+            frame = encode_message(dict(message, seq=self.replay.next_seq))
+            self.replay.append((message.get("type"), frame))
+            self.broadcast_frame(frame, exclude, message.get("type"))
+            
+    def broadcast_prepared(self, build, kind):
+        """Broadcast a pre-encoded message; build(seq) returns its frame, numbered seq"""
+        with self.lock:
+            frame = build(self.replay.next_seq)
+            self.replay.append((kind, frame))
+            self.broadcast_frame(frame, None, kind)
+        
+    def broadcast_frame(self, frame, exclude=None, kind=None):
+        """Queue the same pre-encoded frame for all connected clients except excluded ones
+        
+        Only enqueues: the outbound pump does the socket writes, so the lock
+        is never held across a blocking send.
+        """
         with self.lock:
             disconnected = []
-            clients_copy = list(self.clients.keys())  # Create a copy to avoid modification during iteration
+            connections_copy = list(self.connections.items())  # Create a copy to avoid modification during iteration
             
-            for client_socket in clients_copy:
+            for client_socket, connection in connections_copy:
                 if client_socket != exclude:
-                    if not send_message(client_socket, message):
+                    if not connection.send(frame, kind):
                         disconnected.append(client_socket)
             
             # Clean up disconnected clients
@@ -68,19 +227,44 @@ class TriviaBroadcaster:
     def update_score(self, nickname, points=1):
         """Update a player's score"""
         with self.lock:
-            if nickname in self.scores:
-                self.scores[nickname] += points
+            self.leaderboard.update(nickname, points)
                 
     def get_leaderboard(self):
-        """Get the current leaderboard sorted by score"""
+        """Get the top of the leaderboard, highest score first"""
+        with self.lock:
+            return self.leaderboard.top()
+            
+    def get_leaderboard_updates(self):
+        """Top-K changes since the last call, plus (socket, rank, score) for players whose rank moved"""
+        with self.lock:
+            full, entries, size = self.leaderboard.top_delta()
+            sockets = {nickname: client_socket for client_socket, nickname in self.clients.items()}
+            ranks = [(sockets[name], rank, score) for name, rank, score in self.leaderboard.rank_changes()
+                     if name in sockets]
+            return full, entries, size, ranks
+            
+    def reset_leaderboard_snapshot(self):
+        """Make the next leaderboard update a full snapshot"""
         with self.lock:
-            return sorted(self.scores.items(), key=lambda x: x[1], reverse=True)
+            self.leaderboard.reset_snapshot()
             
     def get_player_count(self):
         """Get the current number of connected players"""
         with self.lock:
             return len(self.clients)
     
+    def send_to(self, client_socket, message):
+        """Send a message to one client through its outbound queue"""
+        return self.send_frame_to(client_socket, encode_message(message), message.get("type"))
+        
+    def send_frame_to(self, client_socket, frame, kind=None):
+        """Send a pre-encoded frame to one client through its outbound queue"""
+        with self.lock:
+            connection = self.connections.get(client_socket)
+        if connection is None:
+            return send_frame(client_socket, frame)
+        return connection.send(frame, kind)
+    
     def get_client_by_nickname(self, nickname):
         """Get client socket by nickname"""
         with self.lock:
@@ -90,258 +274,333 @@ class TriviaBroadcaster:
             return None
 
 
-class TriviaServer:
-    """Main server class that manages the game"""
+class GameRoom:
+    """One independent game: its own players, questions, timer and metrics"""
     
-    def __init__(self):
-        self.server_socket = None
-        self.broadcaster = TriviaBroadcaster()
+    def __init__(self, code, pump, max_players=MAX_PLAYERS, question_count=QUESTIONS_PER_GAME, on_idle=None,
+                 gate=None):
+        self.code = code
+        self.max_players = max_players
+        self.on_idle = on_idle  # Called when a game ends, so an abandoned room can be released
+        self.gate = gate or ActivityGate()  # Closed while the server hands off to a new process
+        self.broadcaster = TriviaBroadcaster(pump)
         self.game_in_progress = False
-        self.accepting_players = True
         self.current_question_index = 0
         self.answered_current_question = set()
+        self.question_open = False  # True from a question's broadcast until its timeout or last answer
+        self.question_deadline = None  # Server monotonic time after which an answer is too late
+        self.question_sent_at = None
         self.question_timer = None
-        self.game_questions = []
-        self.server_lock = threading.Lock()
+        self.pacer = QuestionPacer(QUESTION_TIMEOUT, QUESTION_TIMEOUT_MIN, QUESTION_TIMEOUT_MAX)
+        self.timers = get_timer_wheel()  # Shared by every room: no thread or sleep per game
+        self.actor = get_actor_pool().actor(code)  # Runs every game step (answers, timeouts), one at a time
+        self.question_count = question_count
+        self.pack = QuestionPack([])  # Drawn afresh, and pre-encoded, as each game starts
+        self.sessions = {}  # {nickname: resume token}
+        self.held = {}  # {nickname: (release TimerHandle, old socket)} seats of dropped players
+        self.lock = threading.Lock()
         
-        # Set up signal handlers for graceful shutdown
-        signal.signal(signal.SIGINT, self.shutdown)
-        signal.signal(signal.SIGTERM, self.shutdown)
+        # Per-room metrics
+        self.created_at = time.time()
+        self.games_started = 0
+        self.games_completed = 0
+        self.questions_sent = 0
+        self.answers_received = 0
+        self.correct_answers = 0
+        self.peak_players = 0
         
-    def start(self):
-        """Start the trivia server"""
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    def join(self, client_socket, nickname):
+        """Add a player to the room; returns an error message, or None on success"""
+        with self.lock:
+            if self.game_in_progress:
+                return "Game already in progress in this room"
+            if self.broadcaster.get_player_count() >= self.max_players:
+                return "Room is full. Try again later."
+            if not self.broadcaster.add_client(client_socket, nickname):
+                return "Nickname already taken"
+            self.peak_players = max(self.peak_players, self.broadcaster.get_player_count())
+        return None
         
-        try:
-            self.server_socket.bind((HOST, PORT))
-            self.server_socket.listen(MAX_PLAYERS)
-            print(f"Server started on {HOST}:{PORT}")
-            print("Waiting for players to connect...")
-            
-            # Prepare questions (shuffle them)
-            self.game_questions = random.sample(questions, min(len(questions), 20))  # Limit to 20 questions
-            
-            # Accept client connections
-            while self.accepting_players:
-                try:
-                    client_socket, addr = self.server_socket.accept()
-                    
-                    with self.server_lock:
-                        if self.broadcaster.get_player_count() >= MAX_PLAYERS:
-                            # Reject connection if max players reached
-                            send_message(client_socket, {
-                                "type": "error",
-                                "message": "Game is full. Try again later."
-                            })
-                            client_socket.close()
-                            continue
-                    
-                    print(f"New connection from {addr}")
-                    client_thread = threading.Thread(target=self.handle_client, args=(client_socket, addr))
-                    client_thread.daemon = True
-                    client_thread.start()
-                    
-                except socket.error:
-                    if self.accepting_players:
-                        print("Socket error occurred")
-                    break
-                    
-        except Exception as e:
-            print(f"Server error: {e}")
-        finally:
-            self.shutdown()
-            
-    def handle_client(self, client_socket, addr):
-        """Handle communication with a client"""
-        nickname = None
+    def open_session(self, nickname):
+        """Issue the resume token a joined player can reconnect with"""
+        token = new_resume_token()
+        with self.lock:
+            self.sessions[nickname] = token
+        return token
         
-        try:
-            # Set socket timeout to prevent hanging
-            client_socket.settimeout(30.0)
-            
-            # First message should be the nickname
-            message = receive_message(client_socket)
-            if not message:
+    def leave(self, client_socket):
+        """Remove a player and tell the rest of the room"""
+        nickname = self.broadcaster.remove_client(client_socket)
+        if nickname:
+            with self.lock:
+                self.sessions.pop(nickname, None)
+            self.broadcaster.broadcast({
+                "type": "player_left",
+                "nickname": nickname,
+                "player_count": self.broadcaster.get_player_count()
+            })
+        return nickname
+        
+    def hold(self, client_socket):
+        """Keep a dropped player's seat and score for RESUME_GRACE_PERIOD seconds
+        
+        Returns the nickname, or None if the socket has no session to resume
+        (the caller then lets the player leave).
+        """
+        with self.lock:
+            nickname = self.broadcaster.clients.get(client_socket)
+            if nickname not in self.sessions:
+                return None
+            self.broadcaster.disconnect_client(client_socket)
+            self.held[nickname] = (self.schedule(RESUME_GRACE_PERIOD, self.release_seat, nickname), client_socket)
+        return nickname
+        
+    def release_seat(self, nickname):
+        """The grace period ran out: the held player leaves for good"""
+        with self.lock:
+            if self.held.pop(nickname, None) is None:
                 return
+            self.sessions.pop(nickname, None)
+            self.broadcaster.forget(nickname)
+        print(f"Player {nickname} did not resume; removed from room {self.code}")
+        self.broadcaster.broadcast({
+            "type": "player_left",
+            "nickname": nickname,
+            "player_count": self.broadcaster.get_player_count()
+        })
+        if self.on_idle:
+            self.on_idle(self)
             
-            if message["type"] == "join":
-                nickname = message["nickname"]
-                
-                # Validate nickname
-                if not nickname or len(nickname.strip()) == 0:
-                    send_message(client_socket, {
-                        "type": "error",
-                        "message": "Invalid nickname"
-                    })
-                    return
-                
-                nickname = nickname.strip()[:20]  # Limit nickname length
-                
-                if not self.broadcaster.add_client(client_socket, nickname):
-                    send_message(client_socket, {
-                        "type": "error",
-                        "message": "Nickname already taken"
-                    })
-                    return
-                
-                print(f"Player {nickname} joined from {addr}")
-                
-                # Notify all clients about the new player
-                self.broadcaster.broadcast({
-                    "type": "player_joined",
-                    "nickname": nickname,
-                    "player_count": self.broadcaster.get_player_count()
-                })
-                
-                # If this is the first player, give them admin controls
-                if self.broadcaster.get_player_count() == 1:
-                    send_message(client_socket, {
-                        "type": "admin_rights",
-                        "message": "You are the host. Type 'start' to begin the game."
-                    })
-                else:
-                    send_message(client_socket, {
-                        "type": "wait_message",
-                        "message": "Waiting for the host to start the game..."
-                    })
-                
-                # Remove timeout for game communication
-                client_socket.settimeout(None)
-                
-                # Main client communication loop
-                while True:
-                    message = receive_message(client_socket)
-                    if not message:
-                        break
-                    
-                    if message["type"] == "start_game":
-                        with self.server_lock:
-                            if not self.game_in_progress and self.broadcaster.get_player_count() >= 1:
-                                self.game_in_progress = True
-                                self.accepting_players = False
-                                game_thread = threading.Thread(target=self.run_game)
-                                game_thread.daemon = True
-                                game_thread.start()
-                    
-                    elif message["type"] == "answer" and self.game_in_progress:
-                        self.process_answer(client_socket, nickname, message["answer"])
-            
-        except Exception as e:
-            print(f"Error handling client {addr}: {e}")
-        finally:
-            if nickname:
-                print(f"Client {nickname} disconnected")
-                self.broadcaster.broadcast({
-                    "type": "player_left",
-                    "nickname": nickname,
-                    "player_count": max(0, self.broadcaster.get_player_count() - 1)
-                })
-            self.broadcaster.remove_client(client_socket)
-            try:
-                client_socket.close()
-            except:
-                pass
+    def resume(self, client_socket, nickname, token, last_seq):
+        """Give a player back their seat on a new connection and replay what they missed
+        
+        Runs on the room's actor, which owns the answered set. Returns an error
+        message, or None on success.
+        """
+        if not self.actor.is_owner():
+            return self.actor.call(self.resume, client_socket, nickname, token, last_seq)
+        with self.lock:
+            expected = self.sessions.get(nickname)
+            if expected is None or not secrets.compare_digest(expected, token):
+                return "Session expired. Join again."
+            timer, previous = self.held.pop(nickname, (None, None))
+            if timer:
+                timer.cancel()
+            else:
+                previous = self.broadcaster.get_client_by_nickname(nickname)  # Dropped, but not noticed yet
+            answered = previous in self.answered_current_question
+            if answered:
+                # Carry the answer over to the new socket, so it cannot be given twice
+                self.answered_current_question.discard(previous)
+                self.answered_current_question.add(client_socket)
+            self.broadcaster.resume_client(client_socket, nickname, last_seq, {
+                "type": "resumed",
+                "room": self.code,
+                "nickname": nickname,
+                "answered": self.question_open and answered
+            })
+        return None
+        
+    def is_empty(self):
+        """True when nobody is connected or holding a seat, and no game is running"""
+        with self.lock:
+            return not self.game_in_progress and self.broadcaster.get_player_count() == 0 and not self.held
             
-    def process_answer(self, client_socket, nickname, answer_index):
-        """Process a player's answer to the current question"""
-        if client_socket in self.answered_current_question:
-            return  # Player already answered this question
+    def start_game(self):
+        """Start a game unless one is already running"""
+        with self.lock:
+            if self.game_in_progress or self.broadcaster.get_player_count() < 1:
+                return
+            self.game_in_progress = True
+            self.games_started += 1
+        self.run_game()
+        
+    def process_answer(self, client_socket, nickname, answer_index, received_at=None):
+        """Process a player's answer to the current question (on the room's actor: post() it)
+        
+        received_at is the server's monotonic clock when the answer arrived.
+        The answer counts if it was sent by the deadline: received_at less
+        the player's one-way delay, so a slow link doesn't cost a fast answer.
+        """
+        if client_socket in self.answered_current_question or not self.question_open:
+            return  # Player already answered this question, or it has closed
             
-        if self.current_question_index <= 0 or self.current_question_index > len(self.game_questions):
+        answered_at = time.monotonic()
+        if received_at is not None:
+            answered_at = received_at - self.broadcaster.one_way_delay(client_socket)
+            if self.question_deadline is not None and answered_at > self.question_deadline:
+                return  # Sent after the deadline, even allowing for latency
+        
+        if self.current_question_index <= 0 or self.current_question_index > len(self.pack):
             return  # Invalid question index
             
-        current_question = self.game_questions[self.current_question_index - 1]
-        correct = answer_index == current_question["answer"]
+        correct = answer_index == self.pack.answer(self.current_question_index)
         
+        self.answers_received += 1
         if correct:
+            self.correct_answers += 1
             self.broadcaster.update_score(nickname)
             
         # Mark this client as having answered
         self.answered_current_question.add(client_socket)
+        if self.question_sent_at is not None:
+            # Thinking time: from the question reaching the player to the answer leaving
+            self.pacer.answered(answered_at - self.question_sent_at - self.broadcaster.one_way_delay(client_socket))
         
         # Send feedback to the player
-        send_message(client_socket, {
-            "type": "answer_feedback",
-            "correct": correct,
-            "correct_answer": current_question["answer"]
-        })
+        self.broadcaster.send_frame_to(client_socket, self.pack.feedback(self.current_question_index, correct),
+                                       "answer_feedback")
         
         # If all players have answered, move to the next question
-        if len(self.answered_current_question) == self.broadcaster.get_player_count():
-            if self.question_timer:
-                self.question_timer.cancel()
+        player_count = self.broadcaster.get_player_count()
+        answered = self.connected_answers()
+        if answered >= player_count:
+            if self.question_timer and not self.question_timer.cancel():
+                return  # The timeout already fired (or another answer got here first)
+            self.close_question()
             self.send_leaderboard()
-            time.sleep(WAIT_TIME_BETWEEN_QUESTIONS)
-            self.next_question()
+            self.question_timer = self.schedule(WAIT_TIME_BETWEEN_QUESTIONS, self.next_question)
+            return
+            
+        # Once a quorum is in, everyone else gets a short closing window
+        now = time.monotonic()
+        deadline = self.pacer.quorum_deadline(answered, player_count, now,
+                                              self.question_deadline or now)
+        if deadline is None or not self.question_timer or not self.question_timer.cancel():
+            return
+        self.question_deadline = deadline
+        self.question_timer = self.schedule(deadline - now + self.broadcaster.max_one_way_delay(),
+                                            self.handle_question_timeout)
+        self.broadcaster.broadcast({
+            "type": "question_deadline",
+            "question_number": self.current_question_index,
+            "sent_at": round(now, 3),
+            "deadline": round(deadline, 3)
+        })
+        
+    def connected_answers(self):
+        """Answers to the current question from connected players; a held seat's answer is not counted
+        
+        get_player_count() counts only connected players, so the two can be
+        compared.
+        """
+        with self.broadcaster.lock:
+            return len(self.answered_current_question & self.broadcaster.clients.keys())
+            
+    def close_question(self):
+        """Stop taking answers and let the pacer account for the question"""
+        self.question_open = False
+        if self.question_sent_at is None:
+            return  # Opened by an older version before a handoff
+        closed_at = min(time.monotonic(), self.question_deadline or time.monotonic())
+        unanswered = max(0, self.broadcaster.get_player_count() - self.connected_answers())
+        self.pacer.closed(closed_at - self.question_sent_at, unanswered)
+            
+    def schedule(self, delay, callback, *args):
+        """Schedule a game step on the shared timer wheel; it runs on the room's actor"""
+        return self.timers.schedule(delay, self.post, callback, *args)
+        
+    def post(self, callback, *args):
+        """Queue a game step for the room's actor; False if a handoff has paused the room
+        
+        A queued step holds the activity gate until it has run, so a handoff
+        waits for it. A timer refused here is carried over by the snapshot.
+        """
+        if not self.gate.enter():
+            return False
+        self.actor.post(self.run_step, callback, *args)
+        return True
+        
+    def run_step(self, callback, *args):
+        try:
+            callback(*args)
+        finally:
+            self.gate.exit()
             
     def run_game(self):
         """Run the trivia game"""
+        self.pack = QuestionPack.draw(questions, self.question_count)
         self.broadcaster.broadcast({
             "type": "game_starting",
             "message": "Game is starting!",
             "player_count": self.broadcaster.get_player_count()
         })
         
-        time.sleep(2)
+        self.broadcaster.reset_leaderboard_snapshot()
         self.current_question_index = 0
-        self.next_question()
+        self.pacer.new_game()
+        self.question_timer = self.schedule(GAME_START_DELAY, self.next_question)
         
     def next_question(self):
-        """Send the next question to all clients"""
-        if self.current_question_index >= len(self.game_questions):
+        """Send the next question to all clients in the room"""
+        if self.current_question_index >= len(self.pack) or self.broadcaster.get_player_count() == 0:
             self.end_game()
             return
             
         # Reset the set of clients who have answered
         self.answered_current_question = set()
+        self.question_open = True
         
-        current_question = self.game_questions[self.current_question_index]
+        # Send the question to all clients, with an absolute deadline on the server's clock
+        number = self.current_question_index + 1
+        timeout = self.pacer.next_timeout()
+        sent_at = self.question_sent_at = time.monotonic()
+        deadline = self.question_deadline = sent_at + timeout
+        self.broadcaster.broadcast_prepared(lambda seq: self.pack.question(
+            number, sent_at=round(sent_at, 3), deadline=round(deadline, 3), seq=seq), "question")
+        self.questions_sent += 1
         
-        # Send the question to all clients
-        self.broadcaster.broadcast({
-            "type": "question",
-            "question_number": self.current_question_index + 1,
-            "total_questions": len(self.game_questions),
-            "question": current_question["question"],
-            "options": current_question["options"],
-            "timeout": QUESTION_TIMEOUT
-        })
-        
-        # Set a timer to move to the next question after the timeout
-        self.question_timer = threading.Timer(QUESTION_TIMEOUT, self.handle_question_timeout)
-        self.question_timer.start()
+        # Close the question once answers sent at the deadline have had time to arrive
+        grace = self.broadcaster.max_one_way_delay()
+        self.question_timer = self.schedule(timeout + grace, self.handle_question_timeout)
         
         self.current_question_index += 1
         
     def handle_question_timeout(self):
         """Handle timeout for the current question"""
-        if self.current_question_index <= 0 or self.current_question_index > len(self.game_questions):
+        if self.current_question_index <= 0 or self.current_question_index > len(self.pack):
             return
-            
+        self.close_question()
+        
         # Send the correct answer to all clients
-        current_question = self.game_questions[self.current_question_index - 1]
-        self.broadcaster.broadcast({
-            "type": "timeout",
-            "correct_answer": current_question["answer"]
-        })
+        number = self.current_question_index
+        self.broadcaster.broadcast_prepared(lambda seq: self.pack.timeout(number, seq=seq), "timeout")
         
         # Send the current leaderboard
         self.send_leaderboard()
         
         # Wait a bit before sending the next question
-        time.sleep(WAIT_TIME_BETWEEN_QUESTIONS)
-        
-        # Move to the next question
-        self.next_question()
+        self.question_timer = self.schedule(WAIT_TIME_BETWEEN_QUESTIONS, self.next_question)
         
     def send_leaderboard(self):
-        """Send the current leaderboard to all clients"""
-        leaderboard = self.broadcaster.get_leaderboard()
-        self.broadcaster.broadcast({
-            "type": "leaderboard",
-            "scores": leaderboard
-        })
+        """Send the top of the leaderboard to the room and each player's own rank
+        
+        The first update of a game carries the whole top K; later ones carry
+        only the positions that changed. Rank messages go only to players whose
+        rank or score moved.
+        """
+        full, entries, size, ranks = self.broadcaster.get_leaderboard_updates()
+        player_count = self.broadcaster.get_player_count()
+        if full:
+            self.broadcaster.broadcast({
+                "type": "leaderboard",
+                "scores": entries,
+                "players": player_count
+            })
+        elif entries is not None:
+            self.broadcaster.broadcast({
+                "type": "leaderboard_delta",
+                "changes": entries,
+                "size": size,
+                "players": player_count
+            })
+        for client_socket, rank, score in ranks:
+            self.broadcaster.send_to(client_socket, {
+                "type": "rank",
+                "rank": rank,
+                "score": score,
+                "players": player_count
+            })
         
     def end_game(self):
         """End the game and announce the winner"""
@@ -354,12 +613,668 @@ class TriviaServer:
             "final_scores": leaderboard
         })
         
+        if self.pacer.questions:
+            print(f"Room {self.code}: game over; adaptive pacing saved {self.pacer.game_time_saved:.1f}s "
+                  f"(question timeout now {self.pacer.timeout}s)")
+        
         # Reset game state
-        with self.server_lock:
+        with self.lock:
             self.game_in_progress = False
-            self.accepting_players = True
             self.current_question_index = 0
+            self.games_completed += 1
+        if self.on_idle:
+            self.on_idle(self)
+            
+    def heartbeat(self, frame):
+        """Ping the room's players; players silent for IDLE_TIMEOUT are disconnected (their seat is held)"""
+        for nickname in self.broadcaster.ping(frame):
+            print(f"Client {nickname} in room {self.code} sent nothing for {IDLE_TIMEOUT:.0f}s; disconnecting")
+            
+    def get_metrics(self):
+        """Snapshot of this room's counters, with RTT per room and for its slowest players"""
+        rtt = self.broadcaster.get_rtt_stats()
+        rtt["slowest"] = rtt["slowest"][:METRICS_SLOWEST_PLAYERS]
+        return {
+            "room": self.code,
+            "players": self.broadcaster.get_player_count(),
+            "peak_players": self.peak_players,
+            "game_in_progress": self.game_in_progress,
+            "question": self.current_question_index,
+            "games_started": self.games_started,
+            "games_completed": self.games_completed,
+            "questions_sent": self.questions_sent,
+            "answers_received": self.answers_received,
+            "correct_answers": self.correct_answers,
+            "rtt": rtt,
+            "pacing": self.pacer.stats(),
+            "age_seconds": round(time.time() - self.created_at, 1)
+        }
+        
+    def snapshot(self):
+        """This room's state for a handoff; the room must be paused"""
+        leaderboard = self.broadcaster.leaderboard
+        timer = None
+        if self.game_in_progress and self.question_timer:
+            # The pending game step (or one the closed gate refused) and when it is due
+            timer = {
+                "callback": self.question_timer.args[0].__name__,
+                "remaining": max(0.0, self.question_timer.remaining())
+            }
+            self.question_timer.cancel()
+        nicknames = dict(self.broadcaster.clients)
+        for nickname, (release, old_socket) in self.held.items():
+            release.cancel()
+            nicknames[old_socket] = nickname
+        replay = self.broadcaster.replay.snapshot()
+        return {
+            "code": self.code,
+            "game_in_progress": self.game_in_progress,
+            "questions": self.pack.questions,
+            "question_index": self.current_question_index,
+            "question_open": self.question_open,
+            "question_deadline": self.question_deadline,  # Monotonic time is shared by processes on a host
+            "question_sent_at": self.question_sent_at,
+            "pacing": self.pacer.snapshot(),
+            "answered": [nicknames[s] for s in self.answered_current_question if s in nicknames],
+            "timer": timer,
+            "scores": leaderboard.ranking(),
+            "last_top": leaderboard.last_top,
+            "last_ranks": leaderboard.last_ranks,
+            "sessions": self.sessions,
+            "held": {nickname: max(0.0, release.remaining()) for nickname, (release, _) in self.held.items()},
+            "replay": {
+                "last_seq": replay["last_seq"],
+                "entries": [(seq, kind, base64.b64encode(frame[1]).decode('ascii'))
+                            for seq, (kind, frame) in replay["entries"]]
+            },
+            "metrics": {name: getattr(self, name) for name in (
+                "created_at", "games_started", "games_completed", "questions_sent",
+                "answers_received", "correct_answers", "peak_players")}
+        }
+        
+    def restore(self, state, players):
+        """Load a handoff snapshot; players is [(socket, nickname, unsent byte chunks)]"""
+        sockets = {}
+        for client_socket, nickname, unsent in players:
+            self.broadcaster.add_client(client_socket, nickname)
+            connection = self.broadcaster.connections[client_socket]
+            for chunk in unsent:
+                connection.send((chunk,))  # Ahead of anything new
+            sockets[nickname] = client_socket
+            
+        # Dropped players keep their seats; a placeholder stands in for their old socket
+        self.sessions = state["sessions"]
+        for nickname, remaining in state["held"].items():
+            self.broadcaster.leaderboard.add(nickname)
+            sockets[nickname] = object()
+            self.held[nickname] = (self.schedule(remaining, self.release_seat, nickname), sockets[nickname])
+        self.broadcaster.replay.restore({
+            "last_seq": state["replay"]["last_seq"],
+            "entries": [(seq, (kind, frame_payload(base64.b64decode(payload))))
+                        for seq, kind, payload in state["replay"]["entries"]]
+        })
+        
+        leaderboard = self.broadcaster.leaderboard
+        for name, score in state["scores"]:  # Highest first, so ties keep their order
+            if name in leaderboard:
+                leaderboard.set_score(name, score)
+        if state["last_top"] is not None:
+            leaderboard.last_top = [tuple(entry) for entry in state["last_top"]]
+        leaderboard.last_ranks = {name: tuple(entry) for name, entry in state["last_ranks"].items()
+                                  if name in leaderboard}
+                                  
+        self.game_in_progress = state["game_in_progress"]
+        self.pack = QuestionPack(state["questions"])
+        self.current_question_index = state["question_index"]
+        self.question_open = state["question_open"]
+        self.question_deadline = state.get("question_deadline")  # Absent in snapshots from older versions
+        self.question_sent_at = state.get("question_sent_at")
+        if "pacing" in state:
+            self.pacer.restore(state["pacing"])
+        self.answered_current_question = {sockets[name] for name in state["answered"] if name in sockets}
+        for name, value in state["metrics"].items():
+            setattr(self, name, value)
+        self.peak_players = max(self.peak_players, len(sockets))
+        
+        timer = state["timer"]
+        if timer:
+            self.question_timer = self.schedule(timer["remaining"], getattr(self, timer["callback"]))
+
+
+class TriviaServer:
+    """Main server class: accepts connections and routes players to game rooms"""
+    
+    def __init__(self, host=HOST, port=PORT, max_players=MAX_PLAYERS, question_count=QUESTIONS_PER_GAME,
+                 max_rooms=MAX_ROOMS, metrics_interval=METRICS_INTERVAL, directory=None, handoff_path=None,
+                 backlog=LISTEN_BACKLOG, admission=None):
+        self.host = host
+        self.port = port
+        self.max_players = max_players
+        self.question_count = question_count
+        self.max_rooms = max_rooms
+        self.metrics_interval = metrics_interval
+        self.server_socket = None
+        self.pump = OutboundPump()  # One writer thread shared by every room
+        self.rooms = {}  # {room code: GameRoom}
+        self.rooms_lock = threading.Lock()
+        self.directory = directory  # RoomDirectory when running as one of several workers
+        self.accepting_players = True
+        self.backlog = backlog
+        self.admission = admission or Admission()  # Accept rate and connection limits
+        
+        # Handoff to a new process (zero-downtime restart)
+        self.handoff_path = handoff_path  # Unix socket a new process connects to; None disables
+        self.handoff_listener = None
+        self.handing_off = False
+        self.gate = ActivityGate()  # Every message handler and game timer passes through it
+        self.handoff_condition = threading.Condition()
+        self.handlers = 0  # Client threads running
+        self.parked = []  # Connections paused for the handoff
+        
+        # Set up signal handlers for graceful shutdown
+        signal.signal(signal.SIGINT, self.shutdown)
+        signal.signal(signal.SIGTERM, self.shutdown)
+        
+    def start(self, takeover=None):
+        """Start the trivia server, or take over the sockets and games of the one listening on takeover"""
+        try:
+            if takeover:
+                self.take_over(takeover)
+            else:
+                self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                if self.directory:
+                    # Every worker binds the same port; the kernel spreads connections across them
+                    self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+                self.server_socket.bind((self.host, self.port))
+                self.server_socket.listen(self.backlog)
+            self.server_socket.setblocking(False)  # The accept loop drains it, as the token bucket allows
+            if self.handoff_path:
+                self.handoff_listener = handoff_listener(self.handoff_path)
+            if self.directory:
+                self.directory.start(self.accept_handoff)
+                print(f"Worker {self.directory.worker} (pid {os.getpid()}) started on {self.host}:{self.port}")
+            else:
+                print(f"Server started on {self.host}:{self.port}")
+            print("Waiting for players to connect...")
+            
+            if self.metrics_interval > 0:
+                get_timer_wheel().schedule(self.metrics_interval, self.report_metrics)
+            get_timer_wheel().schedule(HEARTBEAT_INTERVAL, self.send_heartbeats)
+            
+            # Accept client connections, and handoff requests from a new process
+            selector = selectors.DefaultSelector()
+            selector.register(self.server_socket, selectors.EVENT_READ)
+            if self.handoff_listener:
+                selector.register(self.handoff_listener, selectors.EVENT_READ)
+            queued_since = None  # When the listener was seen with connections waiting in the backlog
+            resume_at = None  # While the token bucket refills, the listener is set aside until then
+            while self.accepting_players:
+                events = selector.select(None if resume_at is None else max(0.0, resume_at - time.monotonic()))
+                if resume_at is not None and time.monotonic() >= resume_at:
+                    selector.register(self.server_socket, selectors.EVENT_READ)
+                    resume_at = None
+                    continue
+                for key, _ in events:
+                    if key.fileobj is self.handoff_listener:
+                        conn, _ = self.handoff_listener.accept()
+                        self.hand_off(conn)
+                        continue
+                    if queued_since is None:
+                        queued_since = time.monotonic()
+                    try:
+                        wait = self.accept_connections(queued_since)
+                    except socket.error:
+                        if self.accepting_players:
+                            print("Socket error occurred")
+                        return
+                    if wait:
+                        # Leave the rest in the backlog until there are tokens for them
+                        selector.unregister(self.server_socket)
+                        resume_at = time.monotonic() + wait
+                        self.admission.throttled += wait
+                    else:
+                        queued_since = None
+                        
+        except Exception as e:
+            print(f"Server error: {e}")
+        finally:
+            self.shutdown()
+            
+    def accept_connections(self, queued_since):
+        """Accept what the backlog holds, as far as the token bucket allows
+        
+        Each connection is served by its own thread, or turned away at once
+        with a pre-encoded error if the server is full. Returns the seconds
+        until the next token if connections may still be waiting, or None once
+        the backlog is empty.
+        """
+        while True:
+            wait = self.admission.bucket.wait()
+            if wait > 0:
+                return wait
+            try:
+                client_socket, addr = self.server_socket.accept()
+            except BlockingIOError:
+                return None
+            self.admission.bucket.take()
+            accepted_at = time.monotonic()
+            rejection = self.admission.admit(accepted_at - queued_since)
+            if rejection:
+                self.reject(client_socket, rejection)
+                continue
+                
+            print(f"New connection from {addr}")
+            client_thread = threading.Thread(target=self.handle_client, args=(client_socket, addr),
+                                             kwargs={"accepted_at": accepted_at})
+            client_thread.daemon = True
+            client_thread.start()
+            
+    def reject(self, client_socket, frame):
+        """Send a rejection frame without waiting on the client, then close"""
+        try:
+            client_socket.setblocking(False)
+            client_socket.send(b''.join(frame))  # A few dozen bytes: fits any empty send buffer
+        except OSError:
+            pass
+        client_socket.close()
+        
+    def take_over(self, path):
+        """Receive the listening socket, client sockets and games from the server listening on path"""
+        print(f"Taking over from the server at {path}...")
+        conn, sockets, state = receive_handoff(path)
+        conn.send(HANDOFF_ACK)
+        if conn.recv(16) != HANDOFF_BYE:
+            raise ConnectionError("previous server did not release its sockets")
+        conn.recv(16)  # Returns at EOF, once the previous process has exited
+        conn.close()
+        self.server_socket = sockets[0]
+        self.restore(state, sockets[1:])
+                    
+    def join_room(self, code, client_socket, nickname):
+        """Find or create the room and add the player; returns (room, error message)"""
+        with self.rooms_lock:
+            room = self.rooms.get(code)
+            if room is None:
+                if len(self.rooms) >= self.max_rooms:
+                    return None, "Too many active rooms. Try again later."
+                room = GameRoom(code, self.pump, self.max_players, self.question_count, self.release_room, self.gate)
+                self.rooms[code] = room
+            error = room.join(client_socket, nickname)
+            if error and room.is_empty():
+                del self.rooms[code]
+        return (None, error) if error else (room, None)
+        
+    def release_room(self, room):
+        """Forget a room once it has no players and no game"""
+        with self.rooms_lock:
+            if self.rooms.get(room.code) is room and room.is_empty():
+                del self.rooms[room.code]
+                
+    def accept_handoff(self, client_socket, addr, message, buffered):
+        """Serve a client whose join another worker passed over, since this worker owns the room"""
+        client_thread = threading.Thread(target=self.handle_client, args=(client_socket, addr, message, buffered))
+        client_thread.daemon = True
+        client_thread.start()
+        
+    def handle_client(self, client_socket, addr, first_message=None, buffered=b'', resumed=None, accepted_at=None):
+        """Handle communication with a client
+        
+        first_message and buffered carry a join (and any bytes read after it)
+        that another worker or the previous process already read. resumed is
+        (room, nickname, unprocessed message) for a player carried over by a
+        handoff. accepted_at is set for connections counted in by admission
+        control.
+        """
+        nickname = None
+        room = None
+        message = None
+        paused = False   # Left for the next process by a handoff
+        closing = False  # Join refused or passed to another worker
+        received_at = None  # Server clock when message arrived; None for one carried over by a handoff
+        joined = False  # First message handled, for admission control
+        # The reader polls rather than blocks, so a handoff can pause this thread
+        reader = MessageReader(client_socket, poll_interval=HANDOFF_POLL_INTERVAL)
+        with self.handoff_condition:
+            self.handlers += 1
+        
+        try:
+            # Blocking, with no timeout: the pump's MSG_DONTWAIT sends must never wait on a slow reader.
+            # Also clears O_NONBLOCK carried over from the listener or a handoff.
+            client_socket.settimeout(None)
+            if buffered:
+                reader.feed(buffered)
+                
+            if resumed:
+                room, nickname, message = resumed
+            else:
+                # First message should be the nickname, and optionally a room code
+                join_deadline = time.time() + JOIN_TIMEOUT
+                message = first_message or reader.receive(
+                    lambda: time.time() < join_deadline and not self.handing_off)
+                if not message:
+                    paused = self.handing_off
+                    return
+                if not self.gate.enter():
+                    paused = True
+                    return
+                try:
+                    room, nickname = self.join_client(client_socket, addr, message, reader)
+                finally:
+                    self.gate.exit()
+                    if accepted_at is not None:
+                        self.admission.joined(accepted_at)
+                        joined = True
+                message = None
+                if not room:
+                    closing = True
+                    return
+                    
+            # Main client communication loop
+            while True:
+                if message is None:
+                    message = reader.receive(lambda: not self.handing_off)
+                    if not message:
+                        paused = self.handing_off
+                        break
+                    received_at = time.monotonic()
+                room.broadcaster.note_received(client_socket, message)
+                if message["type"] == "pong":
+                    message = None
+                    continue
+                if message["type"] == "clock_sync":
+                    room.broadcaster.send_to(client_socket, clock_sync_reply(message, received_at or time.monotonic()))
+                    message = None
+                    continue
+                # Game steps go to the room's actor; this thread only reads
+                posted = True
+                if message["type"] == "start_game":
+                    posted = room.post(room.start_game)
+                    
+                elif message["type"] == "answer" and room.game_in_progress:
+                    posted = room.post(room.process_answer, client_socket, nickname, message["answer"], received_at)
+                if not posted:
+                    paused = True
+                    break
+                message = None
+                
+        except Exception as e:
+            print(f"Error handling client {addr}: {e}")
+        finally:
+            if not paused and not closing and self.gate.enter():
+                try:
+                    if room and room.hold(client_socket):
+                        print(f"Client {nickname} disconnected from room {room.code}; "
+                              f"holding their seat for {RESUME_GRACE_PERIOD:.0f}s")
+                    elif room:
+                        if nickname:
+                            print(f"Client {nickname} disconnected from room {room.code}")
+                        room.leave(client_socket)
+                        self.release_room(room)
+                    client_socket.close()
+                finally:
+                    self.gate.exit()
+            elif not closing:
+                # A handoff is under way: keep the connection open for the next process
+                self.park(client_socket, addr, room, nickname, message, reader)
+            else:
+                try:
+                    client_socket.close()
+                except:
+                    pass
+            if accepted_at is not None:
+                self.admission.closed(joined)
+            with self.handoff_condition:
+                self.handlers -= 1
+                self.handoff_condition.notify_all()
+                
+    def join_client(self, client_socket, addr, message, reader):
+        """Handle a client's first message (join or resume); returns (room, nickname), or (None, None)"""
+        if message["type"] not in ("join", "resume"):
+            return None, None
+                        
+        nickname = message["nickname"]
+        room_code = str(message.get("room") or DEFAULT_ROOM).strip()[:ROOM_CODE_MAX_LENGTH] or DEFAULT_ROOM
+        
+        if self.directory and not self.directory.owns(room_code):
+            # Another worker owns this room: pass the connection over, then drop our copy
+            if not self.directory.forward(room_code, client_socket, addr, message, reader.buffered_bytes()):
+                send_message(client_socket, {
+                    "type": "error",
+                    "message": "Room is unavailable. Try again later."
+                })
+            return None, None
+            
+        if message["type"] == "resume":
+            return self.resume_session(client_socket, addr, room_code, message)
+            
+        # Validate nickname
+        if not nickname or len(nickname.strip()) == 0:
+            send_message(client_socket, {
+                "type": "error",
+                "message": "Invalid nickname"
+            })
+            return None, None
+        
+        nickname = nickname.strip()[:20]  # Limit nickname length
+        
+        room, error = self.join_room(room_code, client_socket, nickname)
+        if error:
+            send_message(client_socket, {
+                "type": "error",
+                "message": error
+            })
+            return None, None
+        
+        print(f"Player {nickname} joined room {room.code} from {addr}")
+        room.broadcaster.send_to(client_socket, {
+            "type": "session",
+            "room": room.code,
+            "nickname": nickname,
+            "resume_token": room.open_session(nickname)
+        })
+        room.broadcaster.send_to(client_socket, ping_message())  # A first RTT sample before any answer
+                
+        # Notify the room about the new player
+        room.broadcaster.broadcast({
+            "type": "player_joined",
+            "nickname": nickname,
+            "player_count": room.broadcaster.get_player_count()
+        })
+        
+        # If this is the first player, give them admin controls
+        if room.broadcaster.get_player_count() == 1:
+            room.broadcaster.send_to(client_socket, {
+                "type": "admin_rights",
+                "room": room.code,
+                "message": "You are the host. Type 'start' to begin the game."
+            })
+        else:
+            room.broadcaster.send_to(client_socket, {
+                "type": "wait_message",
+                "room": room.code,
+                "message": "Waiting for the host to start the game..."
+            })
+        return room, nickname
+        
+    def resume_session(self, client_socket, addr, room_code, message):
+        """Reattach a returning player to their held seat; returns (room, nickname), or (None, None)"""
+        nickname = str(message.get("nickname") or "")
+        with self.rooms_lock:
+            room = self.rooms.get(room_code)
+        error = "Session expired. Join again."
+        if room:
+            error = room.resume(client_socket, nickname, str(message.get("token") or ""),
+                                int(message.get("last_seq") or 0))
+        if error:
+            send_message(client_socket, {
+                "type": "resume_failed",
+                "message": error
+            })
+            return None, None
+        print(f"Player {nickname} resumed in room {room.code} from {addr}")
+        return room, nickname
+        
+    def park(self, client_socket, addr, room, nickname, message, reader):
+        """Record a paused connection for the handoff snapshot"""
+        with self.handoff_condition:
+            self.parked.append({
+                "socket": client_socket,
+                "addr": addr,
+                "room": room.code if room else None,
+                "nickname": nickname,
+                "message": message,
+                "buffered": reader.buffered_bytes()
+            })
+            
+    def hand_off(self, conn):
+        """Pass the listening socket, every client socket and the game state to a new process
+        
+        Runs on the accept thread, so no client arrives meanwhile. If the new
+        process fails before acknowledging, this one resumes from its own snapshot.
+        """
+        print("Handoff requested: pausing games...")
+        started = time.time()
+        self.handing_off = True
+        if not self.gate.close(HANDOFF_TIMEOUT):
+            print("Handoff: game work still running after the timeout; continuing")
+        with self.handoff_condition:
+            if not self.handoff_condition.wait_for(lambda: self.handlers == 0, HANDOFF_TIMEOUT):
+                print(f"Handoff: {self.handlers} client threads did not pause; their clients will be dropped")
+                
+        # Let queued frames go out, then stop writing so the unsent rest can be carried over
+        with self.rooms_lock:
+            rooms = list(self.rooms.values())
+        self.pump.drain([connection for room in rooms for connection in room.broadcaster.connections.values()],
+                        HANDOFF_DRAIN_TIMEOUT)
+        self.pump.stop()
+        state, sockets = self.snapshot(rooms)
+        
+        try:
+            done = send_handoff(conn, [self.server_socket] + sockets, state)
+        except (OSError, ValueError) as e:
+            print(f"Handoff failed: {e}")
+            done = False
+        if done:
+            print(f"Handed off {len(sockets)} clients in {len(rooms)} rooms "
+                  f"(paused {(time.time() - started) * 1000:.0f} ms); exiting")
+            try:
+                conn.send(HANDOFF_BYE)
+            except OSError:
+                pass
+            os._exit(0)
+            
+        conn.close()
+        print("Handoff aborted; resuming")
+        self.restore(state, sockets)
+        
+    def snapshot(self, rooms):
+        """Serializable state of paused rooms and clients, plus the client sockets in the same order"""
+        clients = []
+        sockets = []
+        with self.handoff_condition:
+            parked, self.parked = self.parked, []
+        for record in parked:
+            room = self.rooms.get(record["room"]) if record["room"] else None
+            connection = room.broadcaster.connections.get(record["socket"]) if room else None
+            unsent = connection.detach() if connection else []
+            clients.append({
+                "addr": list(record["addr"]),
+                "room": record["room"],
+                "nickname": record["nickname"],
+                "message": record["message"],
+                "buffered": base64.b64encode(record["buffered"]).decode('ascii'),
+                "unsent": [base64.b64encode(chunk).decode('ascii') for chunk in unsent]
+            })
+            sockets.append(record["socket"])
+        return {"rooms": [room.snapshot() for room in rooms], "clients": clients}, sockets
         
+    def restore(self, state, sockets):
+        """Rebuild rooms from a handoff snapshot and resume every client"""
+        self.gate = ActivityGate()
+        self.handing_off = False
+        if not self.pump.running:
+            self.pump = OutboundPump()
+            
+        players = {}  # {room code: [(socket, nickname, unsent bytes)]}
+        for client, client_socket in zip(state["clients"], sockets):
+            if client["room"] and client["nickname"]:
+                players.setdefault(client["room"], []).append(
+                    (client_socket, client["nickname"], [base64.b64decode(chunk) for chunk in client["unsent"]]))
+                    
+        with self.rooms_lock:
+            self.rooms = {}
+            for room_state in state["rooms"]:
+                room = GameRoom(room_state["code"], self.pump, self.max_players, self.question_count,
+                                self.release_room, self.gate)
+                room.restore(room_state, players.get(room.code, []))
+                if not room.is_empty():
+                    self.rooms[room.code] = room
+                    
+        for client, client_socket in zip(state["clients"], sockets):
+            room = self.rooms.get(client["room"]) if client["nickname"] else None
+            if room:
+                kwargs = {"resumed": (room, client["nickname"], client["message"])}
+            else:
+                kwargs = {"first_message": client["message"]}
+            client_thread = threading.Thread(target=self.handle_client, args=(client_socket, tuple(client["addr"])),
+                                             kwargs=dict(kwargs, buffered=base64.b64decode(client["buffered"])))
+            client_thread.daemon = True
+            client_thread.start()
+        print(f"Resumed {len(sockets)} clients in {len(self.rooms)} rooms")
+        
+    def send_heartbeats(self):
+        """Ping every player with one shared frame and drop those gone silent, then reschedule"""
+        if not self.accepting_players:
+            return
+        get_timer_wheel().schedule(HEARTBEAT_INTERVAL, self.send_heartbeats)
+        if not self.gate.enter():
+            return  # Handing off; the next process pings
+        try:
+            frame = encode_message(ping_message())
+            with self.rooms_lock:
+                rooms = list(self.rooms.values())
+            for room in rooms:
+                room.heartbeat(frame)
+        finally:
+            self.gate.exit()
+            
+    def get_metrics(self):
+        """Server-wide totals plus per-room metrics"""
+        with self.rooms_lock:
+            rooms = list(self.rooms.values())
+        room_metrics = [room.get_metrics() for room in rooms]
+        metrics = {
+            "rooms": len(room_metrics),
+            "players": sum(m["players"] for m in room_metrics),
+            "games_in_progress": sum(1 for m in room_metrics if m["game_in_progress"]),
+            "rtt_max_ms": max((m["rtt"]["rtt_max_ms"] for m in room_metrics if m["rtt"]["measured"]), default=None),
+            "admission": self.admission.stats(),
+            "room_metrics": room_metrics
+        }
+        if self.directory:
+            metrics.update(worker=self.directory.worker, handoffs_sent=self.directory.handoffs_sent,
+                           handoffs_received=self.directory.handoffs_received)
+        return metrics
+                
+    def report_metrics(self):
+        """Print a metrics line, then reschedule for metrics_interval seconds later"""
+        if not self.accepting_players:
+            return
+        metrics = self.get_metrics()
+        worker = f"worker={metrics['worker']} " if self.directory else ""
+        handoffs = (f" handoffs_sent={metrics['handoffs_sent']} handoffs_received={metrics['handoffs_received']}"
+                    if self.directory else "")
+        admission = metrics["admission"]
+        print(f"[metrics] {worker}rooms={metrics['rooms']} players={metrics['players']} "
+              f"games_in_progress={metrics['games_in_progress']} rtt_max_ms={metrics['rtt_max_ms']}{handoffs}")
+        print(f"[metrics]   admission accepted={admission['accepted']} rejected={sum(admission['rejected'].values())} "
+              f"pending_joins={admission['pending_joins']} throttled_s={admission['throttled_s']} "
+              f"accept_queue_p99_ms={admission['accept_queue']['p99_ms']} join_p99_ms={admission['join']['p99_ms']}")
+        for room in sorted(metrics["room_metrics"], key=lambda m: m["players"], reverse=True)[:METRICS_TOP_ROOMS]:
+            print(f"[metrics]   {json.dumps(room)}")
+        get_timer_wheel().schedule(self.metrics_interval, self.report_metrics)
+                
     def shutdown(self, *args):
         """Shutdown the server gracefully"""
         print("\nShutting down server...")
@@ -369,9 +1284,110 @@ class TriviaServer:
                 self.server_socket.close()
             except:
                 pass
+        if self.directory:
+            self.directory.close()
+        if self.handoff_listener:
+            self.handoff_listener.close()
+            try:
+                os.unlink(self.handoff_path)
+            except OSError:
+                pass
         sys.exit(0)
+        
+        
+def run_supervisor(args):
+    """Fork args.workers servers sharing the port with SO_REUSEPORT, replacing any that die
+    
+    Rooms are owned by one worker each (consistent hashing); joins that land
+    elsewhere are handed to the owner through a Unix socket directory.
+    """
+    path = tempfile.mkdtemp(prefix=f"trivia-{args.port}-")
+    children = {}  # {pid: worker index}
+    stopping = False
+    
+    def spawn(worker):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                server = TriviaServer(args.host, args.port, args.max_players, args.questions, args.max_rooms,
+                                      args.metrics_interval, RoomDirectory(path, worker, args.workers),
+                                      backlog=args.backlog, admission=admission_control(args))
+                server.start()
+            finally:
+                os._exit(0)
+        children[pid] = worker
+        
+    def stop(*_):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+                
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for worker in range(args.workers):
+        spawn(worker)
+    print(f"Supervisor {os.getpid()} started {args.workers} workers on port {args.port} (room directory {path})")
+    
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        worker = children.pop(pid, None)
+        if worker is not None and not stopping:
+            print(f"Worker {worker} exited with status {status}; restarting")
+            time.sleep(WORKER_RESTART_DELAY)
+            spawn(worker)
+    shutil.rmtree(path, ignore_errors=True)
+    
+    
+def admission_control(args):
+    """Admission limits from the command line (each worker applies them to its own share)"""
+    return Admission(args.max_connections, rate=args.accept_rate, burst=args.accept_burst)
+    
+    
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='AWS Trivia Game Server')
+    parser.add_argument('--host', default=HOST, help='Interface to bind')
+    parser.add_argument('--port', type=int, default=PORT, help='Port to listen on')
+    parser.add_argument('--max-players', type=int, default=MAX_PLAYERS, help='Maximum players per room')
+    parser.add_argument('--questions', type=int, default=QUESTIONS_PER_GAME, help='Questions per game')
+    parser.add_argument('--max-rooms', type=int, default=MAX_ROOMS, help='Maximum concurrent rooms')
+    parser.add_argument('--backlog', type=int, default=LISTEN_BACKLOG,
+                        help='Listen backlog: connections the kernel queues while the accept rate holds them back')
+    parser.add_argument('--accept-rate', type=float, default=ACCEPT_RATE,
+                        help='New connections accepted per second, after the burst (0 for no limit)')
+    parser.add_argument('--accept-burst', type=int, default=ACCEPT_BURST,
+                        help='Connections accepted at once before the accept rate applies')
+    parser.add_argument('--max-connections', type=int, default=MAX_CONNECTIONS,
+                        help='Open connections before new ones are turned away with an error')
+    parser.add_argument('--metrics-interval', type=float, default=METRICS_INTERVAL,
+                        help='Seconds between per-room metrics lines (0 disables)')
+    parser.add_argument('--workers', type=int, default=WORKERS,
+                        help='Worker processes sharing the port (SO_REUSEPORT); rooms are sharded across them')
+    parser.add_argument('--handoff-path', help='Unix socket on which a newer process can take over this one')
+    parser.add_argument('--takeover', metavar='PATH',
+                        help='Take over the sockets and games of the server whose --handoff-path is PATH')
+                        
+    args = parser.parse_args()
+    
+    if args.workers > 1:
+        if args.handoff_path or args.takeover:
+            parser.error('--handoff-path and --takeover need a single process (--workers 1)')
+        run_supervisor(args)
+        return
+            
+    # A process that took over listens on the same path, ready for the next upgrade
+    server = TriviaServer(args.host, args.port, args.max_players, args.questions,
+                          args.max_rooms, args.metrics_interval, handoff_path=args.handoff_path or args.takeover,
+                          backlog=args.backlog, admission=admission_control(args))
+    server.start(args.takeover)
 
 
 if __name__ == "__main__":
-    server = TriviaServer()
-    server.start()
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Resumable player sessions
+A player gets a resume token when they join. If their connection drops, the
+server holds their seat (nickname and score) for RESUME_GRACE_PERIOD seconds.
+Each room numbers its broadcasts and keeps the last REPLAY_BUFFER_SIZE of them,
+so a player who reconnects with the token and the last sequence number they
+saw gets exactly the messages they missed, instead of rejoining from scratch.
+"""
+
+import collections
+import secrets
+
+REPLAY_BUFFER_SIZE = 256  # Broadcasts kept per room (a whole question cycle is under 10)
+RESUME_GRACE_PERIOD = 30.0  # Seconds a dropped player's seat is held
+RESUME_TOKEN_BYTES = 16  # Random bytes per token (URL-safe base64 on the wire)
+
+def new_resume_token():
+    """An unguessable token identifying one player's session"""
+    return secrets.token_urlsafe(RESUME_TOKEN_BYTES)
+
+
+class ReplayBuffer:
+    """Sequence-numbered ring buffer of a room's most recent broadcasts
+    
+    Sequence numbers start at 1 and never repeat; the oldest entries are
+    dropped once size is reached. Not thread-safe: callers number, append and
+    send under their own lock, so sequence order is delivery order.
+    """
+    
+    def __init__(self, size=REPLAY_BUFFER_SIZE):
+        self.entries = collections.deque(maxlen=size)  # [(seq, item)]
+        self.last_seq = 0
+        
+    @property
+    def next_seq(self):
+        """The number the next append() will get, for stamping into the message first"""
+        return self.last_seq + 1
+        
+    def append(self, item):
+        self.last_seq += 1
+        self.entries.append((self.last_seq, item))
+        return self.last_seq
+        
+    def since(self, seq):
+        """Items after seq, oldest first; None if some have already been dropped"""
+        if seq >= self.last_seq:
+            return []
+        first = self.entries[0][0] if self.entries else self.last_seq + 1
+        if seq + 1 < first:
+            return None
+        skip = seq + 1 - first
+        return [item for _, item in list(self.entries)[skip:]]
+        
+    def snapshot(self):
+        return {"last_seq": self.last_seq, "entries": list(self.entries)}
+        
+    def restore(self, state):
+        self.last_seq = state["last_seq"]
+        self.entries.clear()
+        self.entries.extend((seq, item) for seq, item in state["entries"])
@@ -10,6 +10,10 @@ class TriviaGameClient {
         this.answered = false;
         this.timer = null;
         this.timeLeft = 0;
+        this.leaderboardEntries = [];  // Top K as [nickname, score]
+        this.myRank = null;  // { rank, score, total_players } from the server
+        this.resumeToken = sessionStorage.getItem('resumeToken');  // Resumes our seat after a dropped connection
+        this.lastSeq = Number(sessionStorage.getItem('lastSeq')) || 0;  // Highest broadcast seen, so a resume replays only what we missed
         
         this.initializeElements();
         this.connectToServer();
@@ -113,6 +117,15 @@ class TriviaGameClient {
             console.error('Socket.IO error:', data);
             this.showError(data.message);
         });
+        this.socket.onAny((event, data) => {
+            if (data && data.seq > this.lastSeq) {
+                this.lastSeq = data.seq;
+                sessionStorage.setItem('lastSeq', data.seq);
+            }
+        });
+        this.socket.on('session', (data) => this.onSession(data));
+        this.socket.on('session_resumed', (data) => this.onSessionResumed(data));
+        this.socket.on('resume_failed', () => this.onResumeFailed());
         this.socket.on('player_joined', (data) => this.onPlayerJoined(data));
         this.socket.on('player_left', (data) => this.onPlayerLeft(data));
         this.socket.on('host_privileges', (data) => this.onHostPrivileges(data));
@@ -121,7 +134,10 @@ class TriviaGameClient {
         this.socket.on('new_question', (data) => this.onNewQuestion(data));
         this.socket.on('answer_feedback', (data) => this.onAnswerFeedback(data));
         this.socket.on('question_timeout', (data) => this.onQuestionTimeout(data));
+        this.socket.on('question_deadline', (data) => this.onQuestionDeadline(data));
         this.socket.on('leaderboard_update', (data) => this.updateLeaderboard(data));
+        this.socket.on('leaderboard_delta', (data) => this.applyLeaderboardDelta(data));
+        this.socket.on('your_rank', (data) => this.onYourRank(data));
         this.socket.on('game_over', (data) => this.onGameOver(data));
         
         // Level progression events
@@ -131,12 +147,46 @@ class TriviaGameClient {
     }
     
     onConnect() {
+        if (this.resumeToken) {
+            // Reconnected: take back our seat and get the updates we missed
+            this.updateConnectionStatus('check', 'Reconnected! Resuming game...', 'success');
+            this.socket.emit('resume_session', { token: this.resumeToken, last_seq: this.lastSeq });
+            return;
+        }
         this.updateConnectionStatus('check', 'Connected! Joining game...', 'success');
         
         // Join the game
         this.socket.emit('join_game', { nickname: this.nickname });
     }
     
+    onSession(data) {
+        // A new seat: broadcasts are numbered from here on
+        this.resumeToken = data.resume_token;
+        this.lastSeq = 0;
+        sessionStorage.setItem('resumeToken', data.resume_token);
+        sessionStorage.setItem('lastSeq', 0);
+    }
+    
+    onSessionResumed(data) {
+        this.elements.connectionStatus.style.display = 'none';
+        this.elements.gameStatus.style.display = 'block';
+        this.isHost = data.is_host;
+        this.answered = this.answered || data.answered;
+        this.myRank = { rank: data.rank, score: data.score };
+        if (!data.complete) {
+            // Gone too long for a replay: pick up from here
+            this.lastSeq = data.last_seq;
+        }
+        this.socket.emit('get_game_state');
+    }
+    
+    onResumeFailed() {
+        // Our seat was given up; join again as a new player
+        this.resumeToken = null;
+        sessionStorage.removeItem('resumeToken');
+        this.onConnect();
+    }
+    
     onDisconnect() {
         this.updateConnectionStatus('exclamation-triangle', 'Disconnected from server. Trying to reconnect...', 'danger');
     }
@@ -328,6 +378,14 @@ class TriviaGameClient {
         }, 1000);
     }
     
+    onQuestionDeadline(data) {
+        // Most players have answered: the question closes sooner
+        if (data.timeout < this.timeLeft) {
+            this.timeLeft = Math.ceil(data.timeout);
+            this.elements.timeLeft.textContent = this.timeLeft;
+        }
+    }
+    
     onTimeUp() {
         if (!this.answered) {
             document.querySelectorAll('.option-btn').forEach(btn => {
@@ -383,7 +441,22 @@ class TriviaGameClient {
         }
     }
     
+    applyLeaderboardDelta(data) {
+        // Only changed top-K positions are sent after the first snapshot of a game
+        const entries = this.leaderboardEntries.slice(0, data.size);
+        data.changes.forEach(([position, nickname, score]) => {
+            entries[position] = [nickname, score];
+        });
+        this.updateLeaderboard({ leaderboard: entries });
+    }
+    
+    onYourRank(data) {
+        this.myRank = data;
+        this.updateLeaderboard({ leaderboard: this.leaderboardEntries });
+    }
+    
     updateLeaderboard(data) {
+        this.leaderboardEntries = data.leaderboard;
         this.elements.leaderboard.innerHTML = '';
         
         if (data.leaderboard.length === 0) {
@@ -403,6 +476,18 @@ class TriviaGameClient {
             
             this.elements.leaderboard.appendChild(playerDiv);
         });
+        
+        // Own rank, when it is outside the top K shown above
+        if (this.myRank && this.myRank.rank > data.leaderboard.length) {
+            const rankDiv = document.createElement('div');
+            rankDiv.className = 'leaderboard-item';
+            rankDiv.innerHTML = `
+                <span class="leaderboard-rank">#${this.myRank.rank}</span>
+                <span class="leaderboard-name">${this.nickname} (you)</span>
+                <span class="leaderboard-score">${this.myRank.score}</span>
+            `;
+            this.elements.leaderboard.appendChild(rankDiv);
+        }
     }
     
     onGameOver(data) {
@@ -426,7 +511,7 @@ class TriviaGameClient {
         }
         
         // Update final leaderboard
-        this.updateLeaderboard({ leaderboard: data.final_scores });
+        this.updateLeaderboard({ leaderboard: data.final_scores.map(player => [player.nickname, player.score]) });
         
         // Prepare player data for social sharing
         const playerData = this.calculatePlayerStats(data);
@@ -438,7 +523,12 @@ class TriviaGameClient {
     
     calculatePlayerStats(gameData) {
         // Find current player's stats from the final scores
-        const playerStats = gameData.final_scores.find(player => player.nickname === this.nickname);
+        // final_scores holds only the top K; everyone else has their own rank from your_rank
+        const playerStats = gameData.final_scores.find(player => player.nickname === this.nickname) || (this.myRank && {
+            score: this.myRank.score,
+            correct_answers: this.myRank.correct_answers
+        });
+        const totalPlayers = (this.myRank && this.myRank.total_players) || gameData.final_scores.length;
         
         if (!playerStats) {
             return {
@@ -446,15 +536,15 @@ class TriviaGameClient {
                 correct: 0,
                 total: gameData.total_questions || 10,
                 accuracy: 0,
-                rank: gameData.final_scores.length,
-                totalPlayers: gameData.final_scores.length
+                rank: totalPlayers,
+                totalPlayers: totalPlayers
             };
         }
         
         const total = gameData.total_questions || 10;
         const correct = playerStats.correct_answers || 0;
         const accuracy = total > 0 ? Math.round((correct / total) * 100) : 0;
-        const rank = gameData.final_scores.findIndex(player => player.nickname === this.nickname) + 1;
+        const rank = this.myRank ? this.myRank.rank : gameData.final_scores.findIndex(player => player.nickname === this.nickname) + 1;
         
         return {
             score: playerStats.score || 0,
@@ -462,7 +552,7 @@ class TriviaGameClient {
             total: total,
             accuracy: accuracy,
             rank: rank,
-            totalPlayers: gameData.final_scores.length,
+            totalPlayers: totalPlayers,
             level: gameData.current_level || 1,
             levelName: gameData.level_name || 'AWS Fundamentals'
         };
@@ -748,13 +838,16 @@ class TriviaGameClient {
     }
     
     leaveGame() {
-        // Disconnect from the game
+        // Disconnect from the game, giving up our seat rather than leaving it held
         if (this.socket) {
+            this.socket.emit('leave_game');
             this.socket.disconnect();
         }
         
         // Clear session storage
         sessionStorage.removeItem('nickname');
+        sessionStorage.removeItem('resumeToken');
+        sessionStorage.removeItem('lastSeq');
         
         // Redirect to home page
         window.location.href = '/';
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Stress test for answer intake on server_fixed.py
+Connects many bot players to one room and has them all answer each question
+at the same instant (every bot twice over), so the room's actor gets a burst
+of racing answers and the all-answered transition on every question. Each bot
+must see every question exactly once and in order, get exactly one feedback
+per question, and every bot on the final leaderboard must have a score equal
+to its correct answers.
+"""
+
+import argparse
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from network_utils import send_message, pong_message, MessageReader
+
+class StressBot:
+    """A player that answers on the shared barrier and records what it receives"""
+    
+    def __init__(self, index, port, barrier):
+        self.nickname = f"bot{index}"
+        self.barrier = barrier
+        self.sock = socket.create_connection(('127.0.0.1', port))
+        self.questions = []  # question_number, in arrival order
+        self.feedbacks = []  # (question_number, correct)
+        self.final_scores = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        
+    def run(self):
+        send_message(self.sock, {"type": "join", "nickname": self.nickname})
+        reader = MessageReader(self.sock)
+        while True:
+            message = reader.receive()
+            if not message:
+                break
+            if message["type"] == "ping":
+                send_message(self.sock, pong_message(message))
+            elif message["type"] == "question":
+                self.questions.append(message["question_number"])
+                try:
+                    self.barrier.wait(30)
+                except threading.BrokenBarrierError:
+                    pass
+                answer = {"type": "answer", "answer": random.randint(0, 3)}
+                send_message(self.sock, answer)
+                send_message(self.sock, answer)  # The duplicate must be ignored
+            elif message["type"] == "answer_feedback":
+                current = self.questions[-1] if self.questions else None
+                self.feedbacks.append((current, message["correct"]))
+            elif message["type"] == "game_over":
+                self.final_scores = dict(message["final_scores"])
+                break
+        self.sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent answer stress test for server_fixed.py')
+    parser.add_argument('--port', type=int, default=5320, help='Port for the server under test')
+    parser.add_argument('--bots', type=int, default=200, help='Bot players, all in one room')
+    parser.add_argument('--questions', type=int, default=5, help='Questions per game')
+    args = parser.parse_args()
+    
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'server_fixed.py')
+    server = subprocess.Popen([sys.executable, script, '--port', str(args.port), '--questions', str(args.questions),
+                               '--max-players', str(args.bots)],
+                              stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    lines = []
+    threading.Thread(target=lambda: lines.extend(line.rstrip() for line in server.stdout), daemon=True).start()
+    failures = []
+    try:
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            try:
+                socket.create_connection(('127.0.0.1', args.port)).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+                
+        barrier = threading.Barrier(args.bots)
+        bots = []
+        for index in range(args.bots):
+            bots.append(StressBot(index, args.port, barrier))
+            bots[-1].thread.start()
+        time.sleep(1.0)
+        started = time.time()
+        send_message(bots[0].sock, {"type": "start_game"})
+        for bot in bots:
+            bot.thread.join(120)
+        print(f"{args.bots} bots x {args.questions} questions in {time.time() - started:.1f}s")
+    finally:
+        if server.poll() is None:
+            server.terminate()
+            server.wait()
+            
+    expected = list(range(1, args.questions + 1))
+    for bot in bots:
+        if bot.final_scores is None:
+            failures.append(f"{bot.nickname} did not reach game_over (questions {bot.questions})")
+            continue
+        if bot.questions != expected:
+            failures.append(f"{bot.nickname}: questions {bot.questions}, expected {expected}")
+        if [number for number, _ in bot.feedbacks] != expected:
+            failures.append(f"{bot.nickname}: feedback for {[number for number, _ in bot.feedbacks]}")
+        correct = sum(1 for _, right in bot.feedbacks if right)
+        if bot.nickname in bot.final_scores and bot.final_scores[bot.nickname] != correct:
+            failures.append(f"{bot.nickname}: final score {bot.final_scores.get(bot.nickname)}, "
+                            f"but {correct} correct answers")
+    errors = [line for line in lines if "Error" in line]
+    failures.extend(f"server: {line}" for line in errors[:5])
+    
+    if failures:
+        for failure in failures[:20]:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print(f"✅ Every bot got each question once, in order, with one feedback each; leaderboard scores match")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Test a zero-downtime restart of server_fixed.py
+Starts the server with --handoff-path, connects bot players and starts a game.
+While question 1 is open (half the bots have answered), a second server process
+takes over with --takeover; the first must exit, and the rest of the game must
+finish on the new process without any bot reconnecting or losing its score.
+"""
+
+import argparse
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from network_utils import send_message, pong_message, MessageReader
+
+class TestBot:
+    """A player that records everything it receives"""
+    
+    def __init__(self, index, port, answer_late, upgraded):
+        self.nickname = f"bot{index}"
+        self.answer_late = answer_late  # Hold the first answer until after the upgrade
+        self.upgraded = upgraded
+        self.sock = socket.create_connection(('127.0.0.1', port))
+        self.received = []
+        self.correct = 0
+        self.first_answered = threading.Event()
+        self.finished = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        
+    def run(self):
+        send_message(self.sock, {"type": "join", "nickname": self.nickname})
+        reader = MessageReader(self.sock)
+        while True:
+            message = reader.receive()
+            if not message:
+                break
+            if message["type"] == "ping":
+                send_message(self.sock, pong_message(message))
+                continue
+            self.received.append(message)
+            if message["type"] == "question":
+                if message["question_number"] == 1 and self.answer_late:
+                    self.upgraded.wait()
+                send_message(self.sock, {"type": "answer", "answer": random.randint(0, 3)})
+            elif message["type"] == "answer_feedback":
+                self.correct += message["correct"]
+                self.first_answered.set()
+            elif message["type"] == "game_over":
+                self.finished = True
+                break
+        self.sock.close()
+        
+    def count(self, kind):
+        return sum(1 for message in self.received if message["type"] == kind)
+
+
+def start_server(args, extra):
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'server_fixed.py')
+    return subprocess.Popen([sys.executable, script, '--port', str(args.port), '--questions', str(args.questions),
+                             '--max-players', str(args.bots)] + extra,
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+
+
+def collect_output(process, lines):
+    threading.Thread(target=lambda: lines.extend(line.rstrip() for line in process.stdout), daemon=True).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Zero-downtime handoff test for server_fixed.py')
+    parser.add_argument('--port', type=int, default=5310, help='Port for the server under test')
+    parser.add_argument('--bots', type=int, default=8, help='Bot players')
+    parser.add_argument('--questions', type=int, default=3, help='Questions per game')
+    args = parser.parse_args()
+    
+    path = os.path.join(tempfile.mkdtemp(prefix='trivia-handoff-'), 'handoff.sock')
+    old_lines, new_lines = [], []
+    old = start_server(args, ['--handoff-path', path])
+    collect_output(old, old_lines)
+    new = None
+    failures = []
+    try:
+        deadline = time.time() + 10
+        while not os.path.exists(path) and time.time() < deadline:
+            time.sleep(0.1)
+            
+        upgraded = threading.Event()
+        bots = []
+        for index in range(args.bots):
+            bots.append(TestBot(index, args.port, index % 2 == 1, upgraded))
+            bots[-1].thread.start()
+            time.sleep(0.05)
+        time.sleep(0.5)
+        send_message(bots[0].sock, {"type": "start_game"})
+        
+        # Mid-question: the on-time half has answered, the late half is still thinking
+        for bot in bots[::2]:
+            bot.first_answered.wait(20)
+        print(f"Question 1 open, {len(bots[::2])} of {len(bots)} bots answered; upgrading...")
+        started = time.time()
+        new = start_server(args, ['--takeover', path])
+        collect_output(new, new_lines)
+        try:
+            old.wait(15)
+            print(f"✅ Old server exited {time.time() - started:.2f}s after the new one started")
+        except subprocess.TimeoutExpired:
+            failures.append("old server did not exit")
+        upgraded.set()
+        
+        for bot in bots:
+            bot.thread.join(60)
+    finally:
+        for process in (old, new):
+            if process and process.poll() is None:
+                process.terminate()
+                process.wait()
+                
+    for bot in bots:
+        if not bot.finished:
+            failures.append(f"{bot.nickname} did not reach game_over (got {[m['type'] for m in bot.received]})")
+        elif bot.count("question") != args.questions or bot.count("answer_feedback") != args.questions:
+            failures.append(f"{bot.nickname}: {bot.count('question')} questions, "
+                            f"{bot.count('answer_feedback')} feedbacks")
+    final = next((m for m in bots[0].received if m["type"] == "game_over"), None)
+    if final:
+        correct = {bot.nickname: bot.correct for bot in bots}
+        for name, score in final["final_scores"]:
+            if correct.get(name) != score:
+                failures.append(f"{name}: final score {score}, but {correct.get(name)} correct answers")
+    if not any("Resumed" in line for line in new_lines):
+        failures.append("new server did not report resuming the clients")
+        
+    for line in [line for line in old_lines if "andoff" in line] + [line for line in new_lines if "Resumed" in line]:
+        print(f"  {line}")
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print(f"✅ All {len(bots)} bots finished {args.questions} questions on the new process with correct scores")
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,7 @@ import threading
 import time
 import socket
 import json
-from network_utils import send_message, receive_message
+from network_utils import send_message, pong_message, MessageReader
 
 def test_client(nickname, host='localhost', port=5000):
     """Test client that connects and stays connected"""
@@ -23,10 +23,14 @@ def test_client(nickname, host='localhost', port=5000):
         print(f"{nickname}: Connected successfully")
         
         # Listen for messages
+        reader = MessageReader(sock)
         while True:
-            message = receive_message(sock)
+            message = reader.receive()
             if not message:
                 break
+            if message['type'] == 'ping':
+                send_message(sock, pong_message(message))
+                continue
             print(f"{nickname}: Received {message['type']}")
             
             # Auto-start game if admin
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Test that one slow reader cannot hold up anyone else on server_fixed.py
+A player that stops reading gets replies large enough to fill its socket
+buffers, but fewer than its outbound queue holds, so the server must park its
+queue and keep writing to everyone else. Fast players measure clock_sync round
+trips meanwhile; none may stall, and once the slow player starts reading it
+must get every reply it asked for, still connected.
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from network_utils import send_message, pong_message, clock_sync_request, MessageReader
+
+def connect(port, nickname, rcvbuf=None):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    if rcvbuf:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)  # Before connect, so the window stays small
+    sock.connect(('127.0.0.1', port))
+    send_message(sock, {"type": "join", "nickname": nickname})
+    return sock
+
+
+class FastPlayer:
+    """Measures clock_sync round trips until told to stop"""
+    
+    def __init__(self, index, port):
+        self.sock = connect(port, f"fast{index}")
+        self.reader = MessageReader(self.sock)
+        self.round_trips = []
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+    
+    def run(self):
+        while not self.stop.is_set():
+            started = time.monotonic()
+            send_message(self.sock, clock_sync_request())
+            while True:
+                message = self.reader.receive()
+                if not message:
+                    return
+                if message["type"] == "ping":
+                    send_message(self.sock, pong_message(message))
+                elif message["type"] == "clock_sync":
+                    break
+            self.round_trips.append(time.monotonic() - started)
+            time.sleep(0.01)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Slow reader isolation test for server_fixed.py')
+    parser.add_argument('--port', type=int, default=5330, help='Port for the server under test')
+    parser.add_argument('--fast', type=int, default=4, help='Fast players')
+    parser.add_argument('--requests', type=int, default=120, help='Replies queued for the slow player')
+    parser.add_argument('--reply-size', type=int, default=80000, help='Bytes per reply to the slow player (more in all than the socket buffers hold)')
+    parser.add_argument('--max-stall', type=float, default=0.25, help='Longest acceptable fast round trip (s)')
+    args = parser.parse_args()
+    
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'server_fixed.py')
+    server = subprocess.Popen([sys.executable, script, '--port', str(args.port), '--max-players', str(args.fast + 1)],
+                              stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    lines = []
+    threading.Thread(target=lambda: lines.extend(line.rstrip() for line in server.stdout), daemon=True).start()
+    failures = []
+    try:
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            try:
+                socket.create_connection(('127.0.0.1', args.port)).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+        
+        slow = connect(args.port, "slow", rcvbuf=4096)
+        players = [FastPlayer(index, args.port) for index in range(args.fast)]
+        for player in players:
+            player.thread.start()
+        time.sleep(0.5)
+        
+        # The slow player asks for far more than its socket buffers hold, a few at a time, and reads nothing
+        padding = "x" * args.reply_size
+        for start in range(0, args.requests, 10):
+            for _ in range(min(10, args.requests - start)):
+                send_message(slow, {"type": "clock_sync", "t0": padding})
+            time.sleep(0.1)
+        time.sleep(1.0)
+        for player in players:
+            player.stop.set()
+            player.thread.join(10)
+        
+        # Now it reads: every reply must arrive, on a connection that was kept open
+        slow.settimeout(10)
+        reader = MessageReader(slow)
+        replies = 0
+        while replies < args.requests:
+            message = reader.receive()
+            if not message:
+                break
+            if message["type"] == "clock_sync":
+                replies += 1
+        slow.close()
+    finally:
+        if server.poll() is None:
+            server.terminate()
+            server.wait()
+    
+    round_trips = [rtt for player in players for rtt in player.round_trips]
+    worst = max(round_trips, default=None)
+    print(f"{len(round_trips)} fast round trips, worst {worst * 1000:.1f} ms" if worst is not None
+          else "no fast round trips")
+    if worst is None or worst > args.max_stall:
+        failures.append(f"a fast player stalled behind the slow one (worst round trip {worst})")
+    if replies < args.requests:
+        failures.append(f"slow player got {replies} of {args.requests} replies (disconnected?)")
+    failures.extend(f"server: {line}" for line in lines if "Error" in line)
+    
+    if failures:
+        for failure in failures[:10]:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print(f"✅ Fast players never waited on the slow one, which still got all {args.requests} replies")
+
+if __name__ == "__main__":
+    main()
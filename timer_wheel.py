@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Hierarchical timer wheel shared by the game servers
+One scheduler thread drives every question deadline, pause and start delay;
+expired callbacks run on a small worker pool so no handler thread ever sleeps
+"""
+
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+TICK_SECONDS = 0.01   # Timer resolution
+WHEEL_SLOTS = 64      # Slots per level
+WHEEL_LEVELS = 4      # 64 ticks, 41 s, 44 min, 46 h at 10 ms ticks; later deadlines are re-cascaded
+TIMER_WORKERS = 4     # Threads running expired callbacks
+
+class TimerHandle:
+    """A scheduled callback; cancel() it before it fires"""
+    
+    __slots__ = ('wheel', 'expiry_tick', 'callback', 'args', 'cancelled', 'fired')
+    
+    def __init__(self, wheel, expiry_tick, callback, args):
+        self.wheel = wheel
+        self.expiry_tick = expiry_tick
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+        self.fired = False
+        
+    def remaining(self):
+        """Seconds until the timer is due (negative once overdue)"""
+        return self.expiry_tick * self.wheel.tick - (time.monotonic() - self.wheel.start_time)
+        
+    def cancel(self):
+        """Cancel the timer; False if it already fired or was cancelled"""
+        with self.wheel.lock:
+            if self.fired or self.cancelled:
+                return False
+            self.cancelled = True
+            self.wheel.pending -= 1
+            return True
+
+
+class TimerWheel:
+    """Hashed hierarchical timing wheel (Varghese & Lauck) with one scheduler thread
+    
+    schedule() and cancel() are O(1). Each tick fires one level-0 slot; when a
+    level wraps, the matching slot of the level above is cascaded down.
+    """
+    
+    def __init__(self, tick=TICK_SECONDS, slots=WHEEL_SLOTS, levels=WHEEL_LEVELS, workers=TIMER_WORKERS,
+                 name='timer-wheel'):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.wheels = [[[] for _ in range(slots)] for _ in range(levels)]
+        self.span = slots ** levels  # Ticks covered before a deadline must be re-cascaded
+        self.start_time = time.monotonic()
+        self.current_tick = 0  # Last tick processed
+        self.pending = 0
+        self.fired_count = 0
+        self.running = True
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{name}-worker")
+        self.thread = threading.Thread(target=self.run, name=name)
+        self.thread.daemon = True
+        self.thread.start()
+        
+    def schedule(self, delay, callback, *args):
+        """Run callback(*args) on a worker after delay seconds; returns a TimerHandle"""
+        with self.lock:
+            target = time.monotonic() + max(0.0, delay) - self.start_time
+            handle = TimerHandle(self, math.ceil(target / self.tick), callback, args)
+            self.pending += 1
+            if self.pending == 1:
+                self.wakeup.notify()  # Scheduler may be idle-waiting with no deadline
+            self._insert(handle)
+        return handle
+        
+    def _insert(self, handle):
+        """Place a handle in the lowest level whose range covers its deadline"""
+        delta = handle.expiry_tick - self.current_tick
+        if delta <= 0:
+            self._fire(handle)
+            return
+        key = handle.expiry_tick if delta < self.span else self.current_tick + self.span - 1
+        delta = key - self.current_tick
+        level = 0
+        while delta >= self.slots ** (level + 1):
+            level += 1
+        self.wheels[level][(key // self.slots ** level) % self.slots].append(handle)
+        
+    def _fire(self, handle):
+        if handle.cancelled:
+            return
+        handle.fired = True
+        self.pending -= 1
+        self.fired_count += 1
+        self.executor.submit(self._run_callback, handle)
+        
+    def _run_callback(self, handle):
+        try:
+            handle.callback(*handle.args)
+        except Exception as e:
+            print(f"Timer callback {getattr(handle.callback, '__name__', handle.callback)} failed: {e}")
+            
+    def _advance(self):
+        """Process one tick: cascade wrapped levels, then fire the level-0 slot"""
+        self.current_tick += 1
+        tick = self.current_tick
+        for level in range(1, self.levels):
+            if tick % self.slots ** level:
+                break
+            slot = self.wheels[level][(tick // self.slots ** level) % self.slots]
+            self.wheels[level][(tick // self.slots ** level) % self.slots] = []
+            for handle in slot:
+                if not handle.cancelled:
+                    self._insert(handle)
+        slot = self.wheels[0][tick % self.slots]
+        self.wheels[0][tick % self.slots] = []
+        for handle in slot:
+            self._fire(handle)
+            
+    def run(self):
+        """Scheduler loop: sleep to the next tick, catching up if it fell behind"""
+        with self.lock:
+            while self.running:
+                if self.pending == 0:
+                    # Nothing scheduled: wait without ticking, then jump the clock forward
+                    self.wakeup.wait()
+                    now_tick = int((time.monotonic() - self.start_time) / self.tick)
+                    if self.pending == 0 or not self.running:
+                        continue
+                    self.current_tick = max(self.current_tick, now_tick - 1)
+                    self._rehome()
+                    continue
+                    
+                next_time = self.start_time + (self.current_tick + 1) * self.tick
+                delay = next_time - time.monotonic()
+                if delay > 0:
+                    self.wakeup.wait(delay)
+                    continue
+                now_tick = int((time.monotonic() - self.start_time) / self.tick)
+                while self.current_tick < now_tick and self.pending:
+                    self._advance()
+                    
+    def _rehome(self):
+        """Re-insert every timer after the clock jumped (only when idle-waiting ended)"""
+        handles = [handle for level in self.wheels for slot in level for handle in slot if not handle.cancelled]
+        self.wheels = [[[] for _ in range(self.slots)] for _ in range(self.levels)]
+        for handle in handles:
+            self._insert(handle)
+            
+    def stats(self):
+        """Pending and fired timer counts"""
+        with self.lock:
+            return {"pending": self.pending, "fired": self.fired_count, "tick": self.current_tick}
+            
+    def stop(self):
+        """Stop the scheduler; pending timers are dropped"""
+        with self.lock:
+            self.running = False
+            self.wakeup.notify()
+        self.thread.join()
+        self.executor.shutdown(wait=False)
+
+
+_shared_wheel = None
+_shared_lock = threading.Lock()
+
+def get_timer_wheel():
+    """The process-wide timer wheel, created on first use"""
+    global _shared_wheel
+    with _shared_lock:
+        if _shared_wheel is None:
+            _shared_wheel = TimerWheel()
+        return _shared_wheel
@@ -8,10 +8,16 @@ Multi-level progression system with difficulty-based questions
 from flask import Flask, render_template, request
 from flask_socketio import SocketIO, emit, join_room, leave_room
 import json
-import time
 import random
+import secrets
 import threading
+import time
 from datetime import datetime
+from timer_wheel import get_timer_wheel
+from leaderboard import Leaderboard
+from pacing import QuestionPacer
+from game_actor import get_actor_pool
+from session_resume import ReplayBuffer, new_resume_token, RESUME_GRACE_PERIOD
 from questions_levels import levels, get_questions_for_level, get_level_info, get_max_level
 
 app = Flask(__name__)
@@ -20,24 +26,37 @@ socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
 
 # Game configuration
 MAX_PLAYERS = 10
-QUESTION_TIMEOUT = 15  # seconds
+QUESTION_TIMEOUT = 15  # seconds, until the game has answer times to pace by (pacing.py)
+QUESTION_TIMEOUT_MIN = 5  # seconds; bounds for adaptively paced questions
+QUESTION_TIMEOUT_MAX = 30  # seconds
 WAIT_TIME_BETWEEN_QUESTIONS = 3  # seconds
+GAME_START_DELAY = 2  # seconds
 QUESTIONS_PER_GAME = 10
+PLAYERS_ROOM = 'players'  # Socket.IO room of joined players; game broadcasts go only to them
 
 class WebTriviaGame:
     """Manages the web-based trivia game state with level progression"""
     
     def __init__(self):
         self.players = {}  # {session_id: {nickname, score, answered_current, level, total_correct}}
+        self.leaderboard = Leaderboard()  # Ranks session ids by score without re-sorting
         self.game_in_progress = False
         self.current_question_index = 0
         self.current_question = None
         self.game_questions = []
         self.question_timer = None
+        self.timers = get_timer_wheel()  # Deadlines and pauses without a thread or sleep each
+        self.actor = get_actor_pool().actor('web')  # Runs every change to the game, one at a time
+        self.question_open = False
+        self.question_sent_at = None  # time.monotonic() when the current question went out
+        self.question_deadline = None
+        self.pacer = QuestionPacer(QUESTION_TIMEOUT, QUESTION_TIMEOUT_MIN, QUESTION_TIMEOUT_MAX)
         self.host_session = None
         self.answered_current_question = set()
         self.game_start_time = None
         self.current_level = 1  # Start at level 1
+        self.replay = ReplayBuffer()  # Recent broadcasts as (event, data), for players resuming a session
+        self.broadcast_lock = threading.Lock()  # Keeps sequence order and emit order the same
         
     def add_player(self, session_id, nickname, level=1):
         """Add a new player to the game"""
@@ -56,8 +75,12 @@ class WebTriviaGame:
             'connected_at': datetime.now(),
             'level': level,
             'total_correct': 0,
-            'level_progress': {i: False for i in range(1, get_max_level() + 1)}  # Track completed levels
+            'level_progress': {i: False for i in range(1, get_max_level() + 1)},  # Track completed levels
+            'resume_token': new_resume_token(),
+            'connected': True,
+            'hold_timer': None  # Releases the seat if a dropped player does not resume
         }
+        self.leaderboard.add(session_id)
         
         # First player becomes the host
         if len(self.players) == 1:
@@ -70,14 +93,110 @@ class WebTriviaGame:
         if session_id in self.players:
             nickname = self.players[session_id]['nickname']
             del self.players[session_id]
+            self.leaderboard.remove(session_id)
             
             # If host left, assign new host
-            if session_id == self.host_session and self.players:
+            if session_id == self.host_session and self.players and not self._pass_host():
                 self.host_session = next(iter(self.players.keys()))
                 
             return nickname
         return None
     
+    def hold_player(self, session_id):
+        """A player's connection dropped mid-game: keep their seat and score for RESUME_GRACE_PERIOD seconds
+        
+        In the lobby there is nothing to keep, so nothing is held (returns
+        None) and the caller removes the player. A held host hands over to a
+        connected player, so the game can still be started.
+        """
+        player = self.players.get(session_id)
+        if not player or not player['connected'] or not self.game_in_progress:
+            return None
+        player['connected'] = False
+        player['hold_timer'] = self._schedule(RESUME_GRACE_PERIOD, self._release_seat, session_id)
+        if session_id == self.host_session:
+            self._pass_host()
+        return player['nickname']
+    
+    def _pass_host(self):
+        """Make the first connected player host and tell them; False if nobody is connected"""
+        new_host = next((sid for sid, player in self.players.items() if player['connected']), None)
+        if new_host is None:
+            return False
+        self.host_session = new_host
+        socketio.emit('host_privileges', {'message': 'The host left. You are the host now.'}, room=new_host)
+        return True
+    
+    def _answer_counts(self):
+        """(connected players, answers from them to the current question); held seats count in neither"""
+        connected = {sid for sid, player in self.players.items() if player['connected']}
+        return len(connected), len(self.answered_current_question & connected)
+    
+    def _release_seat(self, session_id):
+        """The grace period ran out: the held player leaves for good"""
+        player = self.players.get(session_id)
+        if not player or player['connected']:
+            return
+        nickname = self.remove_player(session_id)
+        print(f"Player {nickname} did not resume; removed from the game")
+        self.broadcast('player_left', {
+            'nickname': nickname,
+            'player_count': len(self.players)
+        })
+    
+    def resume_player(self, session_id, token, last_seq):
+        """Move a held player onto a new connection and replay the broadcasts they missed
+        
+        Returns (success, nickname or error message).
+        """
+        if session_id in self.players:
+            return False, "Already in the game"
+        old_session = next((sid for sid, player in self.players.items()
+                            if secrets.compare_digest(player['resume_token'], token)), None)
+        if old_session is None:
+            return False, "Session expired. Join again."
+        player = self.players.pop(old_session)
+        if player['hold_timer']:
+            player['hold_timer'].cancel()
+            player['hold_timer'] = None
+        player['connected'] = True
+        self.players[session_id] = player
+        self.leaderboard.rename(old_session, session_id)
+        if old_session in self.answered_current_question:
+            self.answered_current_question.discard(old_session)
+            self.answered_current_question.add(session_id)
+        if self.host_session == old_session:
+            self.host_session = session_id
+        
+        # Missed broadcasts go out before the player rejoins the live ones, under the same lock
+        with self.broadcast_lock:
+            missed = self.replay.since(last_seq)
+            socketio.emit('session_resumed', {
+                'nickname': player['nickname'],
+                'score': player['score'],
+                'rank': self.leaderboard.rank(session_id),
+                'is_host': session_id == self.host_session,
+                'answered': player['answered_current'],
+                'last_seq': self.replay.last_seq,
+                'replayed': len(missed or []),
+                'complete': missed is not None
+            }, room=session_id)
+            for event, data in missed or []:
+                socketio.emit(event, data, room=session_id)
+            socketio.server.enter_room(session_id, PLAYERS_ROOM, namespace='/')  # No request context on the actor
+        return True, player['nickname']
+    
+    def _schedule(self, delay, callback, *args):
+        """Schedule a game step on the timer wheel; it runs on the game's actor"""
+        return self.timers.schedule(delay, self.actor.post, callback, *args)
+    
+    def broadcast(self, event, data):
+        """Emit to every joined player, numbered and kept for players who resume"""
+        with self.broadcast_lock:
+            data = dict(data, seq=self.replay.next_seq)
+            self.replay.append((event, data))
+            socketio.emit(event, data, room=PLAYERS_ROOM)
+    
     def start_game(self, session_id, level=None):
         """Start the game (host only) at specified level"""
         if session_id != self.host_session:
@@ -114,13 +233,11 @@ class WebTriviaGame:
         self.game_start_time = datetime.now()
         
         # Reset player scores for new level
-        for player in self.players.values():
-            player['score'] = 0
-            player['total_correct'] = 0
-            player['answered_current'] = False
+        self._reset_scores()
+        self.pacer.new_game()
         
-        # Start the game in a separate thread
-        threading.Thread(target=self._run_game, daemon=True).start()
+        # Announce the game; the timer wheel sends the first question
+        self._run_game()
         
         return True, f"Game started at Level {level}: {level_info['name']}"
     
@@ -129,7 +246,7 @@ class WebTriviaGame:
         level_info = get_level_info(self.current_level)
         
         # Notify all players that game is starting
-        socketio.emit('game_starting', {
+        self.broadcast('game_starting', {
             'message': f'Starting Level {self.current_level}: {level_info["name"]}!',
             'level': self.current_level,
             'level_name': level_info["name"],
@@ -137,8 +254,7 @@ class WebTriviaGame:
             'total_questions': len(self.game_questions)
         })
         
-        time.sleep(2)
-        self._next_question()
+        self.question_timer = self._schedule(GAME_START_DELAY, self._next_question)
     
     def _next_question(self):
         """Send the next question"""
@@ -150,28 +266,33 @@ class WebTriviaGame:
         self.answered_current_question = set()
         for player in self.players.values():
             player['answered_current'] = False
+        self.question_open = True
         
         self.current_question = self.game_questions[self.current_question_index]
+        timeout = self.pacer.next_timeout()
+        self.question_sent_at = time.monotonic()
+        self.question_deadline = self.question_sent_at + timeout
         
         # Send question to all players
-        socketio.emit('new_question', {
+        self.broadcast('new_question', {
             'question_number': self.current_question_index + 1,
             'total_questions': len(self.game_questions),
             'question': self.current_question['question'],
             'options': self.current_question['options'],
-            'timeout': QUESTION_TIMEOUT
+            'timeout': timeout
         })
         
         # Set timer for question timeout
-        self.question_timer = threading.Timer(QUESTION_TIMEOUT, self._handle_question_timeout)
-        self.question_timer.start()
+        self.question_timer = self._schedule(timeout, self._handle_question_timeout)
         
         self.current_question_index += 1
     
     def _handle_question_timeout(self):
         """Handle question timeout"""
+        self._close_question()
+        
         # Send correct answer to all players
-        socketio.emit('question_timeout', {
+        self.broadcast('question_timeout', {
             'correct_answer': self.current_question['answer'],
             'correct_option': self.current_question['options'][self.current_question['answer']]
         })
@@ -180,15 +301,14 @@ class WebTriviaGame:
         self._send_leaderboard()
         
         # Wait before next question
-        time.sleep(WAIT_TIME_BETWEEN_QUESTIONS)
-        self._next_question()
+        self.question_timer = self._schedule(WAIT_TIME_BETWEEN_QUESTIONS, self._next_question)
     
     def submit_answer(self, session_id, answer_index):
         """Process a player's answer"""
         if session_id not in self.players:
             return False, "Player not found"
         
-        if not self.game_in_progress or not self.current_question:
+        if not self.game_in_progress or not self.current_question or not self.question_open:
             return False, "No active question"
         
         if session_id in self.answered_current_question:
@@ -200,9 +320,11 @@ class WebTriviaGame:
         if correct:
             player['score'] += 1
             player['total_correct'] += 1
+            self.leaderboard.update(session_id)
         
         player['answered_current'] = True
         self.answered_current_question.add(session_id)
+        self.pacer.answered(time.monotonic() - self.question_sent_at)
         
         # Send feedback to the player
         socketio.emit('answer_feedback', {
@@ -213,37 +335,78 @@ class WebTriviaGame:
             'your_option': self.current_question['options'][answer_index] if answer_index < len(self.current_question['options']) else 'Invalid',
             'question_category': self.current_question.get('category', 'General'),
             'difficulty': self.current_question.get('difficulty', 'unknown')
-        }, room=request.sid)
-        
-        # If all players answered, move to next question
-        if len(self.answered_current_question) == len(self.players):
-            if self.question_timer:
-                self.question_timer.cancel()
+        }, room=session_id)
+        
+        # If all connected players answered, move to next question (held seats do not hold it up)
+        connected, answered = self._answer_counts()
+        if answered >= connected:
+            if self.question_timer and not self.question_timer.cancel():
+                return True, "Answer submitted"  # The timeout already closed this question
+            self._close_question()
             self._send_leaderboard()
-            time.sleep(WAIT_TIME_BETWEEN_QUESTIONS)
-            self._next_question()
+            self.question_timer = self._schedule(WAIT_TIME_BETWEEN_QUESTIONS, self._next_question)
+            return True, "Answer submitted"
+        
+        # Once a quorum is in, everyone else gets a short closing window
+        now = time.monotonic()
+        deadline = self.pacer.quorum_deadline(answered, connected, now,
+                                              self.question_deadline)
+        if deadline is not None and self.question_timer and self.question_timer.cancel():
+            self.question_deadline = deadline
+            self.question_timer = self._schedule(deadline - now, self._handle_question_timeout)
+            self.broadcast('question_deadline', {
+                'question_number': self.current_question_index,
+                'timeout': round(deadline - now, 1)
+            })
         
         return True, "Answer submitted"
     
+    def _close_question(self):
+        """Stop taking answers and let the pacer account for the question"""
+        self.question_open = False
+        closed_at = min(time.monotonic(), self.question_deadline)
+        connected, answered = self._answer_counts()
+        self.pacer.closed(closed_at - self.question_sent_at, max(0, connected - answered))
+    
     def _send_leaderboard(self):
-        """Send current leaderboard to all players"""
-        leaderboard = sorted(
-            [(p['nickname'], p['score']) for p in self.players.values()],
-            key=lambda x: x[1],
-            reverse=True
-        )
-        
-        socketio.emit('leaderboard_update', {
-            'leaderboard': leaderboard
-        })
+        """Send the top of the leaderboard to all players, and each player their own rank
+        
+        The first update of a game carries the whole top K; later ones carry
+        only the changed positions. Ranks go only to players whose rank moved.
+        """
+        full, entries, size = self.leaderboard.top_delta()
+        if full:
+            self.broadcast('leaderboard_update', {
+                'leaderboard': [[self.players[sid]['nickname'], score] for sid, score in entries],
+                'total_players': len(self.players)
+            })
+        elif entries is not None:
+            self.broadcast('leaderboard_delta', {
+                'changes': [[position, self.players[sid]['nickname'], score] for position, sid, score in entries],
+                'size': size,
+                'total_players': len(self.players)
+            })
+        
+        for session_id, rank, score in self.leaderboard.rank_changes():
+            socketio.emit('your_rank', {
+                'rank': rank,
+                'score': score,
+                'total_players': len(self.players)
+            }, room=session_id)
+    
+    def _reset_scores(self):
+        """Zero every player's score; the next leaderboard update is a full snapshot"""
+        for session_id, player in self.players.items():
+            player['score'] = 0
+            player['total_correct'] = 0
+            player['answered_current'] = False
+            self.leaderboard.set_score(session_id, 0)
+        self.leaderboard.reset_snapshot()
     
     def _end_game(self):
         """End the game and check for level progression"""
-        leaderboard = sorted(
-            [(p['nickname'], p['score'], p['total_correct']) for p in self.players.values()],
-            key=lambda x: x[1],
-            reverse=True
-        )
+        leaderboard = [(self.players[sid]['nickname'], score, self.players[sid]['total_correct'])
+                       for sid, score in self.leaderboard.top()]
         
         winner = leaderboard[0] if leaderboard else None
         level_info = get_level_info(self.current_level)
@@ -286,20 +449,29 @@ class WebTriviaGame:
             else:
                 game_over_data['unlock_message'] = level_info.get('unlock_message', 'Congratulations! You have mastered all levels!')
         
-        socketio.emit('game_over', game_over_data)
+        # Final standings: the top K are in game_over, everyone gets their own rank
+        for session_id, player in self.players.items():
+            socketio.emit('your_rank', {
+                'rank': self.leaderboard.rank(session_id),
+                'score': player['score'],
+                'correct_answers': player['total_correct'],
+                'total_players': len(self.players)
+            }, room=session_id)
+        
+        self.broadcast('game_over', game_over_data)
+        print(f"Game over; adaptive pacing saved {self.pacer.game_time_saved:.1f}s "
+              f"(question timeout now {self.pacer.timeout}s)")
         
         # Reset game state
         self.game_in_progress = False
+        self.question_open = False
         self.current_question_index = 0
         self.current_question = None
         self.game_questions = []
         self.answered_current_question = set()
         
         # Reset player scores but keep level progress
-        for player in self.players.values():
-            player['score'] = 0
-            player['total_correct'] = 0
-            player['answered_current'] = False
+        self._reset_scores()
     
     def get_game_state(self):
         """Get current game state"""
@@ -308,17 +480,20 @@ class WebTriviaGame:
                 {
                     'nickname': p['nickname'],
                     'score': p['score'],
-                    'answered_current': p.get('answered_current', False)
+                    'answered_current': p.get('answered_current', False),
+                    'connected': p['connected']
                 }
                 for p in self.players.values()
             ],
             'game_in_progress': self.game_in_progress,
             'player_count': len(self.players),
             'current_question_number': self.current_question_index,
-            'total_questions': len(self.game_questions) if self.game_questions else 0
+            'total_questions': len(self.game_questions) if self.game_questions else 0,
+            'pacing': self.pacer.stats()
         }
 
-# Global game instance
+# Global game instance; handlers change it only through game.actor.call(), so answers,
+# joins and timeouts never race
 game = WebTriviaGame()
 
 @app.route('/')
@@ -351,12 +526,16 @@ def handle_connect():
 def handle_disconnect():
     """Handle client disconnection"""
     print(f'Client disconnected: {request.sid}')
-    nickname = game.remove_player(request.sid)
+    nickname = game.actor.call(game.hold_player, request.sid)
+    if nickname:
+        print(f"Holding {nickname}'s seat for {RESUME_GRACE_PERIOD:.0f}s")
+        return
+    nickname = game.actor.call(game.remove_player, request.sid)
     if nickname:
-        emit('player_left', {
+        game.broadcast('player_left', {
             'nickname': nickname,
             'player_count': len(game.players)
-        }, broadcast=True)
+        })
 
 @socketio.on('join_game')
 def handle_join_game(data):
@@ -369,17 +548,24 @@ def handle_join_game(data):
     
     print(f"Player attempting to join: {nickname} (session: {request.sid})")
     
-    success, message = game.add_player(request.sid, nickname)
+    success, message = game.actor.call(game.add_player, request.sid, nickname)
     
     if success:
         print(f"Player {nickname} joined successfully. Total players: {len(game.players)}")
         
+        # The token lets this player resume after a dropped connection
+        emit('session', {
+            'nickname': nickname,
+            'resume_token': game.players[request.sid]['resume_token']
+        })
+        join_room(PLAYERS_ROOM)
+        
         # Notify all players
-        emit('player_joined', {
+        game.broadcast('player_joined', {
             'nickname': nickname,
             'player_count': len(game.players),
             'is_host': request.sid == game.host_session
-        }, broadcast=True)
+        })
         
         # Send game state to the new player
         emit('game_state', game.get_game_state())
@@ -392,11 +578,32 @@ def handle_join_game(data):
         print(f"Failed to add player {nickname}: {message}")
         emit('error', {'message': message})
 
+@socketio.on('leave_game')
+def handle_leave_game():
+    """Handle a player leaving on purpose: their seat is given up, not held"""
+    nickname = game.actor.call(game.remove_player, request.sid)
+    if nickname:
+        leave_room(PLAYERS_ROOM)
+        game.broadcast('player_left', {
+            'nickname': nickname,
+            'player_count': len(game.players)
+        })
+
+@socketio.on('resume_session')
+def handle_resume_session(data):
+    """Handle a returning player resuming their session on a new connection"""
+    success, message = game.actor.call(game.resume_player, request.sid, str(data.get('token') or ''),
+                                       int(data.get('last_seq') or 0))
+    if success:
+        print(f"Player {message} resumed (session: {request.sid})")
+    else:
+        emit('resume_failed', {'message': message})
+
 @socketio.on('start_game')
 def handle_start_game():
     """Handle game start request"""
     print(f"Game start requested by session: {request.sid}")
-    success, message = game.start_game(request.sid)
+    success, message = game.actor.call(game.start_game, request.sid)
     
     if not success:
         print(f"Game start failed: {message}")
@@ -413,7 +620,7 @@ def handle_submit_answer(data):
         emit('error', {'message': 'Answer index is required'})
         return
     
-    success, message = game.submit_answer(request.sid, answer_index)
+    success, message = game.actor.call(game.submit_answer, request.sid, answer_index)
     
     if not success:
         emit('error', {'message': message})
@@ -427,10 +634,10 @@ def handle_get_game_state():
 def handle_start_level(data):
     """Handle starting a specific level"""
     level = data.get('level', 1)
-    success, message = game.start_game(request.sid, level)
+    success, message = game.actor.call(game.start_game, request.sid, level)
     
     if success:
-        emit('game_started', {'message': message}, broadcast=True)
+        game.broadcast('game_started', {'message': message})
         print(f"Level {level} started successfully by {request.sid}")
     else:
         emit('error', {'message': message})
@@ -485,14 +692,14 @@ def handle_advance_to_next_level():
         return
     
     # Start next level
-    success, message = game.start_game(request.sid, next_level)
+    success, message = game.actor.call(game.start_game, request.sid, next_level)
     
     if success:
-        emit('level_advanced', {
+        game.broadcast('level_advanced', {
             'message': message,
             'new_level': next_level,
             'level_info': get_level_info(next_level)
-        }, broadcast=True)
+        })
         print(f"Advanced to level {next_level} by {request.sid}")
     else:
         emit('error', {'message': message})